@@ -0,0 +1,77 @@
+# backtest/allocation.py
+import numpy as np
+import pandas as pd
+
+from config import MAX_POSITIONS, POSITION_SIZING, VOL_LOOKBACK, TARGET_VOL, SCORE_SCALE
+
+# --- MULTI-POSITION ALLOCATION ---
+# Helpers for holding up to N positions at once (run_multi_position_simulation
+# in backtest/engine.py). Candidates are ranked with a partial sort
+# (np.argpartition style, linear in the universe and done in C), and only
+# the k winners get ordered, so the per-bar cost follows k, not the number
+# of symbols times Python overhead.
+# Sizing gives each winner up to one slot (equity / N), measured against a
+# fixed reference, so a pick is sized the same whether it enters alone or
+# with others:
+#   equal      - one slot each
+#   score      - slot * score / score_scale, capped at the slot
+#   volatility - slot * target_vol / recent volatility, capped at the slot
+# Unknown values (warm-up volatility, NaN scores) get the full slot.
+
+SIZING_MODES = ("equal", "score", "volatility")
+
+def resolve_allocation(max_positions=None, sizing=None):
+    # Priority: Function Args > Config File
+    final_max_positions = int(max_positions if max_positions is not None else MAX_POSITIONS)
+    final_sizing = sizing if sizing is not None else POSITION_SIZING
+    if final_sizing not in SIZING_MODES:
+        raise ValueError(f"Unknown sizing: {final_sizing} (choose from {', '.join(SIZING_MODES)})")
+    return max(1, final_max_positions), final_sizing
+
+def top_k(scores, k):
+    """
+    Columns of the k highest scores (-inf = no candidate), best first.
+    Ties keep the lower column, like the one-position scan.
+    """
+    candidates = np.flatnonzero(scores > -np.inf)
+    if k <= 0 or len(candidates) == 0:
+        return candidates[:0]
+    values = scores[candidates]
+    if len(candidates) > k:
+        kth = -np.partition(-values, k - 1)[k - 1]
+        above = values > kth
+        tied = np.flatnonzero(values == kth)[:k - np.count_nonzero(above)]
+        keep = np.flatnonzero(above)
+        keep = np.sort(np.concatenate([keep, tied]))
+        candidates, values = candidates[keep], values[keep]
+    order = np.lexsort((candidates, -values))
+    return candidates[order]
+
+def volatility_panel(frames, row_pos, lookback=VOL_LOOKBACK):
+    """(n_dates, n_symbols) std of log close returns over each symbol's last lookback bars."""
+    out = np.full(row_pos.shape, np.nan)
+    for j, frame in enumerate(frames):
+        close = pd.Series(np.asarray(frame['close'], dtype=float))
+        vol = np.log(close).diff().rolling(window=lookback).std().to_numpy()
+        has_bar = row_pos[:, j] >= 0
+        out[has_bar, j] = vol[row_pos[has_bar, j]]
+    return out
+
+def position_sizes(equity, cash, max_positions, scores, vol=None, sizing="equal",
+                   target_vol=TARGET_VOL, score_scale=SCORE_SCALE):
+    """Cash for each pick (scores/vol of the picks, best first). Never more than cash in total."""
+    n = len(scores)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if sizing == "score":
+            fractions = np.asarray(scores, dtype=float) / score_scale
+        elif sizing == "volatility":
+            fractions = target_vol / np.asarray(vol, dtype=float)
+        else:
+            fractions = np.ones(n)
+    fractions = np.clip(np.where(np.isnan(fractions), 1.0, fractions), 0.0, 1.0)
+
+    sizes = (equity / max_positions) * fractions
+    total = sizes.sum()
+    if total > cash:
+        sizes *= cash / total
+    return sizes
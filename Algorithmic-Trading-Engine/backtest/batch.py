@@ -0,0 +1,180 @@
+# backtest/batch.py
+import importlib
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from multiprocessing import shared_memory
+
+from backtest.portfolio import run_portfolio_simulation
+from backtest.engine import run_panel_simulation
+from data.compact import CompactFrame
+from backtest.profiling import PROFILER, run_profiled
+from config import BACKTEST_ENGINE, PROFILE_PERIOD, MAX_POSITIONS
+
+PROFILE_DIR = os.path.join("backtest", "results", "profiles")
+
+# --- BATCH RUNNER ---
+# Runs every period of a batch against the prepared master_cache, either
+# serially or on a process pool. Workers attach to one shared-memory copy
+# of the cache instead of receiving pickled DataFrames per task.
+
+def slice_period(master_cache, start_days, end_days, now):
+    sim_end_dt = now - timedelta(days=end_days)
+    sim_start_dt = now - timedelta(days=start_days)
+
+    current_ticker_map = {}
+    for symbol, df in master_cache.items():
+        if isinstance(df, CompactFrame):
+            # searchsorted view, no copy
+            sliced_df = df.slice(sim_start_dt, sim_end_dt)
+        else:
+            mask = (df.index >= sim_start_dt) & (df.index <= sim_end_dt)
+            sliced_df = df.loc[mask]
+        if not sliced_df.empty:
+            current_ticker_map[symbol] = sliced_df
+    return current_ticker_map
+
+def simulate_period(master_cache, start_days, end_days, now, sim_capital, strategy_module, dca_amount, dca_interval):
+    """Returns (ledger, final_equity), or None when the slice has no data."""
+    with PROFILER.stage("slice"):
+        current_ticker_map = slice_period(master_cache, start_days, end_days, now)
+    if not current_ticker_map:
+        return None
+
+    # The legacy loop needs pandas frames and holds one position; otherwise the panel engine
+    compact = any(isinstance(df, CompactFrame) for df in current_ticker_map.values())
+    legacy = BACKTEST_ENGINE == "legacy" and not compact and MAX_POSITIONS <= 1
+    simulate = run_portfolio_simulation if legacy else run_panel_simulation
+    args = (current_ticker_map, sim_capital, strategy_module, dca_amount, dca_interval)
+
+    with PROFILER.stage("simulation"):
+        label = f"{start_days}-{end_days}"
+        if PROFILE_PERIOD == label:
+            return run_profiled(os.path.join(PROFILE_DIR, f"period_{label}.prof"), simulate, *args)
+        return simulate(*args)
+
+# --- SHARED MEMORY CACHE ---
+
+def _open_shm(name):
+    try:
+        # Python 3.13+: the parent owns the block, workers must not unlink it
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+def share_cache(master_cache):
+    """
+    Packs every frame into two shared blocks (float64 values, int64 ns
+    timestamps). Returns (spec, blocks); spec is small and picklable.
+    Non-numeric columns are dropped. Frames that are views of .npy files
+    (data/columnar.py) are passed by path instead and re-mapped by each
+    worker, so they share the OS page cache and nothing is copied.
+    """
+    if all(isinstance(df, CompactFrame) and df.source for df in master_cache.values()):
+        return {"mapped": {symbol: df.source for symbol, df in master_cache.items()}}, []
+
+    symbols = list(master_cache.keys())
+    first = master_cache[symbols[0]]
+    columns = [c for c in first.columns if pd.api.types.is_numeric_dtype(first[c].dtype)]
+    lengths = [len(master_cache[s]) for s in symbols]
+    n_rows = sum(lengths)
+
+    values_shm = shared_memory.SharedMemory(create=True, size=max(1, n_rows * len(columns) * 8))
+    index_shm = shared_memory.SharedMemory(create=True, size=max(1, n_rows * 8))
+    values = np.ndarray((n_rows, len(columns)), dtype=np.float64, buffer=values_shm.buf)
+    index = np.ndarray((n_rows,), dtype=np.int64, buffer=index_shm.buf)
+
+    layout = []
+    offset = 0
+    for symbol, n in zip(symbols, lengths):
+        df = master_cache[symbol]
+        if isinstance(df, CompactFrame):
+            values[offset:offset + n] = np.column_stack([np.asarray(df[c], dtype=np.float64) for c in columns])
+            index[offset:offset + n] = df.ts
+        else:
+            values[offset:offset + n] = df.reindex(columns=columns).to_numpy(dtype=np.float64)
+            index[offset:offset + n] = df.index.as_unit("ns").asi8
+        layout.append((symbol, offset, n))
+        offset += n
+
+    spec = {
+        "values": values_shm.name,
+        "index": index_shm.name,
+        "n_rows": n_rows,
+        "columns": columns,
+        "layout": layout,
+        "tz": str(first.index.tz) if first.index.tz is not None else None,
+        "index_name": first.index.name,
+    }
+    return spec, [values_shm, index_shm]
+
+def attach_cache(spec):
+    """Rebuilds master_cache as DataFrames viewing the shared blocks (no copy)."""
+    if "mapped" in spec:
+        return {symbol: CompactFrame.open(*source) for symbol, source in spec["mapped"].items()}, []
+
+    values_shm = _open_shm(spec["values"])
+    index_shm = _open_shm(spec["index"])
+    columns = spec["columns"]
+    values = np.ndarray((spec["n_rows"], len(columns)), dtype=np.float64, buffer=values_shm.buf)
+    index = np.ndarray((spec["n_rows"],), dtype=np.int64, buffer=index_shm.buf)
+
+    master_cache = {}
+    for symbol, offset, n in spec["layout"]:
+        dt_index = pd.DatetimeIndex(index[offset:offset + n].view("datetime64[ns]"), name=spec["index_name"])
+        if spec["tz"]:
+            dt_index = dt_index.tz_localize("UTC").tz_convert(spec["tz"])
+        master_cache[symbol] = pd.DataFrame(values[offset:offset + n], index=dt_index, columns=columns, copy=False)
+    return master_cache, [values_shm, index_shm]
+
+# --- WORKER SIDE ---
+_WORKER = {}
+
+def _init_worker(spec, strategy_name, sim_capital, dca_amount, dca_interval, now):
+    master_cache, blocks = attach_cache(spec)
+    _WORKER.update({
+        "cache": master_cache,
+        "blocks": blocks, # keep the mappings alive
+        "strategy": importlib.import_module(strategy_name),
+        "args": (now, sim_capital),
+        "dca": (dca_amount, dca_interval),
+    })
+
+def _run_period(period):
+    """Returns (result, profiler snapshot); the parent merges the snapshots."""
+    start_days, end_days = period
+    now, sim_capital = _WORKER["args"]
+    dca_amount, dca_interval = _WORKER["dca"]
+    PROFILER.reset()
+    result = simulate_period(_WORKER["cache"], start_days, end_days, now, sim_capital, _WORKER["strategy"], dca_amount, dca_interval)
+    return result, PROFILER.snapshot()
+
+def run_batch(master_cache, periods, sim_capital, strategy_module, dca_amount, dca_interval, workers=1):
+    """
+    Yields ((start_days, end_days), result) in period order.
+    workers <= 1 runs serially; 0/None means one worker per CPU core.
+    """
+    now = datetime.now(timezone.utc)
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(periods))
+
+    if workers <= 1:
+        for start_days, end_days in periods:
+            yield (start_days, end_days), simulate_period(master_cache, start_days, end_days, now, sim_capital, strategy_module, dca_amount, dca_interval)
+        return
+
+    spec, blocks = share_cache(master_cache)
+    try:
+        init_args = (spec, strategy_module.__name__, sim_capital, dca_amount, dca_interval, now)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            # map() hands results back in submission order
+            for period, (result, profile) in zip(periods, pool.map(_run_period, periods)):
+                PROFILER.merge(profile)
+                yield period, result
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,112 @@
+# backtest/costs.py
+import numpy as np
+from dataclasses import dataclass, field
+
+from backtest.fees import crypto_fee, stock_fee
+from config import COSTS
+
+# --- EXECUTION COSTS ---
+# One cost model for every engine. Per fill:
+#   fill price = close x (1 +/- (half spread + slippage + impact))
+#   impact     = impact_coef x sqrt(order notional / bar dollar volume)
+#   fee        = asset-class fee on the notional (backtest/fees.py)
+# Buys below min_notional are not placed. Everything that does not depend
+# on the order size is resolved once per run into per-symbol arrays
+# (FillCosts), so a fill is a lookup plus one square root. buy/sell are
+# plain array expressions and price whole vectors of fills at once (the
+# Monte Carlo engine fills every path of a bar in one call).
+# CostModel.flat() is the old flat SLIPPAGE without fees.
+
+SLIPPAGE = 0.0003 # flat slippage per side
+
+FEE_FUNCTIONS = {"stock": stock_fee, "crypto": crypto_fee}
+
+def asset_class(symbol):
+    """Alpaca naming: crypto pairs are "BASE/QUOTE"."""
+    return "crypto" if "/" in symbol else "stock"
+
+@dataclass
+class CostModel:
+    slippage: float = SLIPPAGE
+    spread_bps: dict = field(default_factory=dict) # asset class -> quoted spread, half paid per side
+    impact: float = 0.0       # square-root impact coefficient, 0 = off
+    min_notional: float = 0.0
+    fees: bool = False
+
+    @classmethod
+    def flat(cls, slippage=SLIPPAGE):
+        return cls(slippage=slippage)
+
+    @classmethod
+    def from_settings(cls, costs):
+        if not costs.get("enabled", True):
+            return cls.flat(costs.get("slippage", SLIPPAGE))
+        return cls(
+            slippage=costs.get("slippage", SLIPPAGE),
+            spread_bps=dict(costs.get("spread_bps", {})),
+            impact=costs.get("impact", 0.0),
+            min_notional=costs.get("min_notional", 0.0),
+            fees=costs.get("fees", True),
+        )
+
+    def for_symbols(self, symbols):
+        classes = [asset_class(s) for s in symbols]
+        base = np.array([self.slippage + self.spread_bps.get(c, 0.0) / 20_000 for c in classes])
+        # Fees are linear in the notional, so the rate is the fee on 1.0
+        if self.fees:
+            fee_rate = np.array([FEE_FUNCTIONS[c](1.0) for c in classes], dtype=float)
+        else:
+            fee_rate = np.zeros(len(classes))
+        return FillCosts(base, fee_rate, self.impact, self.min_notional)
+
+@dataclass
+class FillCosts:
+    base: np.ndarray     # (n_symbols,) half spread + slippage per side
+    fee_rate: np.ndarray # (n_symbols,) fee per unit of notional
+    impact: float
+    min_notional: float
+
+    @property
+    def needs_volume(self):
+        return self.impact > 0
+
+    def _cost(self, col, notional, dollar_volume, scale):
+        cost = self.base[col] * scale
+        if self.impact > 0:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                impact = self.impact * np.sqrt(notional / dollar_volume)
+            # Unknown volume: no impact term
+            cost = cost + np.where(np.isfinite(impact), impact, 0.0)
+        return cost
+
+    def buy(self, col, close, cash, dollar_volume=np.nan, scale=1.0):
+        """
+        Spends cash, fee included. Returns (fill price, qty, fee); qty and
+        fee are 0 where the order would be below min_notional.
+        scale multiplies spread + slippage (Monte Carlo jitter).
+        """
+        notional = cash / (1 + self.fee_rate[col])
+        price = close * (1 + self._cost(col, notional, dollar_volume, scale))
+        placed = notional >= self.min_notional
+        if np.ndim(placed) == 0: # one fill (the per-bar loops)
+            return (price, notional / price, cash - notional) if placed else (price, 0.0, 0.0)
+        qty = np.where(placed, notional / price, 0.0)
+        fee = np.where(placed, cash - notional, 0.0)
+        return price, qty, fee
+
+    def sell(self, col, close, qty, dollar_volume=np.nan, scale=1.0):
+        """Returns (fill price, cash received net of the fee, fee)."""
+        price = close * (1 - self._cost(col, qty * close, dollar_volume, scale))
+        revenue = qty * price
+        fee = revenue * self.fee_rate[col]
+        return price, revenue - fee, fee
+
+def dollar_volume(row):
+    """close x volume of one bar row (Series or dict), NaN without volume."""
+    return row['close'] * row['volume'] if 'volume' in row else np.nan
+
+COST_MODEL = CostModel.from_settings(COSTS)
+
+def resolve_costs(costs=None):
+    """Function Args > Config File."""
+    return costs if costs is not None else COST_MODEL
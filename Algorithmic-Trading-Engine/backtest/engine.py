@@ -0,0 +1,414 @@
+# backtest/engine.py
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from datetime import timedelta
+
+from backtest.portfolio import prepare_ticker_data, resolve_dca
+from backtest.costs import resolve_costs
+from backtest.ledger import Ledger, EquityCurve, DEPOSIT, BUY, SELL, CASH, index_ns
+from strategy.loader import get_batch_signals
+from backtest.profiling import PROFILER
+from backtest.rows import row_tables
+from backtest.allocation import resolve_allocation, top_k, volatility_panel, position_sizes
+
+# --- PANEL ENGINE ---
+# Same rules as run_portfolio_simulation (Strict One Position, DCA, slippage),
+# but every symbol is aligned onto one date-by-symbol grid up front so the
+# main loop walks integer positions instead of doing label lookups per date.
+
+@dataclass
+class Panel:
+    dates: pd.DatetimeIndex
+    symbols: list
+    frames: list
+    row_pos: np.ndarray   # (n_dates, n_symbols) row number inside each frame, -1 = no bar
+    close: np.ndarray     # (n_dates, n_symbols) close price, NaN = no bar
+
+def column_values(frame, name):
+    """float64 column of a DataFrame or CompactFrame."""
+    return np.asarray(frame[name], dtype=float)
+
+def build_panel(processed_data):
+    """Aligns prepared frames (DataFrame or CompactFrame) onto the union of their dates."""
+    symbols = list(processed_data.keys())
+    frames = [processed_data[s] for s in symbols]
+
+    dates = frames[0].index
+    if len(frames) > 1:
+        dates = dates.append([df.index for df in frames[1:]])
+    dates = dates.unique().sort_values()
+
+    n_dates, n_syms = len(dates), len(symbols)
+    row_pos = np.full((n_dates, n_syms), -1, dtype=np.int64)
+    close = np.full((n_dates, n_syms), np.nan)
+
+    for j, df in enumerate(frames):
+        pos = dates.get_indexer(df.index)
+        row_pos[pos, j] = np.arange(len(df))
+        close[pos, j] = column_values(df, 'close')
+
+    return Panel(dates, symbols, frames, row_pos, close)
+
+class PanelColumns:
+    """Lazy column -> (n_dates, n_symbols) array view of a Panel, for batch strategies."""
+
+    def __init__(self, panel):
+        self.panel = panel
+        self._cache = {'close': panel.close}
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            panel = self.panel
+            out = np.full(panel.close.shape, np.nan)
+            for j, df in enumerate(panel.frames):
+                has_bar = panel.row_pos[:, j] >= 0
+                out[has_bar, j] = column_values(df, name)[panel.row_pos[has_bar, j]]
+            self._cache[name] = out
+        return self._cache[name]
+
+    def __contains__(self, name):
+        return name in self._cache or name in self.panel.frames[0].columns
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+def batch_signal_panels(panel, batch_fn):
+    """
+    Evaluates a batch strategy over the whole panel at once.
+    Returns (sell, entry_score): sell is a bool panel, entry_score holds the
+    buy score where the strategy would enter and -inf everywhere else.
+    """
+    buy, sell, score = batch_fn(PanelColumns(panel))
+    has_bar = panel.row_pos >= 0
+
+    buy = np.asarray(buy, dtype=bool) & has_bar
+    sell = np.asarray(sell, dtype=bool) & has_bar
+    score = np.broadcast_to(np.asarray(score, dtype=float), buy.shape)
+
+    # Row-wise engine only takes scores strictly above -1 (NaN never wins)
+    entry_score = np.where(buy & (score > -1), score, -np.inf)
+    return sell, entry_score
+
+def dollar_volume_panel(panel):
+    """(n_dates, n_symbols) close x volume, or None when the frames carry no volume."""
+    columns = PanelColumns(panel)
+    if 'volume' not in columns:
+        return None
+    return panel.close * columns['volume']
+
+def run_panel_simulation(ticker_data_map, initial_capital, strategy_module, dca_amount=None, dca_interval=None, use_batch=True,
+                         max_positions=None, sizing=None, costs=None):
+    """
+    Drop-in replacement for run_portfolio_simulation.
+    Produces the same ledger and final equity.
+    Strategies with get_batch_signals are evaluated once over the whole panel;
+    the others (or use_batch=False) fall back to get_decision per row.
+    max_positions > 1 (argument or config) hands over to run_multi_position_simulation.
+    costs: CostModel (backtest/costs.py), default from config.
+    """
+    max_positions, sizing = resolve_allocation(max_positions, sizing)
+    if max_positions > 1:
+        return run_multi_position_simulation(ticker_data_map, initial_capital, strategy_module, dca_amount, dca_interval,
+                                             use_batch, max_positions, sizing, costs)
+
+    # 1. PREPARE DATA
+    processed_data = prepare_ticker_data(ticker_data_map, strategy_module)
+
+    if not processed_data:
+        return Ledger([], initial_capital), initial_capital
+
+    with PROFILER.stage("date_union"):
+        panel = build_panel(processed_data)
+    dates = panel.dates
+    frames = panel.frames
+    symbols = panel.symbols
+    row_pos = panel.row_pos
+    close = panel.close
+    date_ns = index_ns(dates)
+    fills = resolve_costs(costs).for_symbols(symbols)
+    dollar_volume = dollar_volume_panel(panel) if fills.needs_volume else None
+
+    batch_fn = get_batch_signals(strategy_module) if use_batch else None
+    if batch_fn:
+        with PROFILER.stage("signals"):
+            sell_panel, entry_panel = batch_signal_panels(panel, batch_fn)
+            has_entry = entry_panel.max(axis=1) > -np.inf
+        PROFILER.count("batch_signal_calls")
+    else:
+        tables = row_tables(frames) # rows handed to get_decision (backtest/rows.py)
+
+    # 2. SETUP ACCOUNTS & DCA
+    cash = initial_capital
+    holdings = None # Strict One Position
+    ledger = Ledger(symbols, tz=dates.tz)
+
+    # End-of-bar account state, marked to market after the loop
+    n_dates = len(dates)
+    cash_bar = np.empty(n_dates)
+    col_bar = np.full(n_dates, -1, dtype=np.int64)
+    qty_bar = np.zeros(n_dates)
+    flows = np.zeros(n_dates)
+
+    final_dca_amount, final_dca_interval = resolve_dca(dca_amount, dca_interval)
+    dca_enabled = (final_dca_amount > 0)
+
+    # Deposit schedule in integer nanoseconds (same clock as the index)
+    dca_step_ns = int(timedelta(days=final_dca_interval).total_seconds() * 1_000_000_000)
+    next_deposit_ns = int(date_ns[0]) + dca_step_ns
+
+    total_invested = initial_capital
+    strategy_calls = 0
+
+    # 3. MAIN LOOP
+    for i in range(n_dates):
+        pos_today = row_pos[i]
+
+        # --- [A] RECURRING DEPOSIT LOGIC ---
+        if dca_enabled and date_ns[i] >= next_deposit_ns:
+            cash += final_dca_amount
+            total_invested += final_dca_amount
+            flows[i] = final_dca_amount
+
+            current_equity = cash
+            if holdings and pos_today[holdings['col']] >= 0:
+                current_equity += holdings['qty'] * close[i, holdings['col']]
+
+            ledger.append(date_ns[i], DEPOSIT, CASH, final_dca_amount, 0.0, current_equity)
+
+            next_deposit_ns += dca_step_ns
+
+        # --- [B] EXIT LOGIC ---
+        if holdings:
+            col = holdings['col']
+            pos = pos_today[col]
+            if pos >= 0:
+                price = close[i, col]
+
+                if batch_fn:
+                    decision = "SELL_SIGNAL" if sell_panel[i, col] else "HOLD"
+                else:
+                    row = tables[col].row(pos)
+                    current_val = cash + (holdings['qty'] * price)
+
+                    decision, _, new_state, _ = strategy_module.get_decision(row, holdings['state'], holdings['symbol'], current_val)
+                    holdings['state'] = new_state
+                    strategy_calls += 1
+
+                if decision == "SELL_SIGNAL":
+                    dv = dollar_volume[i, col] if dollar_volume is not None else np.nan
+                    sell_price, proceeds, fee = fills.sell(col, price, holdings['qty'], dv)
+                    profit = proceeds - holdings['cost_basis']
+                    cash += proceeds
+                    ledger.append(date_ns[i], SELL, col, sell_price, profit, cash, holdings['qty'], fee)
+                    holdings = None
+
+        # --- [C] ENTRY LOGIC ---
+        if holdings is None and cash > 0:
+            best_score = -1
+            best_col = -1
+
+            if batch_fn:
+                # argmax keeps the first symbol on ties, like the scan below
+                if has_entry[i]:
+                    best_col = int(np.argmax(entry_panel[i]))
+            else:
+                for col in np.flatnonzero(pos_today >= 0):
+                    row = tables[col].row(pos_today[col])
+                    decision, _, _, score = strategy_module.get_decision(row, {}, symbols[col], cash)
+                    strategy_calls += 1
+
+                    if decision == "BUY_SIGNAL" and score > best_score:
+                        best_score = score
+                        best_col = col
+
+            if best_col >= 0:
+                dv = dollar_volume[i, best_col] if dollar_volume is not None else np.nan
+                buy_price, qty, fee = fills.buy(best_col, close[i, best_col], cash, dv) # ALL IN
+                qty = float(qty)
+
+                if qty > 0:
+                    holdings = {
+                        "symbol": symbols[best_col],
+                        "col": best_col,
+                        "qty": qty,
+                        "cost_basis": cash,
+                        "state": {
+                            "position": 1,
+                            "highest_price": buy_price,
+                            "entry_price": buy_price,
+                            "cooldown": 0
+                        }
+                    }
+                    cash = 0
+                    ledger.append(date_ns[i], BUY, best_col, buy_price, 0.0, 0.0, qty, fee)
+
+        cash_bar[i] = cash
+        if holdings:
+            col_bar[i] = holdings['col']
+            qty_bar[i] = holdings['qty']
+
+    PROFILER.count("bars_simulated", len(dates))
+    PROFILER.count("strategy_calls", strategy_calls)
+
+    # 4. FINAL TALLY
+    # Cash deposited while holding stays in the account
+    final_value = cash
+    if holdings:
+        last_price = column_values(frames[holdings['col']], 'close')[-1]
+        final_value += holdings['qty'] * last_price
+
+    # 5. EQUITY CURVE (held symbol marked at its last known close)
+    held = col_bar >= 0
+    mark = pd.DataFrame(close).ffill().to_numpy()
+    equity = cash_bar.copy()
+    equity[held] += qty_bar[held] * mark[held, col_bar[held]]
+
+    ledger.total_invested = total_invested
+    ledger.curve = EquityCurve(dates, equity, flows, held)
+
+    return ledger, final_value
+
+# --- MULTI-POSITION ENGINE ---
+# Up to max_positions symbols held at once. Exits work per position as
+# above; free slots are filled with the top-k entry scores of the bar
+# (backtest/allocation.py) and sized by the chosen sizing mode. With
+# max_positions=1 and equal sizing this reproduces run_panel_simulation.
+
+def run_multi_position_simulation(ticker_data_map, initial_capital, strategy_module, dca_amount=None, dca_interval=None,
+                                  use_batch=True, max_positions=None, sizing=None, costs=None):
+    processed_data = prepare_ticker_data(ticker_data_map, strategy_module)
+
+    if not processed_data:
+        return Ledger([], initial_capital), initial_capital
+
+    max_positions, sizing = resolve_allocation(max_positions, sizing)
+
+    with PROFILER.stage("date_union"):
+        panel = build_panel(processed_data)
+    dates = panel.dates
+    frames = panel.frames
+    symbols = panel.symbols
+    row_pos = panel.row_pos
+    close = panel.close
+    date_ns = index_ns(dates)
+    mark = pd.DataFrame(close).ffill().to_numpy() # last known close
+    fills = resolve_costs(costs).for_symbols(symbols)
+    dollar_volume = dollar_volume_panel(panel) if fills.needs_volume else None
+
+    batch_fn = get_batch_signals(strategy_module) if use_batch else None
+    if batch_fn:
+        with PROFILER.stage("signals"):
+            sell_panel, entry_panel = batch_signal_panels(panel, batch_fn)
+        PROFILER.count("batch_signal_calls")
+    else:
+        tables = row_tables(frames)
+    vol = volatility_panel(frames, row_pos) if sizing == "volatility" else None
+
+    # 2. SETUP ACCOUNTS & DCA
+    cash = initial_capital
+    n_dates, n_syms = len(dates), len(symbols)
+    held = np.zeros(n_syms, dtype=bool)
+    qty = np.zeros(n_syms)
+    cost_basis = np.zeros(n_syms)
+    states = {} # col -> strategy state (row-wise strategies)
+    ledger = Ledger(symbols, tz=dates.tz)
+
+    equity = np.empty(n_dates)
+    exposed = np.zeros(n_dates, dtype=bool)
+    flows = np.zeros(n_dates)
+
+    final_dca_amount, final_dca_interval = resolve_dca(dca_amount, dca_interval)
+    dca_enabled = (final_dca_amount > 0)
+    dca_step_ns = int(timedelta(days=final_dca_interval).total_seconds() * 1_000_000_000)
+    next_deposit_ns = int(date_ns[0]) + dca_step_ns
+
+    total_invested = initial_capital
+    strategy_calls = 0
+
+    # 3. MAIN LOOP
+    for i in range(n_dates):
+        pos_today = row_pos[i]
+
+        # --- [A] RECURRING DEPOSIT LOGIC ---
+        if dca_enabled and date_ns[i] >= next_deposit_ns:
+            cash += final_dca_amount
+            total_invested += final_dca_amount
+            flows[i] = final_dca_amount
+            # Logged like the one-position engines: positions without a bar today are left out
+            priced = held & (pos_today >= 0)
+            current_equity = cash + np.dot(qty[priced], close[i, priced])
+            ledger.append(date_ns[i], DEPOSIT, CASH, final_dca_amount, 0.0, current_equity)
+            next_deposit_ns += dca_step_ns
+
+        # --- [B] EXIT LOGIC (each open position with a bar today) ---
+        for col in np.flatnonzero(held & (pos_today >= 0)):
+            price = close[i, col]
+            if batch_fn:
+                decision = "SELL_SIGNAL" if sell_panel[i, col] else "HOLD"
+            else:
+                row = tables[col].row(pos_today[col])
+                current_val = cash + (qty[col] * price)
+                decision, _, states[col], _ = strategy_module.get_decision(row, states[col], symbols[col], current_val)
+                strategy_calls += 1
+
+            if decision == "SELL_SIGNAL":
+                dv = dollar_volume[i, col] if dollar_volume is not None else np.nan
+                sell_price, proceeds, fee = fills.sell(col, price, qty[col], dv)
+                cash += proceeds
+                ledger.append(date_ns[i], SELL, col, sell_price, proceeds - cost_basis[col], cash, qty[col], fee)
+                held[col] = False
+                qty[col] = 0.0
+                states.pop(col, None)
+
+        # --- [C] ENTRY LOGIC (top-k scores into the free slots) ---
+        free = max_positions - int(np.count_nonzero(held))
+        if free > 0 and cash > 0:
+            if batch_fn:
+                scores = np.where(held, -np.inf, entry_panel[i])
+            else:
+                scores = np.full(n_syms, -np.inf)
+                for col in np.flatnonzero((pos_today >= 0) & ~held):
+                    row = tables[col].row(pos_today[col])
+                    decision, _, _, score = strategy_module.get_decision(row, {}, symbols[col], cash)
+                    strategy_calls += 1
+                    if decision == "BUY_SIGNAL" and score > -1:
+                        scores[col] = score
+
+            picks = top_k(scores, free)
+            if len(picks):
+                current_equity = cash + np.dot(qty[held], mark[i, held])
+                sizes = position_sizes(current_equity, cash, max_positions, scores[picks],
+                                       vol[i, picks] if vol is not None else None, sizing)
+                for col, amount in zip(picks, sizes):
+                    dv = dollar_volume[i, col] if dollar_volume is not None else np.nan
+                    buy_price, new_qty, fee = fills.buy(col, close[i, col], amount, dv)
+                    if new_qty > 0:
+                        held[col] = True
+                        qty[col] = new_qty
+                        cost_basis[col] = amount
+                        states[col] = {
+                            "position": 1,
+                            "highest_price": buy_price,
+                            "entry_price": buy_price,
+                            "cooldown": 0
+                        }
+                        cash -= amount
+                        ledger.append(date_ns[i], BUY, col, buy_price, 0.0, cash, new_qty, fee)
+
+        # --- [D] END OF BAR EQUITY (held symbols at their last known close) ---
+        equity[i] = cash + np.dot(qty[held], mark[i, held])
+        exposed[i] = held.any()
+
+    PROFILER.count("bars_simulated", n_dates)
+    PROFILER.count("strategy_calls", strategy_calls)
+
+    # 4. FINAL TALLY
+    final_value = cash
+    for col in np.flatnonzero(held):
+        final_value += qty[col] * column_values(frames[col], 'close')[-1]
+
+    ledger.total_invested = total_invested
+    ledger.curve = EquityCurve(dates, equity, flows, exposed)
+
+    return ledger, final_value
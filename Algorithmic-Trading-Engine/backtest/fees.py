@@ -3,7 +3,7 @@
 def crypto_fee(notional):
     """
     Alpaca crypto fee:
-    0.15% per side (maker/taker blended)
+    0.25% per side (taker, lowest volume tier)
     """
     return notional * 0.0025
 
@@ -1,14 +1,93 @@
 # backtest/ledger.py
+import numpy as np
+import pandas as pd
 from dataclasses import dataclass
 
+# --- COLUMNAR LEDGER ---
+# Trades and deposits live in preallocated NumPy columns (grown by doubling)
+# instead of a list of dicts, and every simulation also hands back a per-bar
+# equity curve. Iterating a Ledger still yields the old row dicts
+# (Date/Action/Symbol/Price/PnL/Balance), so report code reads it as before.
+
+ACTIONS = ("DEPOSIT", "BUY", "SELL")
+DEPOSIT, BUY, SELL = range(len(ACTIONS))
+CASH = -1 # symbol id of deposits
+
 @dataclass
-class Trade:
-    idx: int
-    side: str
-    dt: str
-    conf: dict
-    price: float
-    pnl: float
-    position: float
-    cumulative_pnl: float
+class EquityCurve:
+    dates: pd.DatetimeIndex
+    equity: np.ndarray  # account value at the close of each bar
+    flows: np.ndarray   # cash deposited on each bar (DCA)
+    exposed: np.ndarray # True where a position was held at the close
+
+class Ledger:
+    def __init__(self, symbols, total_invested=0.0, capacity=64, tz="UTC"):
+        self.symbols = list(symbols)
+        self.total_invested = total_invested
+        self.tz = tz
+        self.curve = None
+        self.n = 0
+        self.date_ns = np.empty(capacity, dtype=np.int64)
+        self.action = np.empty(capacity, dtype=np.int8)
+        self.symbol = np.empty(capacity, dtype=np.int32)
+        self.price = np.empty(capacity)
+        self.qty = np.empty(capacity)
+        self.pnl = np.empty(capacity)
+        self.balance = np.empty(capacity)
+        self.fee = np.empty(capacity)
+
+    def _grow(self):
+        for name in ("date_ns", "action", "symbol", "price", "qty", "pnl", "balance", "fee"):
+            old = getattr(self, name)
+            new = np.empty(len(old) * 2, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def append(self, date_ns, action, symbol, price, pnl, balance, qty=0.0, fee=0.0):
+        if self.n == len(self.date_ns):
+            self._grow()
+        i = self.n
+        self.date_ns[i] = date_ns
+        self.action[i] = action
+        self.symbol[i] = symbol
+        self.price[i] = price
+        self.qty[i] = qty
+        self.pnl[i] = pnl
+        self.balance[i] = balance
+        self.fee[i] = fee
+        self.n += 1
+
+    def column(self, name):
+        """Filled part of a column (a view)."""
+        return getattr(self, name)[:self.n]
+
+    @property
+    def n_trades(self):
+        return int(np.count_nonzero(self.column("action") != DEPOSIT))
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        dates = pd.to_datetime(self.column("date_ns"), utc=True)
+        if self.tz is not None and str(self.tz) != "UTC":
+            dates = dates.tz_convert(self.tz)
+        elif self.tz is None:
+            dates = dates.tz_localize(None)
+        for i in range(self.n):
+            sym = self.symbol[i]
+            yield {
+                "Date": dates[i],
+                "Action": ACTIONS[self.action[i]],
+                "Symbol": "CASH" if sym == CASH else self.symbols[sym],
+                "Price": float(self.price[i]),
+                "PnL": float(self.pnl[i]),
+                "Balance": float(self.balance[i]),
+            }
+
+    def to_frame(self):
+        return pd.DataFrame(list(self))
 
+def index_ns(index):
+    """int64 ns of a DatetimeIndex (UTC for tz-aware ones), whatever its unit."""
+    return index.as_unit("ns").asi8
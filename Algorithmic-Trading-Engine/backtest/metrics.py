@@ -0,0 +1,92 @@
+# backtest/metrics.py
+import numpy as np
+
+from backtest.ledger import BUY, SELL
+
+# --- PERFORMANCE METRICS ---
+# Computed in one vectorized pass over the equity curve and the ledger
+# columns. Returns are time-weighted: each bar's DCA deposit is taken out
+# before the return is measured, so deposits never count as performance.
+# Annualization uses the number of bars per calendar year actually seen,
+# which works for daily stocks, 24/7 crypto and intraday bars alike.
+
+NS_PER_YEAR = 365.25 * 24 * 3600 * 1_000_000_000
+
+def bar_returns(curve):
+    equity = curve.equity
+    prev = equity[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = (equity[1:] - curve.flows[1:]) / prev - 1
+    return np.where(prev > 0, returns, 0.0)
+
+def compute_metrics(ledger):
+    """Dict of headline metrics; values are None when they cannot be computed."""
+    metrics = {
+        "cagr": None, "max_drawdown": None, "sharpe": None, "sortino": None,
+        "exposure": None, "turnover": None, "win_rate": None,
+        "trades": ledger.n_trades, "closed_trades": 0,
+        "fees": float(np.sum(ledger.column("fee"))),
+    }
+
+    action = ledger.column("action")
+    sells = action == SELL
+    metrics["closed_trades"] = int(np.count_nonzero(sells))
+    if sells.any():
+        metrics["win_rate"] = float(np.mean(ledger.column("pnl")[sells] > 0))
+
+    curve = ledger.curve
+    if curve is None or len(curve.equity) < 2:
+        return metrics
+
+    metrics["exposure"] = float(np.mean(curve.exposed))
+
+    returns = bar_returns(curve)
+    nav = np.cumprod(1 + returns)
+    peak = np.maximum.accumulate(np.concatenate(([1.0], nav)))
+    metrics["max_drawdown"] = float(np.min(np.concatenate(([1.0], nav)) / peak - 1))
+
+    dates_ns = curve.dates.as_unit("ns").asi8
+    years = (dates_ns[-1] - dates_ns[0]) / NS_PER_YEAR
+    if years <= 0:
+        return metrics
+
+    metrics["cagr"] = float(nav[-1] ** (1 / years) - 1) if nav[-1] > 0 else -1.0
+    bars_per_year = len(returns) / years
+
+    std = np.std(returns, ddof=1) if len(returns) > 1 else 0.0
+    if std > 0:
+        metrics["sharpe"] = float(np.mean(returns) / std * np.sqrt(bars_per_year))
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+    if downside > 0:
+        metrics["sortino"] = float(np.mean(returns) / downside * np.sqrt(bars_per_year))
+
+    # Traded notional (one side per round trip) / average equity, per year
+    trades = (action == BUY) | sells
+    notional = np.sum(ledger.column("qty")[trades] * ledger.column("price")[trades]) / 2
+    avg_equity = np.mean(curve.equity)
+    if avg_equity > 0:
+        metrics["turnover"] = float(notional / avg_equity / years)
+
+    return metrics
+
+def format_metrics(metrics):
+    """Report lines for write_portfolio_backtest."""
+    def pct(v):
+        return "-" if v is None else f"{v * 100:.2f}%"
+
+    def num(v):
+        return "-" if v is None else f"{v:.2f}"
+
+    def usd(v):
+        return "-" if v is None else f"${v:,.2f}"
+
+    return [
+        f"CAGR:     {pct(metrics['cagr'])}",
+        f"MAX DD:   {pct(metrics['max_drawdown'])}",
+        f"SHARPE:   {num(metrics['sharpe'])}",
+        f"SORTINO:  {num(metrics['sortino'])}",
+        f"EXPOSURE: {pct(metrics['exposure'])}",
+        f"TURNOVER: {num(metrics['turnover'])}x / year",
+        f"WIN RATE: {pct(metrics['win_rate'])} of {metrics['closed_trades']} closed trades",
+        f"FEES:     {usd(metrics.get('fees'))}",
+    ]
@@ -0,0 +1,364 @@
+# backtest/montecarlo.py
+import importlib
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+
+from backtest.portfolio import resolve_dca
+from backtest.costs import resolve_costs
+from backtest.ledger import index_ns
+from strategy.indicators import default_indicators
+from strategy.loader import get_batch_signals, get_indicator_specs
+from strategy.registry import compute_indicators
+
+# --- MONTE CARLO ---
+# One historical path says little about robustness, so the strategy is run
+# over many perturbed copies of the fetched bars instead:
+#   block bootstrap - bar returns resampled in blocks of whole dates (every
+#                     symbol takes the same dates, correlations survive)
+#   slippage jitter - every fill's spread + slippage (backtest/costs.py) is
+#                     scaled by a lognormal factor (mean 1)
+#   random start    - the account opens at a random bar of the window
+# Paths are simulated together. Indicators and batch signals run once over
+# (bar, path x symbol) arrays, and the account loop steps through the bars
+# with one array operation for all paths at a time. The rules are those of
+# the panel engine (one position, all in, DCA). Chunks of paths are spread
+# over a process pool, each seeded from its chunk number, so the results do
+# not depend on the worker count.
+
+FIELDS = ("open", "high", "low", "close", "volume")
+PERCENTILES = (5, 25, 50, 75, 95)
+CHUNK_CELLS = 4_000_000 # bars x paths x symbols per chunk (~32 MB per array)
+MAX_CHUNK = 256
+
+@dataclass
+class History:
+    dates: pd.DatetimeIndex
+    symbols: list
+    bars: dict            # field -> (n_dates, n_symbols), NaN = no bar
+    log_returns: dict     # field -> (n_dates, n_symbols) close-to-close for
+                          # close, log(field / close) for the others
+
+def build_history(raw_map):
+    """Raw bars ({symbol: DataFrame}) aligned onto the union of their dates."""
+    frames = {}
+    for symbol, df in raw_map.items():
+        if df.empty:
+            continue
+        df = df.rename(columns=str.lower).sort_values("timestamp")
+        frames[symbol] = df.set_index("timestamp")
+    if not frames:
+        return None
+
+    symbols = list(frames)
+    dates = frames[symbols[0]].index
+    if len(symbols) > 1:
+        dates = dates.append([frames[s].index for s in symbols[1:]])
+    dates = dates.unique().sort_values()
+
+    bars = {field: np.full((len(dates), len(symbols)), np.nan) for field in FIELDS}
+    for j, symbol in enumerate(symbols):
+        df = frames[symbol]
+        pos = dates.get_indexer(df.index)
+        for field in FIELDS:
+            if field in df.columns:
+                bars[field][pos, j] = df[field].to_numpy(dtype=float)
+
+    close = bars["close"]
+    prev_close = pd.DataFrame(close).ffill().shift(1).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_returns = {"close": np.log(close / prev_close)}
+        for field in ("open", "high", "low"):
+            log_returns[field] = np.log(bars[field] / close)
+    # First bar of a symbol: present, no move
+    first = np.isfinite(close) & ~np.isfinite(prev_close)
+    log_returns["close"][first] = 0.0
+
+    return History(dates, symbols, bars, log_returns)
+
+# --- PATH GENERATION ---
+
+def bootstrap_index(rng, n_dates, n_paths, block_size):
+    """(n_dates, n_paths) source bar of every path bar; consecutive blocks of block_size."""
+    if block_size <= 0 or block_size >= n_dates:
+        return np.repeat(np.arange(n_dates)[:, None], n_paths, axis=1)
+    n_blocks = -(-n_dates // block_size)
+    starts = rng.integers(0, n_dates - block_size + 1, size=(n_blocks, n_paths))
+    idx = starts[:, None, :] + np.arange(block_size)[None, :, None]
+    return idx.reshape(n_blocks * block_size, n_paths)[:n_dates]
+
+class PathFields(dict):
+    """
+    field -> (n_dates, n_paths * n_symbols) bars of every path, built on
+    first use (only what the indicators read is ever materialized). Each
+    column is packed by bar number (bars first, then NaN) so rolling windows
+    span a symbol's own bars, like the per-symbol pipeline.
+    """
+
+    def __init__(self, history, idx):
+        super().__init__()
+        self.history = history
+        self.n_paths = idx.shape[1]
+        self.historical = bool(np.all(idx == np.arange(len(idx))[:, None]))
+        self.idx = idx
+        close = self._raw("close")
+        self.present = np.isfinite(close)
+        self.order = np.argsort(~self.present, axis=0, kind="stable")
+        self["close"] = self.pack(close)
+
+    def _raw(self, field):
+        """Unpacked (n_dates, n_paths * n_symbols) values of one field."""
+        history = self.history
+        n_dates, n_syms = history.bars["close"].shape
+        if self.historical:
+            values = np.tile(history.bars[field], (1, self.n_paths))
+        elif field == "volume":
+            values = history.bars[field][self.idx].reshape(n_dates, -1)
+        elif field == "close":
+            returns = history.log_returns["close"][self.idx] # (n_dates, n_paths, n_syms)
+            first_close = pd.DataFrame(history.bars["close"]).bfill().to_numpy()[0]
+            level = np.cumsum(np.nan_to_num(returns), axis=0)
+            values = np.where(np.isfinite(returns), first_close * np.exp(level), np.nan).reshape(n_dates, -1)
+        else:
+            close = self.unpack(self["close"])
+            values = close * np.exp(history.log_returns[field][self.idx].reshape(n_dates, -1))
+        return values
+
+    def pack(self, values):
+        return pd.DataFrame(np.take_along_axis(values, self.order, axis=0))
+
+    def unpack(self, packed):
+        packed = np.asarray(packed, dtype=float)
+        out = np.full(packed.shape, np.nan)
+        np.put_along_axis(out, self.order, packed, axis=0)
+        out[~self.present] = np.nan
+        return out
+
+    def __missing__(self, field):
+        if field not in FIELDS:
+            raise KeyError(field)
+        self[field] = self.pack(self._raw(field))
+        return self[field]
+
+class _Columns:
+    """Batch strategy input: column -> (n_dates, n_paths, n_symbols)."""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def get(self, name, default=None):
+        return self.columns.get(name, default)
+
+# --- SIMULATION ---
+
+def simulate_paths(history, strategy_module, specs, n_paths, rng, initial_capital,
+                   dca_amount=None, dca_interval=None, block_size=20, slippage_jitter=0.0,
+                   random_start=False, min_bars=0, costs=None):
+    """
+    n_paths perturbed runs at once. Returns a DataFrame with one row per
+    path: final_equity, invested, roi (%), max_drawdown, trades, start.
+    """
+    batch_fn = get_batch_signals(strategy_module)
+    if batch_fn is None:
+        raise ValueError("Monte Carlo needs a strategy with get_batch_signals")
+
+    dates = history.dates
+    n_dates, n_syms = len(dates), len(history.symbols)
+    shape = (n_dates, n_paths, n_syms)
+
+    idx = bootstrap_index(rng, n_dates, n_paths, block_size)
+    fields = PathFields(history, idx)
+    columns = {"close": fields.unpack(fields["close"]).reshape(shape)}
+    for column, packed in compute_indicators(fields, specs).items():
+        columns[column] = fields.unpack(packed).reshape(shape)
+    fills = resolve_costs(costs).for_symbols(history.symbols)
+    dollar_volume = None
+    if fills.needs_volume:
+        dollar_volume = columns["close"] * fields.unpack(fields["volume"]).reshape(shape)
+    del fields
+
+    # A bar counts once every indicator is warmed up (prepare_data's dropna)
+    has_bar = np.isfinite(columns["close"])
+    for column in specs:
+        has_bar &= np.isfinite(columns[column])
+
+    buy, sell, score = batch_fn(_Columns(columns))
+    sell = np.asarray(sell, dtype=bool) & has_bar
+    buy = np.asarray(buy, dtype=bool) & has_bar
+    score = np.broadcast_to(np.asarray(score, dtype=float), shape)
+    entry = np.where(buy & (score > -1), score, -np.inf)
+    has_entry = entry.max(axis=2) > -np.inf
+    del buy, score
+
+    close = columns["close"]
+    mark = pd.DataFrame(np.where(has_bar, close, np.nan).reshape(n_dates, -1)).ffill().to_numpy().reshape(shape)
+
+    # Account opens at the first usable bar, or a random one after it
+    any_bar = has_bar.any(axis=2)
+    start = np.where(any_bar.any(axis=0), np.argmax(any_bar, axis=0), n_dates)
+    if random_start:
+        span = np.maximum(n_dates - start - max(min_bars, 1), 0)
+        start = start + (rng.random(n_paths) * (span + 1)).astype(np.int64)
+
+    jitter = np.ones((n_dates, n_paths))
+    if slippage_jitter > 0:
+        jitter = np.exp(slippage_jitter * rng.standard_normal((n_dates, n_paths)) - slippage_jitter ** 2 / 2)
+
+    amount, interval = resolve_dca(dca_amount, dca_interval)
+    dca_enabled = amount > 0
+    date_ns = index_ns(dates)
+    step_ns = int(timedelta(days=interval).total_seconds() * 1_000_000_000)
+    next_deposit = date_ns[np.minimum(start, n_dates - 1)] + step_ns
+
+    paths = np.arange(n_paths)
+    cash = np.full(n_paths, float(initial_capital))
+    invested = cash.copy()
+    col = np.full(n_paths, -1, dtype=np.int64)
+    qty = np.zeros(n_paths)
+    trades = np.zeros(n_paths, dtype=np.int64)
+    prev_equity = np.zeros(n_paths)
+    nav = np.ones(n_paths)
+    peak = np.ones(n_paths)
+    max_dd = np.zeros(n_paths)
+
+    for i in range(int(start.min()), n_dates):
+        live = start <= i
+        flow = np.zeros(n_paths)
+
+        # --- [A] DEPOSITS ---
+        if dca_enabled:
+            deposit = live & (date_ns[i] >= next_deposit)
+            cash[deposit] += amount
+            invested[deposit] += amount
+            flow[deposit] = amount
+            next_deposit[deposit] += step_ns
+
+        # --- [B] EXITS ---
+        held = col >= 0
+        held_col = np.where(held, col, 0)
+        exit_ = held & sell[i, paths, held_col]
+        if exit_.any():
+            p = paths[exit_]
+            c = held_col[p]
+            dv = dollar_volume[i, p, c] if dollar_volume is not None else np.nan
+            _, proceeds, _ = fills.sell(c, close[i, p, c], qty[p], dv, jitter[i, p])
+            cash[p] += proceeds
+            qty[p] = 0.0
+            col[p] = -1
+            trades[p] += 1
+
+        # --- [C] ENTRIES ---
+        enter = live & (col < 0) & (cash > 0) & has_entry[i]
+        if enter.any():
+            p = paths[enter]
+            best = np.argmax(entry[i, p], axis=1)
+            dv = dollar_volume[i, p, best] if dollar_volume is not None else np.nan
+            _, bought, _ = fills.buy(best, close[i, p, best], cash[p], dv, jitter[i, p])
+            placed = bought > 0 # below min_notional: stays in cash
+            p, best = p[placed], best[placed]
+            qty[p] = bought[placed]
+            col[p] = best
+            cash[p] = 0.0
+            trades[p] += 1
+
+        # --- [D] EQUITY & DRAWDOWN (time-weighted, deposits taken out) ---
+        held = col >= 0
+        equity = cash + np.where(held, qty * mark[i, paths, np.where(held, col, 0)], 0.0)
+        step = live & (start < i) & (prev_equity > 0)
+        nav[step] *= (equity[step] - flow[step]) / prev_equity[step]
+        peak = np.maximum(peak, nav)
+        max_dd = np.minimum(max_dd, nav / peak - 1)
+        prev_equity = np.where(live, equity, prev_equity)
+
+    final_equity = np.where(start < n_dates, prev_equity, cash)
+    return pd.DataFrame({
+        "final_equity": final_equity,
+        "invested": invested,
+        "roi": np.where(invested > 0, (final_equity - invested) / invested * 100, 0.0),
+        "max_drawdown": max_dd,
+        "trades": trades,
+        "start": dates[np.minimum(start, n_dates - 1)],
+    })
+
+# --- WORKER SIDE ---
+_WORKER = {}
+
+def _init_worker(history, strategy_name, specs, options):
+    _WORKER.update({
+        "history": history,
+        "strategy": importlib.import_module(strategy_name),
+        "specs": specs,
+        "options": options,
+    })
+
+def _run_chunk(task):
+    seed, n_paths = task
+    return simulate_paths(_WORKER["history"], _WORKER["strategy"], _WORKER["specs"], n_paths,
+                          np.random.default_rng(seed), **_WORKER["options"])
+
+def run_monte_carlo(raw_map, strategy_module, initial_capital, n_paths=1000, dca_amount=None, dca_interval=None,
+                    block_size=20, slippage_jitter=0.5, random_start=True, min_bars=252,
+                    seed=None, chunk_size=0, workers=0, costs=None):
+    """
+    Simulates n_paths perturbed histories of raw_map. Returns the per-path
+    DataFrame (see simulate_paths), or an empty one without data.
+    chunk_size: paths simulated together, 0 = sized from CHUNK_CELLS.
+    workers: 1 = serial, 0/None = one process per CPU core.
+    """
+    history = build_history(raw_map)
+    if history is None:
+        return pd.DataFrame()
+
+    if not chunk_size:
+        chunk_size = min(MAX_CHUNK, max(1, CHUNK_CELLS // history.bars["close"].size))
+
+    specs = get_indicator_specs(strategy_module) or default_indicators()
+    options = {
+        "initial_capital": initial_capital, "dca_amount": dca_amount, "dca_interval": dca_interval,
+        "block_size": block_size, "slippage_jitter": slippage_jitter,
+        "random_start": random_start, "min_bars": min_bars, "costs": resolve_costs(costs),
+    }
+
+    sizes = [min(chunk_size, n_paths - k) for k in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = list(zip(seeds, sizes))
+
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+
+    if workers <= 1:
+        _init_worker(history, strategy_module.__name__, specs, options)
+        chunks = [_run_chunk(task) for task in tasks]
+    else:
+        init_args = (history, strategy_module.__name__, specs, options)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            chunks = list(pool.map(_run_chunk, tasks))
+
+    results = pd.concat(chunks, ignore_index=True)
+    results.index.name = "path"
+    return results
+
+def summarize(results):
+    """Distribution table: mean and percentiles of final equity, ROI and drawdown."""
+    stats = {}
+    for column in ("final_equity", "roi", "max_drawdown", "trades"):
+        values = results[column].to_numpy(dtype=float)
+        row = {"mean": values.mean()}
+        row.update({f"p{q}": v for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))})
+        stats[column] = row
+    return pd.DataFrame(stats).T
+
+def format_summary(results):
+    lines = [summarize(results).to_string(float_format=lambda v: f"{v:,.2f}")]
+    lines.append(f"P(loss):  {np.mean(results['roi'] < 0) * 100:.1f}% of {len(results)} paths")
+    return lines
@@ -1,45 +1,79 @@
 # backtest/portfolio.py
+import numpy as np
 import pandas as pd
 import os
 from datetime import datetime, timedelta
-from strategy.indicators import prepare_data
+from strategy.indicators import prepare_for_strategy
+from strategy.loader import get_indicator_specs
+from backtest.profiling import PROFILER
+from backtest.ledger import Ledger, EquityCurve, DEPOSIT, BUY, SELL, CASH, index_ns
+from backtest.metrics import compute_metrics, format_metrics
+from backtest.costs import resolve_costs, dollar_volume
+from backtest.rows import RowTable
 
 # Use the config defaults, but allow overrides
 from config import RECURRING_INVESTMENT, DEFAULT_RECURRING_INVESTMENT
 
-SLIPPAGE = 0.0003
+# Columns prepare_data adds; frames that already have them are used as-is
+INDICATOR_COLUMNS = ('donchian_high', 'donchian_low')
 
-def run_portfolio_simulation(ticker_data_map, initial_capital, strategy_module, dca_amount=None, dca_interval=None):
-    
-    # 1. PREPARE DATA
+def indicator_columns(strategy_module=None):
+    """Columns that mark a frame as prepared for this strategy."""
+    specs = get_indicator_specs(strategy_module)
+    return tuple(specs) if specs else INDICATOR_COLUMNS
+
+def prepare_ticker_data(ticker_data_map, strategy_module=None):
+    """Shared input step for every simulation engine."""
+    required = indicator_columns(strategy_module)
     processed_data = {}
     for symbol, df in ticker_data_map.items():
         # Ensure data is prepped (if not already)
-        if 'sma_40' not in df.columns:
-            pdf = prepare_data(df)
+        if not all(col in df.columns for col in required):
+            pdf = prepare_for_strategy(df, strategy_module, symbol)
         else:
             pdf = df
             
         if not pdf.empty:
             processed_data[symbol] = pdf
+    return processed_data
+
+def resolve_dca(dca_amount=None, dca_interval=None):
+    config_amount = RECURRING_INVESTMENT.get("amount", DEFAULT_RECURRING_INVESTMENT["amount"])
+    config_interval = RECURRING_INVESTMENT.get("interval_days", DEFAULT_RECURRING_INVESTMENT["interval_days"])
+
+    # Priority: Function Args > Config File
+    final_dca_amount = dca_amount if dca_amount is not None else config_amount
+    final_dca_interval = dca_interval if dca_interval is not None else config_interval
+    return final_dca_amount, final_dca_interval
+
+def run_portfolio_simulation(ticker_data_map, initial_capital, strategy_module, dca_amount=None, dca_interval=None, costs=None):
+    
+    # 1. PREPARE DATA
+    processed_data = prepare_ticker_data(ticker_data_map, strategy_module)
 
     if not processed_data:
-        return [], initial_capital
+        return Ledger([], initial_capital), initial_capital
 
-    all_dates = sorted(list(set().union(*[df.index for df in processed_data.values()])))
+    with PROFILER.stage("date_union"):
+        all_dates = sorted(list(set().union(*[df.index for df in processed_data.values()])))
+        # Row views for get_decision (backtest/rows.py) and date -> row number per symbol
+        tables = {symbol: RowTable.from_frame(df) for symbol, df in processed_data.items()}
+        row_of = {symbol: dict(zip(index_ns(df.index).tolist(), range(len(df)))) for symbol, df in processed_data.items()}
     
     # 2. SETUP ACCOUNTS & DCA
     cash = initial_capital
     holdings = None # Strict One Position
-    ledger = []
+    symbol_ids = {symbol: j for j, symbol in enumerate(processed_data)}
+    ledger = Ledger(symbol_ids, tz=all_dates[0].tz)
+    fills = resolve_costs(costs).for_symbols(list(symbol_ids))
+    
+    # End-of-bar equity curve
+    equity = np.empty(len(all_dates))
+    flows = np.zeros(len(all_dates))
+    exposed = np.zeros(len(all_dates), dtype=bool)
     
     # --- DCA CONFIG ---
-    config_amount = RECURRING_INVESTMENT.get("amount", DEFAULT_RECURRING_INVESTMENT["amount"])
-    config_interval = RECURRING_INVESTMENT.get("interval_days", DEFAULT_RECURRING_INVESTMENT["interval_days"])
-
-    # Priority: Function Args > Config File
-    final_dca_amount = dca_amount if dca_amount is not None else config_amount
-    final_dca_interval = dca_interval if dca_interval is not None else config_interval
+    final_dca_amount, final_dca_interval = resolve_dca(dca_amount, dca_interval)
     
     # Enable if amount > 0
     dca_enabled = (final_dca_amount > 0)
@@ -51,14 +85,16 @@ def run_portfolio_simulation(ticker_data_map, initial_capital, strategy_module,
         next_deposit_date = datetime.now() # Fallback
 
     total_invested = initial_capital
+    strategy_calls = 0
 
     # 3. MAIN LOOP
-    for current_date in all_dates:
+    for i, current_date in enumerate(all_dates):
         
         # --- [A] RECURRING DEPOSIT LOGIC ---
         if dca_enabled and current_date >= next_deposit_date:
             cash += final_dca_amount
             total_invested += final_dca_amount
+            flows[i] = final_dca_amount
             
             # Calculate Total Balance for Log
             current_equity = cash
@@ -66,18 +102,12 @@ def run_portfolio_simulation(ticker_data_map, initial_capital, strategy_module,
                 # If we hold stock, add its value
                 # We need the price for TODAY to show accurate balance in log
                 sym = holdings['symbol']
-                if current_date in processed_data[sym].index:
-                    price_now = processed_data[sym].loc[current_date]['close']
+                pos = row_of[sym].get(current_date.value)
+                if pos is not None:
+                    price_now = tables[sym].row(pos)['close']
                     current_equity += holdings['qty'] * price_now
             
-            ledger.append({
-                "Date": current_date, 
-                "Action": "DEPOSIT", 
-                "Symbol": "CASH", 
-                "Price": final_dca_amount, 
-                "PnL": 0, 
-                "Balance": current_equity
-            })
+            ledger.append(current_date.value, DEPOSIT, CASH, final_dca_amount, 0.0, current_equity)
             
             # Schedule next deposit
             next_deposit_date += timedelta(days=final_dca_interval)
@@ -87,9 +117,10 @@ def run_portfolio_simulation(ticker_data_map, initial_capital, strategy_module,
         if holdings:
             symbol = holdings['symbol']
             # Only process if we have data for this symbol today
-            if symbol in processed_data and current_date in processed_data[symbol].index:
-                df = processed_data[symbol]
-                row = df.loc[current_date]
+            pos = row_of[symbol].get(current_date.value) if symbol in processed_data else None
+            if pos is not None:
+                row = tables[symbol].row(pos)
+                holdings['mark'] = row['close']
                 
                 # Calculate current equity for the strategy to see
                 current_val = cash + (holdings['qty'] * row['close'])
@@ -97,20 +128,14 @@ def run_portfolio_simulation(ticker_data_map, initial_capital, strategy_module,
                 # CALL STRATEGY (With Persistent State)
                 decision, _, new_state, _ = strategy_module.get_decision(row, holdings['state'], symbol, current_val)
                 holdings['state'] = new_state
+                strategy_calls += 1
                 
                 if decision == "SELL_SIGNAL":
-                    sell_price = row['close'] * (1 - SLIPPAGE)
-                    revenue = holdings['qty'] * sell_price
-                    profit = revenue - holdings['cost_basis']
-                    cash += revenue
-                    ledger.append({
-                        "Date": current_date, 
-                        "Action": "SELL", 
-                        "Symbol": symbol, 
-                        "Price": sell_price, 
-                        "PnL": profit, 
-                        "Balance": cash
-                    })
+                    col = symbol_ids[symbol]
+                    sell_price, proceeds, fee = fills.sell(col, row['close'], holdings['qty'], dollar_volume(row))
+                    profit = proceeds - holdings['cost_basis']
+                    cash += proceeds
+                    ledger.append(current_date.value, SELL, col, sell_price, profit, cash, holdings['qty'], fee)
                     holdings = None
 
         # --- [C] ENTRY LOGIC ---
@@ -120,25 +145,29 @@ def run_portfolio_simulation(ticker_data_map, initial_capital, strategy_module,
             best_pick = None
             
             # Scan all symbols to find the best one
-            for symbol, df in processed_data.items():
-                if current_date in df.index:
-                    row = df.loc[current_date]
+            for symbol, table in tables.items():
+                pos = row_of[symbol].get(current_date.value)
+                if pos is not None:
+                    row = table.row(pos)
                     # Pass empty state {} because we are not in a position
                     decision, _, _, score = strategy_module.get_decision(row, {}, symbol, cash)
+                    strategy_calls += 1
                     
                     if decision == "BUY_SIGNAL" and score > best_score:
                         best_score = score
-                        best_pick = {"symbol": symbol, "price": row['close']}
+                        best_pick = {"symbol": symbol, "price": row['close'], "dollar_volume": dollar_volume(row)}
             
             if best_pick:
-                buy_price = best_pick['price'] * (1 + SLIPPAGE)
-                qty = cash / buy_price # ALL IN
+                col = symbol_ids[best_pick['symbol']]
+                buy_price, qty, fee = fills.buy(col, best_pick['price'], cash, best_pick['dollar_volume']) # ALL IN
+                qty = float(qty)
                 
                 if qty > 0:
                     holdings = {
                         "symbol": best_pick['symbol'], 
                         "qty": qty, 
                         "cost_basis": cash, 
+                        "mark": best_pick['price'], 
                         # Initialize State
                         "state": {
                             "position": 1, 
@@ -148,36 +177,39 @@ def run_portfolio_simulation(ticker_data_map, initial_capital, strategy_module,
                         }
                     }
                     cash = 0
-                    ledger.append({
-                        "Date": current_date, 
-                        "Action": "BUY", 
-                        "Symbol": best_pick['symbol'], 
-                        "Price": buy_price, 
-                        "PnL": 0, 
-                        "Balance": 0
-                    })
+                    ledger.append(current_date.value, BUY, col, buy_price, 0.0, 0.0, qty, fee)
+
+        # --- [D] END OF BAR EQUITY ---
+        equity[i] = cash
+        if holdings:
+            equity[i] += holdings['qty'] * holdings['mark']
+            exposed[i] = True
+
+    PROFILER.count("bars_simulated", len(all_dates))
+    PROFILER.count("strategy_calls", strategy_calls)
 
     # 4. FINAL TALLY
+    # Cash deposited while holding stays in the account
     final_value = cash
     if holdings and holdings['symbol'] in processed_data:
         sym = holdings['symbol']
         last_price = processed_data[sym].iloc[-1]['close']
-        final_value = holdings['qty'] * last_price
+        final_value += holdings['qty'] * last_price
     
-    # Store Total Invested for the Writer to calculate ROI
-    ledger.append({"TOTAL_INVESTED": total_invested})
+    # Total Invested lets the Writer calculate ROI
+    ledger.total_invested = total_invested
+    ledger.curve = EquityCurve(pd.DatetimeIndex(all_dates), equity, flows, exposed)
     
     return ledger, final_value
 
-def write_portfolio_backtest(ledger, final_equity, strategy_name, period_label, universe_name):
+def write_portfolio_backtest(ledger, final_equity, strategy_name, period_label, universe_name, metrics=None):
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     folder = os.path.join("backtest", "results", strategy_name)
     os.makedirs(folder, exist_ok=True)
     
-    # Extract Total Invested if hidden in ledger
-    total_invested = 1000.0 # fallback
-    if ledger and isinstance(ledger[-1], dict) and "TOTAL_INVESTED" in ledger[-1]:
-        total_invested = ledger.pop()['TOTAL_INVESTED']
+    total_invested = ledger.total_invested
+    if metrics is None:
+        metrics = compute_metrics(ledger)
 
     roi = ((final_equity - total_invested) / total_invested) * 100 if total_invested > 0 else 0
     
@@ -191,6 +223,8 @@ def write_portfolio_backtest(ledger, final_equity, strategy_name, period_label,
         f.write(f"INVESTED: ${total_invested:,.2f}\n")
         f.write(f"FINAL:    ${final_equity:,.2f}\n")
         f.write(f"RETURN:   {roi:.2f}%\n")
+        for line in format_metrics(metrics):
+            f.write(line + "\n")
         f.write("-" * 65 + "\n")
         
         for t in ledger:
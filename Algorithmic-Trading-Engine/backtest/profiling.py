@@ -0,0 +1,100 @@
+# backtest/profiling.py
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+
+from config import PROFILE_ENABLED
+
+# --- PIPELINE PROFILER ---
+# Stage timers and counters for a batch run (fetch, prepare_data, date
+# union, signals, simulation loop, report writer). When disabled, stage()
+# hands back one shared no-op context and count() returns immediately, so
+# the instrumented code pays almost nothing. Hot loops count locally and
+# report once per simulation.
+
+_NULL_STAGE = contextlib.nullcontext()
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        entry = self.profiler.stages.setdefault(self.name, [0.0, 0])
+        entry[0] += time.perf_counter() - self.t0
+        entry[1] += 1
+        return False
+
+class Profiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}   # name -> [seconds, calls]
+        self.counters = {} # name -> int
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        self.stages = {}
+        self.counters = {}
+
+    def snapshot(self):
+        return {
+            "stages": {name: {"seconds": s, "calls": c} for name, (s, c) in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def merge(self, snapshot):
+        """Adds a snapshot taken in another process (batch workers)."""
+        for name, stage in snapshot["stages"].items():
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += stage["seconds"]
+            entry[1] += stage["calls"]
+        for name, n in snapshot["counters"].items():
+            self.count(name, n)
+
+    def summary(self):
+        # Stages nest (simulation includes date_union and signals), so no shares
+        lines = ["--- PROFILE ---"]
+        for name, (seconds, calls) in sorted(self.stages.items(), key=lambda kv: -kv[1][0]):
+            lines.append(f"{name:<16} {seconds:>11.3f}s  x{calls}")
+        for name, n in sorted(self.counters.items()):
+            lines.append(f"{name:<16} {n:>12,}")
+        bars = self.counters.get("bars_simulated")
+        if bars:
+            lines.append(f"{'calls/bar':<16} {self.counters.get('strategy_calls', 0) / bars:>12.2f}")
+        return "\n".join(lines)
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+PROFILER = Profiler(PROFILE_ENABLED)
+
+def run_profiled(path, fn, *args, **kwargs):
+    """Runs fn under cProfile, saves the stats to path and prints the top entries."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    profile = cProfile.Profile()
+    result = profile.runcall(fn, *args, **kwargs)
+    profile.dump_stats(path)
+
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(15)
+    print(out.getvalue())
+    print(f"cProfile: {path} (python -m pstats {path})")
+    return result
@@ -0,0 +1,251 @@
+# backtest/results_db.py
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+from backtest.ledger import Ledger, ACTIONS, CASH
+from backtest.metrics import compute_metrics
+from config import RESULTS_DB
+
+# --- BACKTEST RESULTS DATABASE ---
+# Every simulated period becomes one row in `runs` (metadata, parameters,
+# summary metrics) plus its ledger in `trades`. A whole batch is written in
+# a single transaction. Indexes on strategy/universe/period keep ranking
+# queries fast with tens of thousands of runs. The text report is an
+# optional export (write_portfolio_backtest).
+#
+#   python -m backtest.results_db rank --strategy "Donchian" --metric sharpe
+#   python -m backtest.results_db compare 12 13 14
+#   python -m backtest.results_db trades 12
+#   python -m backtest.results_db export 12
+
+METRICS = ("roi", "cagr", "max_drawdown", "sharpe", "sortino", "exposure", "turnover", "win_rate", "trades", "final_equity")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id              INTEGER PRIMARY KEY,
+    batch_id        TEXT NOT NULL,
+    created         REAL NOT NULL,
+    strategy        TEXT NOT NULL,
+    universe        TEXT NOT NULL,
+    period          TEXT NOT NULL,
+    start_days      INTEGER,
+    end_days        INTEGER,
+    params          TEXT NOT NULL,
+    invested        REAL,
+    final_equity    REAL,
+    roi             REAL,
+    cagr            REAL,
+    max_drawdown    REAL,
+    sharpe          REAL,
+    sortino         REAL,
+    exposure        REAL,
+    turnover        REAL,
+    win_rate        REAL,
+    trades          INTEGER
+);
+CREATE TABLE IF NOT EXISTS trades (
+    run_id   INTEGER NOT NULL REFERENCES runs(id),
+    date_ns  INTEGER NOT NULL,
+    action   TEXT NOT NULL,
+    symbol   TEXT NOT NULL,
+    price    REAL,
+    qty      REAL,
+    pnl      REAL,
+    balance  REAL,
+    fee      REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_strategy ON runs(strategy, universe, period);
+CREATE INDEX IF NOT EXISTS idx_runs_universe ON runs(universe);
+CREATE INDEX IF NOT EXISTS idx_runs_period ON runs(period);
+CREATE INDEX IF NOT EXISTS idx_runs_batch ON runs(batch_id);
+CREATE INDEX IF NOT EXISTS idx_trades_run ON trades(run_id);
+"""
+
+RUN_COLUMNS = ("batch_id", "created", "strategy", "universe", "period", "start_days", "end_days", "params",
+               "invested", "final_equity", "roi", "cagr", "max_drawdown", "sharpe", "sortino",
+               "exposure", "turnover", "win_rate", "trades")
+
+# Columns added after the first release: (table, column, type), added to older files on open
+MIGRATIONS = (
+    ("trades", "fee", "REAL"),
+)
+
+def new_batch_id():
+    return time.strftime("%Y%m%d_%H%M%S_") + uuid.uuid4().hex[:6]
+
+def run_record(batch_id, strategy, universe, period, ledger, final_equity, params=None):
+    """One simulated period -> record for ResultsDB.add_runs."""
+    start_days, end_days = period
+    invested = ledger.total_invested
+    metrics = compute_metrics(ledger)
+    record = {
+        "batch_id": batch_id,
+        "created": time.time(),
+        "strategy": strategy,
+        "universe": universe,
+        "period": f"{start_days}-{end_days}",
+        "start_days": start_days,
+        "end_days": end_days,
+        "params": json.dumps(params or {}, sort_keys=True),
+        "invested": float(invested),
+        "final_equity": float(final_equity),
+        "roi": ((final_equity - invested) / invested) * 100 if invested > 0 else 0.0,
+    }
+    record.update({k: metrics[k] for k in ("cagr", "max_drawdown", "sharpe", "sortino", "exposure", "turnover", "win_rate", "trades")})
+
+    symbols = np.array(["CASH"] + ledger.symbols, dtype=object)
+    record["trade_rows"] = list(zip(
+        ledger.column("date_ns").tolist(),
+        [ACTIONS[a] for a in ledger.column("action")],
+        symbols[ledger.column("symbol") + 1].tolist(), # CASH = -1 -> 0
+        ledger.column("price").tolist(),
+        ledger.column("qty").tolist(),
+        ledger.column("pnl").tolist(),
+        ledger.column("balance").tolist(),
+        ledger.column("fee").tolist(),
+    ))
+    return record
+
+class ResultsDB:
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        for table, column, kind in MIGRATIONS:
+            existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+    def add_runs(self, records):
+        """Bulk insert in one transaction. Returns the new run ids."""
+        run_sql = f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})"
+        ids = []
+        trade_rows = []
+        with self.conn:
+            self.conn.execute("BEGIN")
+            for record in records:
+                cur = self.conn.execute(run_sql, [record[c] for c in RUN_COLUMNS])
+                ids.append(cur.lastrowid)
+                trade_rows.extend((cur.lastrowid, *row) for row in record["trade_rows"])
+            self.conn.executemany(
+                "INSERT INTO trades (run_id, date_ns, action, symbol, price, qty, pnl, balance, fee) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                trade_rows
+            )
+        return ids
+
+    def _query(self, sql, params=()):
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def rank(self, metric="roi", strategy=None, universe=None, period=None, batch_id=None, limit=20, ascending=False):
+        """Best runs by one metric (max_drawdown: closest to 0 is best)."""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric} (choose from {', '.join(METRICS)})")
+        where, params = [], []
+        for column, value in (("strategy", strategy), ("universe", universe), ("period", period), ("batch_id", batch_id)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT id, strategy, universe, period, params, " + ", ".join(METRICS) + " FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {metric} IS NULL, {metric} {'ASC' if ascending else 'DESC'} LIMIT ?"
+        params.append(int(limit))
+        return self._query(sql, params).set_index("id")
+
+    def compare(self, run_ids):
+        """Metrics of several runs side by side (one column per run)."""
+        marks = ", ".join("?" * len(run_ids))
+        df = self._query(f"SELECT * FROM runs WHERE id IN ({marks})", list(run_ids))
+        return df.set_index("id").drop(columns=["created"]).T
+
+    def trades(self, run_id):
+        df = self._query("SELECT date_ns, action, symbol, price, qty, pnl, balance, fee FROM trades WHERE run_id = ? ORDER BY rowid", (run_id,))
+        df.insert(0, "date", pd.to_datetime(df.pop("date_ns"), utc=True))
+        return df
+
+    def run(self, run_id):
+        df = self._query("SELECT * FROM runs WHERE id = ?", (run_id,))
+        if df.empty:
+            raise KeyError(f"No run with id {run_id}")
+        return df.iloc[0].to_dict()
+
+    def load_ledger(self, run_id):
+        """Rebuilds the Ledger of a run (without its equity curve)."""
+        run = self.run(run_id)
+        trades = self.trades(run_id)
+        symbols = sorted(set(trades["symbol"]) - {"CASH"})
+        ids = {s: j for j, s in enumerate(symbols)}
+        ledger = Ledger(symbols, run["invested"], capacity=max(1, len(trades)))
+        for row in trades.itertuples(index=False):
+            ledger.append(row.date.value, ACTIONS.index(row.action), ids.get(row.symbol, CASH),
+                          row.price, row.pnl, row.balance, row.qty, 0.0 if pd.isna(row.fee) else row.fee)
+        return run, ledger
+
+    def export_text(self, run_id):
+        """Writes the classic text report for one stored run."""
+        from backtest.portfolio import write_portfolio_backtest
+
+        run, ledger = self.load_ledger(run_id)
+        metrics = {k: run[k] for k in ("cagr", "max_drawdown", "sharpe", "sortino", "exposure", "turnover", "win_rate", "trades")}
+        metrics["closed_trades"] = int(np.count_nonzero(ledger.column("action") == ACTIONS.index("SELL")))
+        write_portfolio_backtest(ledger, run["final_equity"], run["strategy"], run["period"], run["universe"], metrics=metrics)
+
+    def close(self):
+        self.conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the backtest results database.")
+    parser.add_argument("--db", default=RESULTS_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rank = sub.add_parser("rank", help="best runs by a metric")
+    rank.add_argument("--metric", default="roi", choices=METRICS)
+    rank.add_argument("--strategy")
+    rank.add_argument("--universe")
+    rank.add_argument("--period")
+    rank.add_argument("--batch")
+    rank.add_argument("--limit", type=int, default=20)
+    rank.add_argument("--ascending", action="store_true")
+
+    compare = sub.add_parser("compare", help="runs side by side")
+    compare.add_argument("run_ids", type=int, nargs="+")
+
+    trades = sub.add_parser("trades", help="ledger of one run")
+    trades.add_argument("run_id", type=int)
+
+    export = sub.add_parser("export", help="text report of one run")
+    export.add_argument("run_id", type=int)
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"No results database at {args.db}")
+        return 1
+
+    db = ResultsDB(args.db)
+    with pd.option_context("display.width", 200, "display.max_columns", 30, "display.max_rows", 500):
+        if args.command == "rank":
+            print(db.rank(args.metric, args.strategy, args.universe, args.period, args.batch, args.limit, args.ascending))
+        elif args.command == "compare":
+            print(db.compare(args.run_ids))
+        elif args.command == "trades":
+            print(db.trades(args.run_id).to_string(index=False))
+        elif args.command == "export":
+            db.export_text(args.run_id)
+    db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
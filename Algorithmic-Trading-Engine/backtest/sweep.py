@@ -0,0 +1,168 @@
+# backtest/sweep.py
+import importlib
+import itertools
+import os
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from strategy.indicators import default_indicators
+from strategy.loader import get_indicator_specs
+from strategy.registry import compute_indicators
+from backtest.engine import run_panel_simulation
+from backtest.batch import slice_period, share_cache, attach_cache
+from backtest.metrics import compute_metrics
+
+# --- PARAMETER SWEEP ---
+# Sweeps the windows of the indicators the strategy declares (INDICATORS,
+# strategy/registry.py; the prepare_data set when it declares none). Each
+# sweep key overrides the period of one indicator kind; keys whose kind the
+# strategy does not use are left out. Every distinct window is computed once
+# per symbol into one wide frame (donchian_high_20, donchian_low_10, ...). A
+# combination is then just a column pick + dropna, which gives exactly what
+# prepare_for_strategy would with those windows. Wide frames go to the
+# workers through shared memory (backtest/batch.py) and combinations are
+# spread over a process pool.
+
+SWEEP_KEYS = {"entry_period": "donchian_high", "exit_period": "donchian_low", "sma_period": "sma"}
+
+def strategy_specs(strategy_module):
+    return get_indicator_specs(strategy_module) or default_indicators()
+
+def active_keys(grid, specs):
+    """Sweep keys in grid that change one of the strategy's indicators."""
+    kinds = {kind for kind, _ in specs.values()}
+    return [key for key, kind in SWEEP_KEYS.items() if key in grid and kind in kinds]
+
+def expand_grid(grid, specs=None):
+    """{"entry_period": [10, 20], ...} -> list of parameter dicts (declared windows only)."""
+    keys = active_keys(grid, specs or default_indicators())
+    values = [sorted(set(grid[k])) for k in keys]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+def specs_for(specs, params):
+    """The strategy's specs with the swept periods applied."""
+    periods = {SWEEP_KEYS[key]: value for key, value in params.items()}
+    return {column: (kind, {**p, "period": periods[kind]} if kind in periods else p)
+            for column, (kind, p) in specs.items()}
+
+def window_column(spec):
+    kind, params = spec
+    return "_".join([kind] + [str(v) for _, v in sorted(params.items())])
+
+def build_window_frame(raw_df, specs, combos):
+    """Raw bars + one column per distinct window (no rows dropped yet)."""
+    df = raw_df.rename(columns=str.lower)
+    df = df.copy().sort_values("timestamp")
+    base_cols = [c for c in df.columns if c != 'timestamp']
+
+    windows = {}
+    for params in combos:
+        for spec in specs_for(specs, params).values():
+            windows[window_column(spec)] = spec
+    computed = compute_indicators(df, windows)
+
+    df = pd.concat([df, pd.DataFrame(computed, index=df.index)], axis=1)
+    df.set_index('timestamp', inplace=True)
+    return df, base_cols
+
+def assemble_frame(wide_df, base_cols, specs):
+    """Same rows/columns as prepare_indicators(raw, specs)."""
+    df = wide_df[base_cols].copy()
+    for column, spec in specs.items():
+        df[column] = wide_df[window_column(spec)]
+    return df.dropna()
+
+def evaluate(wide_cache, base_cols, params, periods, now, sim_capital, strategy_module, dca_amount, dca_interval):
+    """One parameter combination over every period -> list of result rows."""
+    specs = specs_for(strategy_specs(strategy_module), params)
+    prepared = {sym: assemble_frame(df, base_cols, specs) for sym, df in wide_cache.items()}
+    prepared = {sym: df for sym, df in prepared.items() if not df.empty}
+
+    rows = []
+    for start_days, end_days in periods:
+        row = dict(params)
+        row["period"] = f"{start_days}-{end_days}"
+        ticker_map = slice_period(prepared, start_days, end_days, now)
+        if not ticker_map:
+            row.update({"final_equity": None, "invested": None, "roi": None, "trades": 0,
+                        "max_drawdown": None, "sharpe": None})
+            rows.append(row)
+            continue
+
+        ledger, final_equity = run_panel_simulation(ticker_map, sim_capital, strategy_module, dca_amount=dca_amount, dca_interval=dca_interval)
+        invested = ledger.total_invested
+        metrics = compute_metrics(ledger)
+        row.update({
+            "final_equity": float(final_equity),
+            "invested": float(invested),
+            "roi": ((final_equity - invested) / invested) * 100 if invested > 0 else 0.0,
+            "trades": ledger.n_trades,
+            "max_drawdown": metrics["max_drawdown"],
+            "sharpe": metrics["sharpe"],
+        })
+        rows.append(row)
+    return rows
+
+# --- WORKER SIDE ---
+_WORKER = {}
+
+def _init_worker(spec, base_cols, periods, strategy_name, now, sim_capital, dca_amount, dca_interval):
+    wide_cache, blocks = attach_cache(spec)
+    _WORKER.update({
+        "cache": wide_cache,
+        "blocks": blocks, # keep the mappings alive
+        "base_cols": base_cols,
+        "periods": periods,
+        "strategy": importlib.import_module(strategy_name),
+        "args": (now, sim_capital, dca_amount, dca_interval),
+    })
+
+def _run_task(params):
+    now, sim_capital, dca_amount, dca_interval = _WORKER["args"]
+    return evaluate(_WORKER["cache"], _WORKER["base_cols"], params, _WORKER["periods"], now, sim_capital,
+                    _WORKER["strategy"], dca_amount, dca_interval)
+
+def run_sweep(raw_map, grid, periods, sim_capital, strategy_module, dca_amount=0.0, dca_interval=30, workers=0):
+    """
+    Evaluates every parameter combination in grid over every period.
+    Returns a DataFrame ranked by ROI (best first).
+    workers: 1 = serial, 0/None = one process per CPU core.
+    """
+    specs = strategy_specs(strategy_module)
+    tasks = expand_grid(grid, specs)
+    wide_cache = {}
+    base_cols = None
+    for symbol, raw_df in raw_map.items():
+        if raw_df.empty:
+            continue
+        wide_cache[symbol], base_cols = build_window_frame(raw_df, specs, tasks)
+
+    if not wide_cache or not tasks or not periods:
+        return pd.DataFrame()
+
+    now = datetime.now(timezone.utc)
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+
+    if workers <= 1:
+        chunks = [evaluate(wide_cache, base_cols, params, periods, now, sim_capital, strategy_module, dca_amount, dca_interval)
+                  for params in tasks]
+    else:
+        spec, blocks = share_cache(wide_cache)
+        try:
+            init_args = (spec, base_cols, periods, strategy_module.__name__, now, sim_capital, dca_amount, dca_interval)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+                chunksize = max(1, len(tasks) // (workers * 8))
+                chunks = list(pool.map(_run_task, tasks, chunksize=chunksize))
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    results = pd.DataFrame([row for rows in chunks for row in rows])
+    results = results.sort_values("roi", ascending=False, na_position="last").reset_index(drop=True)
+    results.index = results.index + 1
+    results.index.name = "rank"
+    return results
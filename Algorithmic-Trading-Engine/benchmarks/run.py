@@ -0,0 +1,118 @@
+# benchmarks/run.py
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.scenarios import SCENARIOS, SCALES, build
+
+# --- BENCHMARK RUNNER ---
+# Offline, no credentials. Run from the project folder:
+#   python -m benchmarks.run --save benchmarks/baseline.json
+#   python -m benchmarks.run --compare benchmarks/baseline.json
+# Throughput is units / best-of-N seconds; peak memory comes from a separate
+# tracemalloc pass so tracing does not slow the timed runs.
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10 # 10%
+
+def measure(fn, repeat):
+    fn() # warm-up (imports, caches)
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak
+
+def run_suite(names, scales, repeat, timeframe, seed):
+    results = {}
+    for scale in scales:
+        for name in names:
+            fn, units, unit = build(name, scale, timeframe, seed)
+            seconds, peak = measure(fn, repeat)
+            key = f"{name}[{scale}]"
+            results[key] = {
+                "seconds": seconds,
+                "throughput": units / seconds if seconds > 0 else float("inf"),
+                "unit": f"{unit}/s",
+                "peak_mb": peak / (1024 * 1024),
+            }
+            r = results[key]
+            print(f"{key:<32} {r['seconds'] * 1000:>10.2f} ms {r['throughput']:>14,.0f} {r['unit']:<8} {r['peak_mb']:>8.1f} MB")
+    return results
+
+def compare(results, baseline, threshold):
+    """Returns the regressed keys (slower or hungrier than baseline by > threshold)."""
+    regressions = []
+    print(f"\n{'SCENARIO':<32} {'THROUGHPUT':>12} {'PEAK MEM':>12}")
+    for key, r in results.items():
+        old = baseline.get(key)
+        if old is None:
+            print(f"{key:<32} {'new':>12} {'new':>12}")
+            continue
+        speed = r["throughput"] / old["throughput"] - 1
+        memory = r["peak_mb"] / old["peak_mb"] - 1 if old["peak_mb"] > 0 else 0.0
+        flag = ""
+        if speed < -threshold or memory > threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"{key:<32} {speed:>+11.1%} {memory:>+11.1%}{flag}")
+    return regressions
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest pipeline benchmarks (synthetic data, offline).")
+    parser.add_argument("--scenario", nargs="*", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--scale", nargs="*", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--timeframe", default="1Day", help='bar size of the synthetic data, e.g. "5Min"')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--save", metavar="JSON", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="flag regressions against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown / memory growth (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.scenario, args.scale, args.repeat, args.timeframe, args.seed)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"environment": environment(), "timeframe": args.timeframe, "seed": args.seed, "results": results}, f, indent=2)
+        print(f"Baseline: {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if (baseline.get("timeframe"), baseline.get("seed")) != (args.timeframe, args.seed):
+            print("Warning: baseline was recorded with a different timeframe/seed")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
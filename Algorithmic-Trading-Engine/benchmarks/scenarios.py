@@ -0,0 +1,123 @@
+# benchmarks/scenarios.py
+import contextlib
+import io
+import os
+import tempfile
+
+from benchmarks.synthetic import make_universe
+from strategy.indicators import prepare_data, prepare_panel
+from backtest.portfolio import run_portfolio_simulation, write_portfolio_backtest
+from backtest.engine import run_panel_simulation
+from backtest.montecarlo import run_monte_carlo
+from backtest.rows import row_tables
+import strategy.strategy1 as strategy1
+
+# --- SCENARIOS ---
+# Each scenario takes a synthetic universe and returns (fn, units): fn runs
+# the hot path once, units is the work it covers (bars, ledger lines) and
+# turns the timing into a throughput.
+
+SCALES = {
+    # name: (symbols, bars per symbol)
+    "small": (5, 500),
+    "medium": (20, 2_500),
+    "large": (50, 5_000),
+}
+
+SIM_CAPITAL = 1000.0
+DCA = (100.0, 30)
+MC_PATHS = 64
+
+def _prepared(universe):
+    return {sym: prepare_data(df) for sym, df in universe.items()}
+
+def bench_prepare_data(universe):
+    def fn():
+        for df in universe.values():
+            prepare_data(df)
+    return fn, sum(len(df) for df in universe.values())
+
+def bench_prepare_panel(universe):
+    def fn():
+        prepare_panel(universe)
+    return fn, sum(len(df) for df in universe.values())
+
+def bench_legacy_simulation(universe):
+    prepared = _prepared(universe)
+    def fn():
+        run_portfolio_simulation(prepared, SIM_CAPITAL, strategy1, *DCA)
+    return fn, sum(len(df) for df in prepared.values())
+
+def bench_panel_simulation(universe):
+    prepared = _prepared(universe)
+    def fn():
+        run_panel_simulation(prepared, SIM_CAPITAL, strategy1, *DCA)
+    return fn, sum(len(df) for df in prepared.values())
+
+def bench_multi_position(universe):
+    prepared = _prepared(universe)
+    def fn():
+        run_panel_simulation(prepared, SIM_CAPITAL, strategy1, *DCA, max_positions=5, sizing="score")
+    return fn, sum(len(df) for df in prepared.values())
+
+def bench_row_series(universe):
+    # get_decision on a pandas Series per bar (the old row path)
+    frames = list(_prepared(universe).values())
+    def fn():
+        for df in frames:
+            for pos in range(len(df)):
+                strategy1.get_decision(df.iloc[pos], {}, "SYN", SIM_CAPITAL)
+    return fn, sum(len(df) for df in frames)
+
+def bench_row_slots(universe):
+    # Same calls on backtest/rows.py views, tables built inside the timing
+    frames = list(_prepared(universe).values())
+    def fn():
+        for table in row_tables(frames):
+            for pos in range(len(table)):
+                strategy1.get_decision(table.row(pos), {}, "SYN", SIM_CAPITAL)
+    return fn, sum(len(df) for df in frames)
+
+def bench_rowwise_simulation(universe):
+    prepared = _prepared(universe)
+    def fn():
+        run_panel_simulation(prepared, SIM_CAPITAL, strategy1, *DCA, use_batch=False)
+    return fn, sum(len(df) for df in prepared.values())
+
+def bench_montecarlo(universe):
+    def fn():
+        run_monte_carlo(universe, strategy1, SIM_CAPITAL, MC_PATHS, *DCA, seed=0, workers=1)
+    return fn, MC_PATHS * sum(len(df) for df in universe.values())
+
+def bench_write_backtest(universe):
+    ledger, final_equity = run_panel_simulation(_prepared(universe), SIM_CAPITAL, strategy1, *DCA)
+    folder = tempfile.mkdtemp(prefix="bench_")
+    def fn():
+        # The writer logs under ./backtest/results
+        cwd = os.getcwd()
+        os.chdir(folder)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                write_portfolio_backtest(ledger, final_equity, "bench", "0-0", "synthetic")
+        finally:
+            os.chdir(cwd)
+    return fn, len(ledger)
+
+SCENARIOS = {
+    "prepare_data": (bench_prepare_data, "bars"),
+    "prepare_panel": (bench_prepare_panel, "bars"),
+    "legacy_simulation": (bench_legacy_simulation, "bars"),
+    "panel_simulation": (bench_panel_simulation, "bars"),
+    "multi_position": (bench_multi_position, "bars"),
+    "row_series": (bench_row_series, "rows"),
+    "row_slots": (bench_row_slots, "rows"),
+    "rowwise_simulation": (bench_rowwise_simulation, "bars"),
+    "montecarlo": (bench_montecarlo, "path bars"),
+    "write_backtest": (bench_write_backtest, "lines"),
+}
+
+def build(name, scale, timeframe="1Day", seed=0):
+    n_symbols, n_bars = SCALES[scale]
+    setup, unit = SCENARIOS[name]
+    fn, units = setup(make_universe(n_symbols, n_bars, timeframe, seed))
+    return fn, units, unit
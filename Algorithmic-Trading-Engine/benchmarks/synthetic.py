@@ -0,0 +1,38 @@
+# benchmarks/synthetic.py
+import numpy as np
+import pandas as pd
+
+from data.feed import timeframe_delta
+
+# --- SYNTHETIC MARKET DATA ---
+# Deterministic OHLCV in the load_bars format (timestamp column, lower-case
+# fields). The same (seed, symbol number) always gives the same bars, so
+# benchmark runs on different machines and commits see identical inputs.
+
+START = "2015-01-01"
+
+def make_bars(n_bars, timeframe="1Day", seed=0, symbol_id=0, start=START):
+    rng = np.random.default_rng([seed, symbol_id])
+    timestamps = pd.date_range(start, periods=n_bars, freq=timeframe_delta(timeframe), tz="UTC")
+
+    # Geometric random walk with slowly changing drift, so breakouts happen
+    drift = np.repeat(rng.normal(0, 0.001, n_bars // 250 + 1), 250)[:n_bars]
+    close = 100 * np.exp(np.cumsum(drift + rng.normal(0, 0.02, n_bars)))
+    open_ = close * (1 + rng.normal(0, 0.005, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n_bars)))
+
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": rng.integers(1_000, 1_000_000, n_bars).astype(float),
+        "trade_count": rng.integers(10, 10_000, n_bars),
+        "vwap": (high + low + close) / 3,
+    })
+
+def make_universe(n_symbols, n_bars, timeframe="1Day", seed=0):
+    """{"SYN000": bars, ...}"""
+    return {f"SYN{i:03d}": make_bars(n_bars, timeframe, seed, i) for i in range(n_symbols)}
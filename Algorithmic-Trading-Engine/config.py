@@ -2,7 +2,6 @@
 import json
 import os
 from datetime import time as dt_time
-from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
 
 CREDENTIALS_FILE = "API_Key&Secret.txt"
 SETTINGS_FILE = "settings.json"
@@ -11,6 +10,36 @@ SETTINGS_FILE = "settings.json"
 DEFAULT_CAPITAL = 1000.0
 DEFAULT_DAYS = 365
 DEFAULT_STRAT = "1"
+DEFAULT_ENGINE = "panel"
+DEFAULT_WORKERS = 1
+DEFAULT_SWEEP_GRID = {
+    "entry_period": [10, 20, 30, 55],
+    "exit_period": [5, 10, 20],
+    "sma_period": [50]
+}
+DEFAULT_MONTE_CARLO = {
+    "paths": 1000,
+    "block_size": 20,        # bars per bootstrap block, 0 = historical order
+    "slippage_jitter": 0.5,  # lognormal sigma of the per-fill slippage factor
+    "random_start": True,
+    "min_bars": 252,         # shortest window left after a random start
+    "seed": None,
+    "workers": 0             # 0 = one process per CPU core
+}
+DEFAULT_COSTS = {
+    "enabled": True,         # False = flat slippage only (the old model)
+    "slippage": 0.0003,      # per side
+    "spread_bps": {"stock": 0.0, "crypto": 0.0}, # quoted spread, half paid per side
+    "impact": 0.0,           # square-root impact coefficient (needs bar volume)
+    "min_notional": 1.0,     # smallest order placed, in $
+    "fees": True             # backtest/fees.py per asset class
+}
+DEFAULT_CACHE_DIR = os.path.join("data", "cache")
+DEFAULT_COLUMNAR_DIR = os.path.join("data", "columns")
+DEFAULT_TIMEFRAME = "1Day"
+DEFAULT_BACKFILL_WORKERS = 8
+DEFAULT_BACKFILL_BATCH = 50
+DEFAULT_REQUESTS_PER_MINUTE = 200 # Alpaca free plan
 DEFAULT_RECURRING_INVESTMENT = {
     "enabled": False, 
     "amount": 0.0, 
@@ -37,12 +66,81 @@ RECURRING_INVESTMENT = settings["account"].get("recurring_investment", DEFAULT_R
 
 DEFAULT_STRATEGY_ID = settings.get("strategy", {}).get("default", DEFAULT_STRAT)
 
+# Backtest engine: "panel" (array-backed) or "legacy" (per-date pandas loop)
+BACKTEST_ENGINE = settings.get("backtest", {}).get("engine", DEFAULT_ENGINE)
+# Period batch workers: 1 = serial, 0 = one process per CPU core
+BACKTEST_WORKERS = settings.get("backtest", {}).get("workers", DEFAULT_WORKERS)
+
+# Open positions at once (1 = Strict One Position) and how new ones are sized:
+# "equal", "score" or "volatility" (backtest/allocation.py)
+MAX_POSITIONS = settings.get("backtest", {}).get("max_positions", 1)
+POSITION_SIZING = settings.get("backtest", {}).get("sizing", "equal")
+VOL_LOOKBACK = settings.get("backtest", {}).get("vol_lookback", 20)
+# Fixed references for those modes: a pick gets a full slot at or below
+# target_vol (std of log returns per bar) and at or above score_scale
+TARGET_VOL = settings.get("backtest", {}).get("target_vol", 0.02)
+SCORE_SCALE = settings.get("backtest", {}).get("score_scale", 1.0)
+
+# Indicators for the whole universe in one pass instead of per symbol
+PANEL_INDICATORS = settings.get("backtest", {}).get("panel_indicators", False)
+
+# Parameter sweep grid (backtest/sweep.py)
+SWEEP_GRID = {**DEFAULT_SWEEP_GRID, **settings.get("sweep", {})}
+
+# Execution cost model (backtest/costs.py)
+COSTS = {**DEFAULT_COSTS, **settings.get("costs", {})}
+
+# Monte Carlo robustness runs (backtest/montecarlo.py)
+MONTE_CARLO = {**DEFAULT_MONTE_CARLO, **settings.get("montecarlo", {})}
+
+# Live engine (execution/live.py): "alpaca" bar websocket, "replay" of recorded bars,
+# "trades" (Alpaca trade websocket aggregated into bars) or "trade_replay" of recorded trades
+LIVE_SOURCE = settings.get("live", {}).get("source", "alpaca")
+LIVE_REPLAY_DIR = settings.get("live", {}).get("replay_dir") # default: cache folder of BAR_TIMEFRAME
+LIVE_REPLAY_SPEED = settings.get("live", {}).get("replay_speed", 0.0) # 0 = as fast as possible
+LIVE_TRADE_LATENESS = settings.get("live", {}).get("trade_lateness", 2.0) # seconds a bar waits for late trades (data/aggregator.py)
+# Polling scan cycle (execution/trader.py): concurrent bar refreshes, order pipeline
+LIVE_SCAN_WORKERS = settings.get("live", {}).get("scan_workers", 8)
+LIVE_ORDER_WORKERS = settings.get("live", {}).get("order_workers", 4)
+LIVE_ORDER_RETRIES = settings.get("live", {}).get("order_retries", 3)
+
+# Compact master_cache (data/compact.py)
+MEMORY_COMPACT = settings.get("memory", {}).get("compact", False)
+MEMORY_FLOAT32 = settings.get("memory", {}).get("float32", False)
+MEMORY_BUDGET_MB = settings.get("memory", {}).get("budget_mb", 0) # 0 = unlimited
+MEMORY_ON_EXCEED = settings.get("memory", {}).get("on_exceed", "refuse") # "refuse" or "spill"
+SPILL_DIR = settings.get("memory", {}).get("spill_dir", os.path.join("data", "spill"))
+
+# Results database (backtest/results_db.py); text reports are an optional export
+RESULTS_DB = settings.get("results", {}).get("db", os.path.join("backtest", "results", "results.db"))
+RESULTS_TEXT = settings.get("results", {}).get("text_reports", True)
+
+# Pipeline profiling (backtest/profiling.py)
+PROFILE_ENABLED = settings.get("profile", {}).get("enabled", False)
+PROFILE_PERIOD = settings.get("profile", {}).get("cprofile_period") # e.g. "365-0" runs that period under cProfile
+
+# Persistent bar cache (data/cache.py)
+CACHE_ENABLED = settings.get("data", {}).get("cache_enabled", True)
+CACHE_DIR = settings.get("data", {}).get("cache_dir", DEFAULT_CACHE_DIR)
+
+# Memory-mapped column files (data/columnar.py)
+COLUMNAR_ENABLED = settings.get("data", {}).get("columnar", False)
+COLUMNAR_DIR = settings.get("data", {}).get("columnar_dir", DEFAULT_COLUMNAR_DIR)
+
+# Historical backfill (data/backfill.py)
+BACKFILL_WORKERS = settings.get("data", {}).get("max_workers", DEFAULT_BACKFILL_WORKERS)
+BACKFILL_BATCH_SIZE = settings.get("data", {}).get("batch_size", DEFAULT_BACKFILL_BATCH)
+API_REQUESTS_PER_MINUTE = settings.get("data", {}).get("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE)
+
 # Asset Lists
 STOCK_LIST = settings.get("universe", {}).get("stocks", [])
 CRYPTO_LIST = settings.get("universe", {}).get("crypto", [])
 FULL_UNIVERSE = STOCK_LIST + CRYPTO_LIST
 
 # --- TIMEFRAME ---
-BAR_TIMEFRAME = TimeFrame(1, TimeFrameUnit.Day)
+# Kept in its string form ("1Day", "5Min", "1Hour"). data/feed.py builds the
+# alpaca TimeFrame when a request is made, so importing config never loads
+# the SDK.
+BAR_TIMEFRAME = str(settings.get("data", {}).get("timeframe", DEFAULT_TIMEFRAME)).strip()
 MARKET_OPEN = dt_time(9, 30) 
 MARKET_CLOSE = dt_time(16, 00)
\ No newline at end of file
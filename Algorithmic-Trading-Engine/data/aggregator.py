@@ -0,0 +1,291 @@
+# data/aggregator.py
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+
+from data.feed import timeframe_key, timeframe_delta
+from config import LIVE_TRADE_LATENESS
+
+# --- TRADE -> BAR AGGREGATOR ---
+# Builds OHLCV bars (load_bars format) from a trade stream, for several
+# timeframes at once: every trade updates the open bar of each timeframe.
+# Bars are aligned to the epoch (a 5Min bar starts at :00, :05, ...; a 1Day
+# bar at 00:00 UTC) and stamped with their start, like Alpaca's.
+#
+# Late trades: open and close are the earliest and latest trade by trade
+# time, not by arrival, so out-of-order trades land where they belong. A bar
+# stays open until the clock passes its end + lateness; the clock is the
+# newest trade of the symbol (add_trade) or the wall clock (advance), so
+# quiet symbols still close on time. Once a bar has been emitted it is final
+# (the indicators have consumed it); trades that arrive later are dropped
+# and counted in .late.
+#
+# add_bar rolls finished bars (e.g. the 1Min bars of the bar stream) up
+# into the same timeframes: OHLC of the sub-bars in time order, summed
+# volume and trade count, volume-weighted vwap. A sub-bar counts as seen at
+# its end, which is the clock that closes the larger bar.
+#
+# Memory per symbol is bounded: at most max_open bars per timeframe are
+# open (the oldest is emitted first when a far-future trade would exceed it).
+#
+#   python -m data.aggregator recorded_trades/ --symbols AAPL,BTC/USD --timeframes 1Min,5Min,1Hour --out bars/
+
+TIMEFRAMES = ("1Min", "5Min", "1Hour")
+MAX_OPEN_BARS = 4
+
+# Open bar: [open, high, low, close, volume, trade_count, price x size, first_ns, last_ns]
+OPEN, HIGH, LOW, CLOSE, VOLUME, COUNT, PV, FIRST, LAST = range(9)
+
+def to_ns(ts):
+    """int ns since epoch (UTC) of an int, datetime or Timestamp; naive means UTC."""
+    if isinstance(ts, int):
+        return ts
+    ts = pd.Timestamp(ts)
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts).value
+
+class _Series:
+    """Open bars of one symbol and timeframe."""
+    __slots__ = ("length", "bars", "emitted")
+
+    def __init__(self, length):
+        self.length = length
+        self.bars = {}      # start ns -> open bar
+        self.emitted = -1   # start ns of the newest emitted bar
+
+class BarAggregator:
+    def __init__(self, timeframes=TIMEFRAMES, lateness=LIVE_TRADE_LATENESS, max_open=MAX_OPEN_BARS):
+        self.timeframes = [timeframe_key(tf) for tf in timeframes]
+        self.lengths = [pd.Timedelta(timeframe_delta(tf)).value for tf in self.timeframes]
+        self.lateness = int(lateness * 1e9)
+        self.max_open = max(1, max_open)
+        self.series = {}    # symbol -> [_Series per timeframe]
+        self.clock = {}     # symbol -> newest trade ns
+        self.trades = 0
+        self.late = 0
+
+    def add_trade(self, symbol, ts, price, size=0.0):
+        """Adds one trade. Returns the bars it closed: [(symbol, timeframe, bar), ...]."""
+        t = to_ns(ts)
+        price = float(price)
+        size = float(size)
+        series = self.series.get(symbol)
+        if series is None:
+            series = self.series[symbol] = [_Series(length) for length in self.lengths]
+        self.trades += 1
+
+        late = False
+        for s in series:
+            start = t - t % s.length
+            if start <= s.emitted:
+                late = True
+                continue
+            bar = s.bars.get(start)
+            if bar is None:
+                s.bars[start] = [price, price, price, price, size, 1, price * size, t, t]
+                continue
+            if price > bar[HIGH]: bar[HIGH] = price
+            if price < bar[LOW]: bar[LOW] = price
+            if t < bar[FIRST]:
+                bar[OPEN] = price
+                bar[FIRST] = t
+            if t >= bar[LAST]:
+                bar[CLOSE] = price
+                bar[LAST] = t
+            bar[VOLUME] += size
+            bar[COUNT] += 1
+            bar[PV] += price * size
+        if late:
+            self.late += 1
+
+        if t > self.clock.get(symbol, -1):
+            self.clock[symbol] = t
+        return self._close(symbol, self.clock[symbol])
+
+    def add_bar(self, symbol, bar, length):
+        """
+        Adds one finished bar (load_bars fields, stamped with its start) of
+        length ns. Returns the bars it closed, like add_trade.
+        """
+        t = to_ns(bar["timestamp"])
+        end = t + length - 1 # last ns the sub-bar covers
+        volume = float(bar.get("volume") or 0.0)
+        count = int(bar.get("trade_count") or 0)
+        vwap = bar.get("vwap")
+        pv = (float(bar["close"]) if vwap is None or pd.isna(vwap) else float(vwap)) * volume
+        series = self.series.get(symbol)
+        if series is None:
+            series = self.series[symbol] = [_Series(length) for length in self.lengths]
+
+        late = False
+        for s in series:
+            start = t - t % s.length
+            if start <= s.emitted:
+                late = True
+                continue
+            current = s.bars.get(start)
+            if current is None:
+                s.bars[start] = [float(bar["open"]), float(bar["high"]), float(bar["low"]), float(bar["close"]),
+                                 volume, count, pv, t, end]
+                continue
+            if bar["high"] > current[HIGH]: current[HIGH] = float(bar["high"])
+            if bar["low"] < current[LOW]: current[LOW] = float(bar["low"])
+            if t < current[FIRST]:
+                current[OPEN] = float(bar["open"])
+                current[FIRST] = t
+            if end >= current[LAST]:
+                current[CLOSE] = float(bar["close"])
+                current[LAST] = end
+            current[VOLUME] += volume
+            current[COUNT] += count
+            current[PV] += pv
+        if late:
+            self.late += 1
+
+        if end + 1 > self.clock.get(symbol, -1):
+            self.clock[symbol] = end + 1
+        return self._close(symbol, self.clock[symbol])
+
+    def advance(self, now):
+        """Closes every bar whose end + lateness is at or before now (wall clock)."""
+        now_ns = to_ns(now)
+        closed = []
+        for symbol in self.series:
+            closed.extend(self._close(symbol, now_ns))
+        return closed
+
+    def flush(self):
+        """Closes every open bar (end of a recording)."""
+        closed = []
+        for symbol, series in self.series.items():
+            for tf, s in zip(self.timeframes, series):
+                closed.extend((symbol, tf, self._emit(s, start)) for start in sorted(s.bars))
+        return closed
+
+    def open_bars(self):
+        return sum(len(s.bars) for series in self.series.values() for s in series)
+
+    def _close(self, symbol, now_ns):
+        closed = []
+        for tf, s in zip(self.timeframes, self.series[symbol]):
+            if not s.bars:
+                continue
+            if len(s.bars) <= self.max_open and min(s.bars) + s.length + self.lateness > now_ns:
+                continue # nothing due (the common case, one check per trade)
+            starts = sorted(s.bars)
+            ready = [start for start in starts if start + s.length + self.lateness <= now_ns]
+            # Hard bound: emit the oldest bars beyond max_open
+            extra = len(starts) - len(ready) - self.max_open
+            if extra > 0:
+                ready = starts[:len(ready) + extra]
+            closed.extend((symbol, tf, self._emit(s, start)) for start in ready)
+        return closed
+
+    @staticmethod
+    def _emit(s, start):
+        bar = s.bars.pop(start)
+        s.emitted = max(s.emitted, start)
+        volume = bar[VOLUME]
+        return {
+            "timestamp": pd.Timestamp(start, tz="UTC"),
+            "open": bar[OPEN],
+            "high": bar[HIGH],
+            "low": bar[LOW],
+            "close": bar[CLOSE],
+            "volume": volume,
+            "trade_count": bar[COUNT],
+            "vwap": bar[PV] / volume if volume > 0 else bar[CLOSE],
+        }
+
+# --- RECORDED TRADES ---
+
+def read_trades(path):
+    """
+    One symbol's recorded trades (CSV or Parquet): timestamp, price and
+    size (or volume/qty) columns. Rows stay in file (arrival) order; a
+    "received" column, if present, sets that order.
+    """
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    df = df.rename(columns=str.lower)
+    if "size" not in df.columns:
+        df = df.rename(columns={"volume": "size", "qty": "size"})
+    if "size" not in df.columns:
+        df["size"] = 0.0
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    if "received" in df.columns:
+        df["received"] = pd.to_datetime(df["received"], utc=True)
+        df = df.sort_values("received", kind="stable")
+    return df.reset_index(drop=True)
+
+def trade_file(folder, symbol):
+    """Recorded trades of one symbol ("/" written as "-"), or None."""
+    base = os.path.join(folder, symbol.replace("/", "-"))
+    for ext in (".parquet", ".csv"):
+        if os.path.exists(base + ext):
+            return base + ext
+    return None
+
+def load_recorded_trades(folder, symbols):
+    """All symbols' trades as one frame in arrival order (by time, file order on ties)."""
+    frames = []
+    for symbol in symbols:
+        path = trade_file(folder, symbol)
+        if path is None:
+            print(f"Replay: no trades recorded for {symbol}")
+            continue
+        df = read_trades(path)
+        df["symbol"] = symbol
+        df["_arrival"] = df["received"] if "received" in df.columns else df["timestamp"]
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=["timestamp", "symbol", "price", "size"])
+    trades = pd.concat(frames, ignore_index=True)
+    # Within a file the arrival order is kept, so late trades stay late
+    trades["_arrival"] = trades.groupby("symbol")["_arrival"].cummax()
+    return trades.sort_values("_arrival", kind="stable").drop(columns="_arrival").reset_index(drop=True)
+
+def aggregate_trades(trades, timeframes=TIMEFRAMES, lateness=LIVE_TRADE_LATENESS, max_open=MAX_OPEN_BARS):
+    """
+    Replays a trade frame through a BarAggregator in row order.
+    Returns ({timeframe: {symbol: bars DataFrame}}, aggregator).
+    """
+    agg = BarAggregator(timeframes, lateness, max_open)
+    out = {tf: {} for tf in agg.timeframes}
+    ts_ns = trades["timestamp"].to_numpy(dtype="datetime64[ns]").view("int64").tolist()
+    for symbol, t, price, size in zip(trades["symbol"].tolist(), ts_ns, trades["price"].tolist(), trades["size"].tolist()):
+        for sym, tf, bar in agg.add_trade(symbol, t, price, size):
+            out[tf].setdefault(sym, []).append(bar)
+    for sym, tf, bar in agg.flush():
+        out[tf].setdefault(sym, []).append(bar)
+    return {tf: {sym: pd.DataFrame(bars) for sym, bars in per_symbol.items()} for tf, per_symbol in out.items()}, agg
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build OHLCV bars from recorded trades.")
+    parser.add_argument("folder", help="one trade file per symbol (CSV or Parquet)")
+    parser.add_argument("--symbols", required=True, help="comma separated")
+    parser.add_argument("--timeframes", default=",".join(TIMEFRAMES))
+    parser.add_argument("--lateness", type=float, default=LIVE_TRADE_LATENESS, help="seconds a bar stays open after its end")
+    parser.add_argument("--out", help="writes <out>/<timeframe>/<symbol>.csv (the live replay format)")
+    args = parser.parse_args(argv)
+
+    symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
+    trades = load_recorded_trades(args.folder, symbols)
+    started = time.perf_counter()
+    bars, agg = aggregate_trades(trades, args.timeframes.split(","), args.lateness)
+    elapsed = time.perf_counter() - started
+
+    print(f"TRADES:  {agg.trades:,} in {elapsed:.2f}s ({agg.trades / elapsed if elapsed else 0:,.0f} trades/s), {agg.late:,} late (dropped)")
+    for tf, per_symbol in bars.items():
+        print(f"{tf:>7}: {sum(len(df) for df in per_symbol.values()):,} bars")
+        if args.out:
+            folder = os.path.join(args.out, tf)
+            os.makedirs(folder, exist_ok=True)
+            for symbol, df in per_symbol.items():
+                df.to_csv(os.path.join(folder, symbol.replace("/", "-") + ".csv"), index=False)
+    if args.out:
+        print(f"Bars: {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# data/backfill.py
+import time
+import pandas as pd
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from data.feed import fetch_bars_multi, timeframe_delta
+from data.cache import read_cache, write_cache, missing_ranges, merge_bars, extend_coverage, slice_bars, to_utc
+from data.ratelimit import API_LIMITER
+from backtest.profiling import PROFILER
+from config import CRYPTO_LIST, BACKFILL_WORKERS, BACKFILL_BATCH_SIZE
+
+# --- MULTI-SYMBOL BACKFILL ---
+# Symbols that need the same date range are grouped into one request per
+# batch, long ranges are cut into chunks of about one Alpaca page each, and
+# all chunks run on a bounded thread pool behind the shared rate limiter.
+
+PAGE_LIMIT = 10000 # bars per Alpaca page
+MAX_RETRIES = 5
+
+def _is_rate_limited(e):
+    msg = str(e).lower()
+    return getattr(e, "status_code", None) == 429 or "429" in msg or "too many requests" in msg
+
+def _fetch_with_retry(stock_client, crypto_client, symbols, timeframe, start, end):
+    for attempt in range(MAX_RETRIES):
+        API_LIMITER.acquire()
+        PROFILER.count("api_requests")
+        try:
+            return fetch_bars_multi(stock_client, crypto_client, symbols, timeframe, start, end)
+        except Exception as e:
+            if not _is_rate_limited(e) or attempt == MAX_RETRIES - 1:
+                raise
+            backoff = 2 ** attempt
+            API_LIMITER.penalize(backoff)
+            time.sleep(backoff)
+
+def plan_chunks(start, end, timeframe, n_symbols):
+    """Cuts [start, end] so one chunk for the whole batch fits in about one page."""
+    bars_per_chunk = max(1, PAGE_LIMIT // max(1, n_symbols))
+    step = bars_per_chunk * timeframe_delta(timeframe)
+
+    chunks = []
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + step, end)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+    return chunks or [(start, end)]
+
+def backfill_bars(stock_client, crypto_client, symbols, timeframe, start_date, end_date, use_cache=True,
+                  max_workers=None, batch_size=None):
+    """
+    Loads bars for many symbols at once. Returns {symbol: df} in the
+    load_bars format. With use_cache, only gaps missing from data/cache.py
+    are downloaded and the results are written back to it.
+    """
+    start = to_utc(start_date)
+    end = to_utc(end_date)
+    max_workers = max_workers or BACKFILL_WORKERS
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+    online = stock_client is not None or crypto_client is not None
+
+    # 1. WHAT IS MISSING
+    known = {}
+    jobs = defaultdict(list) # (is_crypto, gap) -> symbols
+    for symbol in symbols:
+        cached_df, coverage = read_cache(symbol, timeframe) if use_cache else (pd.DataFrame(), None)
+        gaps = missing_ranges(coverage, start, end, timeframe)
+        known[symbol] = (cached_df, coverage, gaps)
+        if online:
+            for gap in gaps:
+                jobs[(symbol in CRYPTO_LIST, gap)].append(symbol)
+
+    # 2. FAN OUT
+    fetched = defaultdict(list)
+    failed = set()
+    # Chunks still unconfirmed per (symbol, gap). An empty batched response
+    # confirms the chunk for the whole batch (nights, weekends); a symbol
+    # missing while others returned bars may have been dropped, so only a
+    # single-symbol request can confirm it.
+    pending = defaultdict(set)
+    requests = []
+    for (_, gap), group in jobs.items():
+        for b in range(0, len(group), batch_size):
+            batch = group[b:b + batch_size]
+            for chunk in plan_chunks(gap[0], gap[1], timeframe, len(batch)):
+                requests.append((gap, batch, chunk))
+                for symbol in batch:
+                    pending[(symbol, gap)].add(chunk)
+
+    def run(pool, requests):
+        futures = {pool.submit(_fetch_with_retry, stock_client, crypto_client, batch, timeframe, *chunk): (gap, batch, chunk)
+                   for gap, batch, chunk in requests}
+        for fut in as_completed(futures):
+            gap, batch, chunk = futures[fut]
+            try:
+                result = fut.result()
+            except Exception as e:
+                print(f"   [Fetch Error: {', '.join(batch)}: {e}]")
+                failed.update((symbol, gap) for symbol in batch)
+                continue
+            for symbol in (batch if len(batch) == 1 or not result else result):
+                pending[(symbol, gap)].discard(chunk)
+            for symbol, df in result.items():
+                fetched[symbol].append(df)
+                if PROFILER.enabled:
+                    PROFILER.count("bars_fetched", len(df))
+                    PROFILER.count("bytes_fetched", int(df.memory_usage(index=True).sum()))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        run(pool, requests)
+        # Symbols a batch came back without: one request per (symbol, gap)
+        # over the span of its unconfirmed chunks (the SDK follows the pages)
+        retry = {(symbol, gap): (min(c[0] for c in chunks), max(c[1] for c in chunks))
+                 for (symbol, gap), chunks in pending.items() if chunks and (symbol, gap) not in failed}
+        if retry:
+            run(pool, [(gap, [symbol], span) for (symbol, gap), span in retry.items()])
+            for key in retry:
+                if key not in failed:
+                    pending[key].clear()
+
+    # 3. MERGE + PERSIST
+    results = {}
+    for symbol in symbols:
+        cached_df, coverage, gaps = known[symbol]
+        done_gaps = [gap for gap in gaps
+                     if online and not pending[(symbol, gap)] and (symbol, gap) not in failed]
+
+        merged = merge_bars(cached_df, fetched[symbol]) if fetched[symbol] else cached_df
+
+        if use_cache and done_gaps:
+            write_cache(symbol, timeframe, merged, extend_coverage(coverage, start, end, done_gaps))
+
+        if len(done_gaps) < len(gaps):
+            if merged.empty:
+                print(f"   [Offline: no cached bars for {symbol}]")
+            else:
+                print(f"   [Offline: using cached {symbol}]")
+
+        results[symbol] = slice_bars(merged, start, end)
+
+    return results
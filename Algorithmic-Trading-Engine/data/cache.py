@@ -0,0 +1,131 @@
+# data/cache.py
+import json
+import os
+import pandas as pd
+
+from data.feed import fetch_bars, timeframe_key, timeframe_delta
+from config import CACHE_DIR
+
+# --- PERSISTENT BAR CACHE ---
+# One Parquet file per (timeframe, symbol) plus a small JSON sidecar holding
+# the time range that has already been requested from Alpaca. Coverage is
+# tracked separately from the bars so empty ranges (weekends, holidays) are
+# not re-downloaded on every run.
+
+def cache_paths(symbol, timeframe):
+    safe_symbol = symbol.replace("/", "-")
+    base = os.path.join(CACHE_DIR, timeframe_key(timeframe), safe_symbol)
+    return base + ".parquet", base + ".json"
+
+def to_utc(dt):
+    ts = pd.Timestamp(dt)
+    # Naive datetimes are treated as UTC, same as data/feed.py
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+def read_cache(symbol, timeframe):
+    """Returns (bars, (covered_start, covered_end)) or (empty, None)."""
+    data_path, meta_path = cache_paths(symbol, timeframe)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return pd.DataFrame(), None
+    try:
+        df = pd.read_parquet(data_path)
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        return df, (to_utc(meta["start"]), to_utc(meta["end"]))
+    except Exception as e:
+        print(f"   [Cache Error: {symbol}: {e}]")
+        return pd.DataFrame(), None
+
+def _replace_file(path, write_fn):
+    tmp_path = path + ".tmp"
+    write_fn(tmp_path)
+    os.replace(tmp_path, path)
+
+def write_cache(symbol, timeframe, df, coverage):
+    data_path, meta_path = cache_paths(symbol, timeframe)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+    # Bars first, then coverage: a crash in between only under-reports coverage
+    _replace_file(data_path, lambda p: df.to_parquet(p, index=False))
+    meta = {"start": coverage[0].isoformat(), "end": coverage[1].isoformat()}
+
+    def dump_meta(p):
+        with open(p, "w") as f:
+            json.dump(meta, f)
+    _replace_file(meta_path, dump_meta)
+
+def missing_ranges(coverage, start, end, timeframe):
+    """Gaps (head, tail) between the requested range and what is on disk."""
+    if coverage is None:
+        return [(start, end)]
+
+    bar = timeframe_delta(timeframe)
+    cov_start, cov_end = coverage
+    gaps = []
+    if cov_start - start >= bar:
+        gaps.append((start, cov_start))
+    if end - cov_end >= bar:
+        # Step back one bar so a partial last bar gets refreshed
+        gaps.append((cov_end - bar, end))
+    return gaps
+
+def merge_bars(old_df, new_frames):
+    frames = [df for df in [old_df] + new_frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(frames, ignore_index=True)
+    merged['timestamp'] = pd.to_datetime(merged['timestamp'], utc=True)
+    # Newer downloads win (last bar of a previous run may have been partial)
+    merged = merged.drop_duplicates(subset='timestamp', keep='last')
+    return merged.sort_values('timestamp').reset_index(drop=True)
+
+def slice_bars(df, start, end):
+    if df.empty:
+        return pd.DataFrame()
+    mask = (df['timestamp'] >= start) & (df['timestamp'] <= end)
+    return df.loc[mask].reset_index(drop=True)
+
+def extend_coverage(coverage, start, end, done_gaps):
+    """Coverage after the gaps in done_gaps were downloaded successfully."""
+    new_start, new_end = (coverage if coverage else (start, end))
+    for gap_start, gap_end in done_gaps:
+        new_start = min(new_start, gap_start)
+        new_end = max(new_end, gap_end)
+    return new_start, new_end
+
+def load_bars_cached(stock_client, crypto_client, symbol, timeframe, start_date, end_date):
+    """
+    Same contract as data.feed.load_bars, backed by the disk cache.
+    Only missing ranges are downloaded. Without clients (or when the API
+    fails) whatever is already on disk is returned.
+    """
+    start = to_utc(start_date)
+    end = to_utc(end_date)
+
+    cached_df, coverage = read_cache(symbol, timeframe)
+    gaps = missing_ranges(coverage, start, end, timeframe)
+
+    fetched = []
+    done_gaps = []
+    online = stock_client is not None or crypto_client is not None
+
+    for gap_start, gap_end in (gaps if online else []):
+        try:
+            fetched.append(fetch_bars(stock_client, crypto_client, symbol, timeframe, gap_start, gap_end))
+            done_gaps.append((gap_start, gap_end))
+        except Exception as e:
+            print(f"   [Fetch Error: {symbol}: {e}]")
+
+    if fetched:
+        merged = merge_bars(cached_df, fetched)
+        write_cache(symbol, timeframe, merged, extend_coverage(coverage, start, end, done_gaps))
+    else:
+        merged = cached_df
+
+    if len(done_gaps) < len(gaps):
+        if merged.empty:
+            print(f"   [Offline: no cached bars for {symbol}]", end=" ")
+        else:
+            print(f"   [Offline: using cached {symbol}]", end=" ")
+
+    return slice_bars(merged, start, end)
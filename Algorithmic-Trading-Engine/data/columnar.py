@@ -0,0 +1,185 @@
+# data/columnar.py
+import hashlib
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+from data.feed import timeframe_key
+from data.compact import CompactFrame
+from strategy.indicators import default_indicators
+from strategy.registry import compute_indicators, lookback
+from config import COLUMNAR_DIR
+
+# --- MEMORY-MAPPED COLUMN FILES ---
+# One folder per (timeframe, symbol) with one .npy file per column: "_ts"
+# holds int64 ns UTC timestamps, the rest are the bar fields; the
+# strategy's indicators go to an indicators/ subfolder. Everything is opened
+# with np.load(mmap_mode="r"), so a backtest only pages in the rows it touches
+# and concurrent processes share the OS page cache instead of private copies.
+# Indicators are computed chunk by chunk, so nothing is loaded whole.
+
+CHUNK_ROWS = 1_000_000
+TS_COLUMN = "_ts"
+# sha1 of the timestamps and bar columns last written (not a column file)
+CHECKSUM_FILE = "_checksum"
+
+def columns_folder(symbol, timeframe):
+    return os.path.join(COLUMNAR_DIR, timeframe_key(timeframe), symbol.replace("/", "-"))
+
+def column_files(folder):
+    """{column: path} for every complete .npy file in folder."""
+    if not os.path.isdir(folder):
+        return {}
+    return {
+        name[:-4]: os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.endswith(".npy") and not name.endswith(".tmp.npy")
+    }
+
+def _save(path, arr):
+    tmp_path = path[:-4] + ".tmp.npy"
+    np.save(tmp_path, arr)
+    os.replace(tmp_path, path)
+
+def _is_fresh(path, ts_path, n_rows):
+    """Derived column exists, matches the row count and is newer than the bars."""
+    if not os.path.exists(path):
+        return False
+    if os.path.getmtime(path) < os.path.getmtime(ts_path):
+        return False
+    return len(np.load(path, mmap_mode="r")) == n_rows
+
+def _checksum(ts, values):
+    digest = hashlib.sha1(np.ascontiguousarray(ts).tobytes())
+    for col in sorted(values):
+        digest.update(col.encode())
+        digest.update(np.ascontiguousarray(values[col]).tobytes())
+    return digest.hexdigest()
+
+def write_columns(symbol, timeframe, df):
+    """
+    Writes a load_bars-format frame as column files. Timestamps go last, so
+    an interrupted write leaves stale derived columns that get recomputed.
+    Skips the write when the checksum of the timestamps and bar columns
+    matches the last write (revised bars with the same range are rewritten).
+    """
+    folder = columns_folder(symbol, timeframe)
+    os.makedirs(folder, exist_ok=True)
+    df = df.rename(columns=str.lower).sort_values("timestamp")
+    ts = pd.DatetimeIndex(pd.to_datetime(df['timestamp'], utc=True)).as_unit("ns").asi8
+    values = {
+        col: df[col].to_numpy() for col in df.columns
+        if col != 'timestamp' and pd.api.types.is_numeric_dtype(df[col])
+    }
+    checksum = _checksum(ts, values)
+
+    ts_path = os.path.join(folder, f"{TS_COLUMN}.npy")
+    checksum_path = os.path.join(folder, CHECKSUM_FILE)
+    if os.path.exists(ts_path) and os.path.exists(checksum_path):
+        with open(checksum_path) as f:
+            if f.read().strip() == checksum:
+                return folder
+
+    # Indicators of the old bars go first; the mtime check alone can miss
+    # a rewrite that lands within the file system's timestamp resolution
+    shutil.rmtree(os.path.join(folder, INDICATOR_DIR), ignore_errors=True)
+    for col, arr in values.items():
+        _save(os.path.join(folder, f"{col}.npy"), arr)
+    _save(ts_path, ts)
+    with open(checksum_path, "w") as f:
+        f.write(checksum)
+    return folder
+
+def open_columns(symbol, timeframe, columns=None):
+    """Memory-mapped CompactFrame over the stored columns, or None if missing."""
+    files = column_files(columns_folder(symbol, timeframe))
+    if TS_COLUMN not in files:
+        return None
+    if columns is not None:
+        files = {c: p for c, p in files.items() if c == TS_COLUMN or c in columns}
+    return CompactFrame.open(files)
+
+# Indicator files: folder/indicators/<kind>_<params>.npy, one per registry spec
+INDICATOR_DIR = "indicators"
+# Derived files of older versions, stored next to the bars
+LEGACY_PREFIXES = ("donchian_", "sma_")
+
+def indicator_path(folder, spec):
+    kind, params = spec
+    name = "_".join([kind] + [str(v) for _, v in sorted(params.items())])
+    return os.path.join(folder, INDICATOR_DIR, f"{name}.npy")
+
+def _compute_columns(files, targets, n_rows, chunk_rows):
+    """
+    Registry columns ({path: spec}) computed chunk by chunk. Each chunk
+    carries the specs' lookback of earlier rows, so every value sees the
+    same window as in one compute_indicators pass over the whole history.
+    """
+    context = max(lookback(spec) for spec in targets.values()) + 1
+    bars = {c: np.load(p, mmap_mode="r") for c, p in files.items() if c != TS_COLUMN}
+    outs = {}
+    for path in targets:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        outs[path] = np.lib.format.open_memmap(path[:-4] + ".tmp.npy", mode="w+", dtype=np.float64, shape=(n_rows,))
+    for lo in range(0, n_rows, chunk_rows):
+        hi = min(lo + chunk_rows, n_rows)
+        start = max(0, lo - context)
+        chunk = pd.DataFrame({c: np.asarray(arr[start:hi], dtype=np.float64) for c, arr in bars.items()})
+        for path, values in compute_indicators(chunk, targets).items():
+            outs[path][lo:hi] = values.to_numpy()[lo - start:]
+    for path in targets:
+        outs.pop(path).flush()
+        os.replace(path[:-4] + ".tmp.npy", path)
+
+def prepare_columns(symbol, timeframe, specs=None, keep=None, chunk_rows=CHUNK_ROWS):
+    """
+    Out-of-core prepare_for_strategy: the same rows and columns, as a
+    memory-mapped CompactFrame. specs are the strategy's indicators
+    (get_indicator_specs; None = the prepare_data set), computed through
+    strategy/registry.py, stored under indicators/ and reused by later runs.
+    keep limits the columns the frame exposes (None = all).
+    """
+    specs = specs or default_indicators()
+    folder = columns_folder(symbol, timeframe)
+    files = column_files(folder)
+    if TS_COLUMN not in files:
+        return None
+    ts_path = files[TS_COLUMN]
+    n_rows = len(np.load(ts_path, mmap_mode="r"))
+    base = {c: p for c, p in files.items() if not c.startswith(LEGACY_PREFIXES)}
+
+    paths = {column: indicator_path(folder, spec) for column, spec in specs.items()}
+    stale = {paths[column]: spec for column, spec in specs.items() if not _is_fresh(paths[column], ts_path, n_rows)}
+    if stale:
+        _compute_columns(base, stale, n_rows, chunk_rows)
+
+    # Base bar columns + the indicators under the strategy's column names
+    frame_files = dict(base)
+    frame_files.update(paths)
+
+    # dropna over every column, like prepare_data; only the warm-up prefix
+    # is normally missing, which keeps the frame a view of the files
+    mapped = {c: np.load(p, mmap_mode="r") for c, p in frame_files.items() if c != TS_COLUMN}
+    bad = []
+    for lo in range(0, n_rows, chunk_rows):
+        hi = min(lo + chunk_rows, n_rows)
+        missing = np.zeros(hi - lo, dtype=bool)
+        for arr in mapped.values():
+            if arr.dtype.kind == "f":
+                missing |= np.isnan(arr[lo:hi])
+        bad.append(np.flatnonzero(missing) + lo)
+    bad = np.concatenate(bad) if bad else np.empty(0, dtype=np.int64)
+
+    if keep is not None:
+        frame_files = {c: p for c, p in frame_files.items() if c == TS_COLUMN or c in keep}
+
+    warmup = len(bad)
+    if warmup == 0 or bad[-1] == warmup - 1:
+        return CompactFrame.open(frame_files, lo=warmup, hi=n_rows)
+
+    # Gaps past the warm-up: fall back to an in-memory copy of the valid rows
+    valid = np.ones(n_rows, dtype=bool)
+    valid[bad] = False
+    frame = CompactFrame.open(frame_files)
+    return CompactFrame(np.asarray(frame.ts[valid]), {c: np.asarray(a[valid]) for c, a in frame.arrays.items()})
@@ -0,0 +1,132 @@
+# data/compact.py
+import os
+import numpy as np
+import pandas as pd
+
+# --- COMPACT BAR STORE ---
+# NumPy-only replacement for the per-symbol DataFrames in master_cache:
+# int64 nanosecond timestamps plus one array per column the strategy reads,
+# optionally float32. Period slices are searchsorted views (no copy), and a
+# memory budget either refuses the load or spills arrays to memory-mapped
+# .npy files once it is exceeded.
+
+MB = 1024 * 1024
+
+class MemoryBudgetError(MemoryError):
+    pass
+
+class CompactFrame:
+    """
+    The subset of the DataFrame surface the simulation engine uses:
+    .index, .columns, .empty, len(), frame[col] (a NumPy array) and row(pos).
+    """
+
+    def __init__(self, ts, columns, index_name="timestamp", source=None):
+        self.ts = ts # int64 ns since epoch, UTC, sorted
+        self.arrays = columns # name -> 1-D array, same length as ts
+        self.index_name = index_name
+        self.source = source # (files, lo, hi) when the arrays are rows lo:hi of .npy files
+        self._index = None
+
+    @classmethod
+    def from_frame(cls, df, keep=None, float32=False):
+        arrays = {}
+        for col in df.columns:
+            if keep is not None and col not in keep:
+                continue
+            series = df[col]
+            if not pd.api.types.is_numeric_dtype(series):
+                continue
+            if float32 and pd.api.types.is_float_dtype(series):
+                arrays[col] = series.to_numpy(dtype=np.float32)
+            else:
+                arrays[col] = series.to_numpy()
+        ts = df.index.tz_convert("UTC") if df.index.tz is not None else df.index
+        return cls(ts.as_unit("ns").asi8.copy(), arrays, df.index.name)
+
+    @classmethod
+    def open(cls, files, lo=0, hi=None, index_name="timestamp"):
+        """Memory-maps .npy files ({"_ts": path, column: path}) and views rows lo:hi."""
+        mapped = {name: np.load(path, mmap_mode="r") for name, path in files.items()}
+        hi = len(mapped["_ts"]) if hi is None else hi
+        ts = mapped.pop("_ts")[lo:hi]
+        return cls(ts, {c: a[lo:hi] for c, a in mapped.items()}, index_name, (files, lo, hi))
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = pd.DatetimeIndex(self.ts.view("datetime64[ns]"), name=self.index_name).tz_localize("UTC")
+        return self._index
+
+    @property
+    def columns(self):
+        return list(self.arrays.keys())
+
+    @property
+    def empty(self):
+        return len(self.ts) == 0
+
+    @property
+    def nbytes(self):
+        return self.ts.nbytes + sum(a.nbytes for a in self.arrays.values())
+
+    def __len__(self):
+        return len(self.ts)
+
+    def __getitem__(self, col):
+        return self.arrays[col]
+
+    def row(self, pos):
+        """Plain dict row for row-wise strategies (get_decision uses .get / [])."""
+        return {col: arr[pos].item() for col, arr in self.arrays.items()}
+
+    def slice(self, start, end):
+        """Rows with start <= ts <= end, as views into the same arrays."""
+        lo = np.searchsorted(self.ts, pd.Timestamp(start).value, side="left")
+        hi = np.searchsorted(self.ts, pd.Timestamp(end).value, side="right")
+        source = None
+        if self.source:
+            files, base, _ = self.source
+            source = (files, base + lo, base + hi)
+        return CompactFrame(self.ts[lo:hi], {c: a[lo:hi] for c, a in self.arrays.items()}, self.index_name, source)
+
+    def spill(self, folder):
+        """Writes every array to .npy and reopens it memory-mapped (read-only)."""
+        os.makedirs(folder, exist_ok=True)
+        files = {}
+        for name, arr in [("_ts", self.ts), *self.arrays.items()]:
+            files[name] = os.path.join(folder, f"{name}.npy")
+            np.save(files[name], arr)
+        return CompactFrame.open(files, index_name=self.index_name)
+
+class CompactStore:
+    """master_cache builder that enforces a memory budget (0 = unlimited)."""
+
+    def __init__(self, keep=None, float32=False, budget_mb=0, on_exceed="refuse", spill_dir=None):
+        self.keep = set(keep) if keep else None
+        self.float32 = float32
+        self.budget = budget_mb * MB
+        self.on_exceed = on_exceed
+        self.spill_dir = spill_dir
+        self.frames = {}
+        self.resident = 0
+        self.spilled = 0
+
+    def add(self, symbol, df):
+        frame = CompactFrame.from_frame(df, self.keep, self.float32)
+        if self.budget and self.resident + frame.nbytes > self.budget:
+            if self.on_exceed != "spill" or not self.spill_dir:
+                raise MemoryBudgetError(
+                    f"{symbol} needs {frame.nbytes / MB:.1f} MB, "
+                    f"{self.resident / MB:.1f} of {self.budget / MB:.0f} MB already used"
+                )
+            frame = frame.spill(os.path.join(self.spill_dir, symbol.replace("/", "-")))
+            self.spilled += 1
+        else:
+            self.resident += frame.nbytes
+        self.frames[symbol] = frame
+        return frame
+
+    def report(self):
+        budget = f"{self.budget / MB:.0f} MB" if self.budget else "unlimited"
+        return f"Memory: {self.resident / MB:.1f} MB resident / {budget} budget, {self.spilled} symbols spilled to disk"
@@ -1,62 +1,137 @@
 # data/feed.py
+import re
 import pandas as pd
-from datetime import datetime, timezone
-from alpaca.data.requests import StockBarsRequest, CryptoBarsRequest
+from functools import lru_cache
+from datetime import datetime, timezone, timedelta
 from config import CRYPTO_LIST
 
-def load_bars(stock_client, crypto_client, symbol, timeframe, start_date, end_date):
-    """
-    Universal Data Loader.
-    Sanitizes dates to Naive UTC to prevent API timezone conflicts.
-    """
-    
-    # --- DATE SANITIZATION ---
+# Alpaca timeframe strings ("1Day", "5Min", "1Hour") -> length of one bar
+TIMEFRAME_UNITS = {
+    "Min": timedelta(minutes=1),
+    "Hour": timedelta(hours=1),
+    "Day": timedelta(days=1),
+    "Week": timedelta(weeks=1),
+    "Month": timedelta(days=31),
+}
+
+def timeframe_key(timeframe):
+    """Accepts an alpaca TimeFrame or its string form ("1Day")."""
+    return str(getattr(timeframe, "value", timeframe))
+
+def timeframe_delta(timeframe):
+    match = re.fullmatch(r"(\d+)\s*([A-Za-z]+)", timeframe_key(timeframe))
+    if not match or match.group(2) not in TIMEFRAME_UNITS:
+        raise ValueError(f"Unknown timeframe: {timeframe}")
+    return int(match.group(1)) * TIMEFRAME_UNITS[match.group(2)]
+
+def parse_timeframe(timeframe):
+    """"1Day", "5Min", "1Hour" (or a TimeFrame) -> alpaca TimeFrame."""
+    from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
+    if isinstance(timeframe, TimeFrame):
+        return timeframe
+    match = re.fullmatch(r"(\d+)\s*([A-Za-z]+)", timeframe_key(timeframe).strip())
+    if not match:
+        raise ValueError(f"Unknown timeframe: {timeframe}")
+    return TimeFrame(int(match.group(1)), TimeFrameUnit(match.group(2)))
+
+def to_naive_utc(dt):
     # Convert to Naive UTC (strip timezone info but keep UTC time)
     # This prevents the "Invalid Date" or "Request Error" from Alpaca SDK
-    if start_date.tzinfo is not None:
-        start_date = start_date.astimezone(timezone.utc).replace(tzinfo=None)
-    if end_date.tzinfo is not None:
-        end_date = end_date.astimezone(timezone.utc).replace(tzinfo=None)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+class BarsRequest:
+    """Plain record with the fields of the alpaca-py bars requests."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+@lru_cache(maxsize=None)
+def _sdk_bars_requests():
+    try:
+        from alpaca.data.requests import StockBarsRequest, CryptoBarsRequest
+    except ImportError:
+        return None
+    return StockBarsRequest, CryptoBarsRequest
+
+def _request_bars(stock_client, crypto_client, symbols, timeframe, start_date, end_date):
+    """
+    One Alpaca request for one or more symbols of the same asset class.
+    limit=None lets the SDK follow next_page_token until the range is
+    exhausted, so long or intraday histories are never cut at 10k bars.
+    """
+    # The SDK is only loaded once bars are actually requested. Without it no
+    # real client can exist: stand-ins (replays, tests) read the same fields.
+    sdk = _sdk_bars_requests()
+    if sdk is None:
+        StockBarsRequest = CryptoBarsRequest = BarsRequest
+        timeframe = timeframe_key(timeframe)
+    else:
+        StockBarsRequest, CryptoBarsRequest = sdk
+        timeframe = parse_timeframe(timeframe)
+
+    start_date = to_naive_utc(start_date)
+    end_date = to_naive_utc(end_date)
 
     # --- CRYPTO HANDLER ---
-    if symbol in CRYPTO_LIST:
+    if symbols[0] in CRYPTO_LIST:
         request = CryptoBarsRequest(
-            symbol_or_symbols=symbol,
+            symbol_or_symbols=symbols,
             timeframe=timeframe,
             start=start_date,
             end=end_date,
-            limit=10000 
+            limit=None
         )
-        try:
-            bars = crypto_client.get_crypto_bars(request)
-            df = bars.df
-        except Exception as e:
-            print(f"   [Crypto Error: {e}]")
-            return pd.DataFrame()
-        
+        return crypto_client.get_crypto_bars(request).df
+
     # --- STOCK HANDLER ---
-    else:
-        request = StockBarsRequest(
-            symbol_or_symbols=symbol,
-            timeframe=timeframe,
-            start=start_date,
-            end=end_date,
-            limit=10000,
-            adjustment='split'
-        )
-        try:
-            bars = stock_client.get_stock_bars(request)
-            df = bars.df
-        except Exception as e:
-            # Reveal the error!
-            print(f"   [Stock Error: {e}]")
-            return pd.DataFrame()
-
-    # Clean Index
+    request = StockBarsRequest(
+        symbol_or_symbols=symbols,
+        timeframe=timeframe,
+        start=start_date,
+        end=end_date,
+        limit=None,
+        adjustment='split'
+    )
+    return stock_client.get_stock_bars(request).df
+
+def _clean_bars(df):
+    # Alpaca returns MultiIndex (symbol, timestamp). We want just timestamp rows.
+    df = df.reset_index()
+    if 'symbol' in df.columns:
+        df = df.drop(columns=['symbol'])
+    return df
+
+def fetch_bars(stock_client, crypto_client, symbol, timeframe, start_date, end_date):
+    """
+    Raw fetch for one symbol. Raises on API errors so callers (the disk
+    cache) can tell a failed request from a range that has no bars.
+    """
+    df = _request_bars(stock_client, crypto_client, [symbol], timeframe, start_date, end_date)
     if not df.empty:
-        df = df.reset_index()
-        # Alpaca returns MultiIndex (symbol, timestamp). We want just timestamp rows.
-        if 'symbol' in df.columns:
-            df = df.drop(columns=['symbol'])
-            
-    return df
\ No newline at end of file
+        df = _clean_bars(df)
+    return df
+
+def fetch_bars_multi(stock_client, crypto_client, symbols, timeframe, start_date, end_date):
+    """
+    Batched fetch: one request for many symbols of the same asset class.
+    Returns {symbol: df}; symbols without bars are missing from the result.
+    """
+    df = _request_bars(stock_client, crypto_client, list(symbols), timeframe, start_date, end_date)
+    if df.empty:
+        return {}
+    return {sym: _clean_bars(group) for sym, group in df.groupby(level='symbol', sort=False)}
+
+def load_bars(stock_client, crypto_client, symbol, timeframe, start_date, end_date):
+    """
+    Universal Data Loader.
+    Sanitizes dates to Naive UTC to prevent API timezone conflicts.
+    """
+    try:
+        return fetch_bars(stock_client, crypto_client, symbol, timeframe, start_date, end_date)
+    except Exception as e:
+        # Reveal the error!
+        kind = "Crypto" if symbol in CRYPTO_LIST else "Stock"
+        print(f"   [{kind} Error: {e}]")
+        return pd.DataFrame()
@@ -0,0 +1,56 @@
+# data/ratelimit.py
+import threading
+import time
+from contextlib import contextmanager
+
+from config import API_REQUESTS_PER_MINUTE
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    rate_per_minute tokens refill continuously; burst caps how many can be
+    spent at once. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst if burst else max(1, rate_per_minute // 10))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.enabled = True
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        if not self.enabled:
+            return
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Server said slow down (HTTP 429): drain the bucket for a while."""
+        with self.lock:
+            self._refill()
+            self.tokens -= seconds * self.rate
+
+    @contextmanager
+    def suspended(self):
+        """No limit inside the block (offline replays against fake clients)."""
+        self.enabled = False
+        try:
+            yield self
+        finally:
+            self.enabled = True
+
+# Shared by every Alpaca data caller (backfill, live scans)
+API_LIMITER = TokenBucket(API_REQUESTS_PER_MINUTE)
@@ -0,0 +1,305 @@
+# execution/live.py
+import asyncio
+import heapq
+import os
+import threading
+import time
+import pandas as pd
+from datetime import datetime, timezone, timedelta
+
+from strategy.streaming import restore_stream
+from strategy.loader import get_indicator_specs
+from execution.trader import (
+    load_state, save_symbol_state, get_account_cash, get_position_details,
+    decide_and_trade, DEFAULT_SYMBOL_STATE, WARMUP_DAYS
+)
+from data.feed import load_bars
+from data.aggregator import BarAggregator, load_recorded_trades
+from config import BAR_TIMEFRAME, CRYPTO_LIST, LIVE_TRADE_LATENESS
+
+# --- EVENT-DRIVEN LIVE ENGINE ---
+# Bars arrive from a source (Alpaca websocket or a local replay, either of
+# bars or of trades aggregated into bars by data/aggregator.py), are routed
+# to one queue per symbol, and each symbol's worker updates its streaming
+# indicators and trades as soon as the bar closes. Blocking SDK calls run in
+# threads, so a slow symbol only delays its own queue.
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume", "trade_count", "vwap")
+
+class ReplayBarSource:
+    """
+    Local stand-in for the bar stream. Replays recorded bars (one CSV or
+    Parquet file per symbol in load_bars format, "/" written as "-") in
+    timestamp order. speed=0 replays as fast as possible, 1.0 in real time.
+    """
+
+    def __init__(self, folder, symbols, speed=0.0):
+        self.folder = folder
+        self.symbols = symbols
+        self.speed = speed
+
+    def _read(self, symbol):
+        base = os.path.join(self.folder, symbol.replace("/", "-"))
+        if os.path.exists(base + ".parquet"):
+            df = pd.read_parquet(base + ".parquet")
+        elif os.path.exists(base + ".csv"):
+            df = pd.read_csv(base + ".csv", parse_dates=["timestamp"])
+        else:
+            print(f"Replay: no recording for {symbol}")
+            return []
+        df = df.rename(columns=str.lower).sort_values("timestamp")
+        df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+        return [(bar['timestamp'], symbol, bar) for bar in df.to_dict("records")]
+
+    async def stream(self):
+        per_symbol = [self._read(s) for s in self.symbols]
+        prev_ts = None
+        for ts, symbol, bar in heapq.merge(*per_symbol, key=lambda x: (x[0], x[1])):
+            if self.speed and prev_ts is not None and ts > prev_ts:
+                await asyncio.sleep((ts - prev_ts).total_seconds() / self.speed)
+            prev_ts = ts
+            yield symbol, bar
+            await asyncio.sleep(0) # let symbol workers run
+
+class AlpacaBarSource:
+    """
+    Alpaca market-data websocket. The SDK runs its own event loop, so it
+    lives in a daemon thread and hands bars over through a thread-safe put.
+    1Day subscribes to daily bars. Minute and hour timeframes subscribe to
+    minute bars and roll them up to BAR_TIMEFRAME (data/aggregator.py), so
+    the indicator windows count configured bars; the wall clock closes the
+    bars of quiet symbols. Other timeframes are rejected at startup.
+    """
+
+    def __init__(self, api_key, api_secret, symbols, lateness=LIVE_TRADE_LATENESS):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.symbols = symbols
+        self.lateness = lateness
+        self.daily = BAR_TIMEFRAME == "1Day"
+        self.rollup = not self.daily and BAR_TIMEFRAME != "1Min"
+        if self.rollup and not BAR_TIMEFRAME.endswith(("Min", "Hour")):
+            raise ValueError(f"Live bar stream: no {BAR_TIMEFRAME} bars (use 1Day or a Min/Hour timeframe)")
+
+    def _start_stream(self, stream_cls, symbols, loop, queue):
+        stream = stream_cls(self.api_key, self.api_secret)
+
+        async def on_bar(bar):
+            record = {"timestamp": bar.timestamp}
+            record.update({f: getattr(bar, f, None) for f in BAR_FIELDS})
+            loop.call_soon_threadsafe(queue.put_nowait, (bar.symbol, record))
+
+        if self.daily:
+            stream.subscribe_daily_bars(on_bar, *symbols)
+        else:
+            stream.subscribe_bars(on_bar, *symbols)
+        threading.Thread(target=stream.run, daemon=True).start()
+
+    async def stream(self):
+        from alpaca.data.live import StockDataStream, CryptoDataStream
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stocks = [s for s in self.symbols if s not in CRYPTO_LIST]
+        cryptos = [s for s in self.symbols if s in CRYPTO_LIST]
+        if stocks:
+            self._start_stream(StockDataStream, stocks, loop, queue)
+        if cryptos:
+            self._start_stream(CryptoDataStream, cryptos, loop, queue)
+
+        if self.rollup:
+            async for symbol, bar in rollup_bars(queue, self.lateness):
+                yield symbol, bar
+        while True:
+            yield await queue.get()
+
+CLOCK_TICK = 1.0 # seconds between wall-clock checks for bars of quiet symbols
+
+MINUTE_NS = 60 * 10**9
+
+async def rollup_bars(queue, lateness=LIVE_TRADE_LATENESS):
+    """(symbol, 1Min bar) items from queue -> (symbol, BAR_TIMEFRAME bar) as they close."""
+    agg = BarAggregator([BAR_TIMEFRAME], lateness)
+    next_tick = time.monotonic()
+    while True:
+        try:
+            symbol, bar = await asyncio.wait_for(queue.get(), timeout=CLOCK_TICK)
+            closed = agg.add_bar(symbol, bar, MINUTE_NS)
+        except asyncio.TimeoutError:
+            closed = []
+        if time.monotonic() >= next_tick:
+            closed += agg.advance(datetime.now(timezone.utc))
+            next_tick = time.monotonic() + CLOCK_TICK
+        for sym, _, rolled in closed:
+            yield sym, rolled
+
+class TradeReplaySource:
+    """
+    Recorded trades (one file per symbol, see data/aggregator.py) turned
+    into bars of BAR_TIMEFRAME, in arrival order, so late trades stay late.
+    The newest trade time is the clock that closes bars of quiet symbols.
+    speed as in ReplayBarSource.
+    """
+
+    def __init__(self, folder, symbols, speed=0.0, lateness=LIVE_TRADE_LATENESS):
+        self.folder = folder
+        self.symbols = symbols
+        self.speed = speed
+        self.lateness = lateness
+
+    async def stream(self):
+        trades = load_recorded_trades(self.folder, self.symbols)
+        agg = BarAggregator([BAR_TIMEFRAME], self.lateness)
+        ts_ns = trades["timestamp"].to_numpy(dtype="datetime64[ns]").view("int64").tolist()
+        tick = int(CLOCK_TICK * 1e9)
+        clock = next_tick = None
+        for symbol, t, price, size in zip(trades["symbol"].tolist(), ts_ns, trades["price"].tolist(), trades["size"].tolist()):
+            if clock is None:
+                clock, next_tick = t, t + tick
+            elif t > clock:
+                if self.speed:
+                    await asyncio.sleep((t - clock) / 1e9 / self.speed)
+                clock = t
+
+            closed = agg.add_trade(symbol, t, price, size)
+            if clock >= next_tick:
+                closed += agg.advance(clock)
+                next_tick = clock + tick
+            for sym, _, bar in closed:
+                yield sym, bar
+                await asyncio.sleep(0) # let symbol workers run
+
+        for sym, _, bar in agg.flush():
+            yield sym, bar
+
+class AlpacaTradeSource:
+    """
+    Alpaca trade websocket aggregated into bars of BAR_TIMEFRAME, so a bar
+    reaches the indicators when it closes (plus the lateness allowance)
+    instead of when the finished bar is published. Trades cross over from
+    the SDK thread like AlpacaBarSource's bars; the wall clock closes the
+    bars of quiet symbols.
+    """
+
+    def __init__(self, api_key, api_secret, symbols, lateness=LIVE_TRADE_LATENESS):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.symbols = symbols
+        self.lateness = lateness
+
+    def _start_stream(self, stream_cls, symbols, loop, queue):
+        stream = stream_cls(self.api_key, self.api_secret)
+
+        async def on_trade(trade):
+            loop.call_soon_threadsafe(queue.put_nowait, (trade.symbol, trade.timestamp, trade.price, trade.size))
+
+        stream.subscribe_trades(on_trade, *symbols)
+        threading.Thread(target=stream.run, daemon=True).start()
+
+    async def stream(self):
+        from alpaca.data.live import StockDataStream, CryptoDataStream
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stocks = [s for s in self.symbols if s not in CRYPTO_LIST]
+        cryptos = [s for s in self.symbols if s in CRYPTO_LIST]
+        if stocks:
+            self._start_stream(StockDataStream, stocks, loop, queue)
+        if cryptos:
+            self._start_stream(CryptoDataStream, cryptos, loop, queue)
+
+        agg = BarAggregator([BAR_TIMEFRAME], self.lateness)
+        next_tick = time.monotonic()
+        while True:
+            try:
+                symbol, ts, price, size = await asyncio.wait_for(queue.get(), timeout=CLOCK_TICK)
+                closed = agg.add_trade(symbol, ts, price, size)
+            except asyncio.TimeoutError:
+                closed = []
+            if time.monotonic() >= next_tick:
+                closed += agg.advance(datetime.now(timezone.utc))
+                next_tick = time.monotonic() + CLOCK_TICK
+            for sym, _, bar in closed:
+                yield sym, bar
+
+class LiveEngine:
+    def __init__(self, trader, strategy_module, symbols, stock_client=None, crypto_client=None):
+        self.trader = trader
+        self.strategy = strategy_module
+        self.symbols = symbols
+        self.stock_client = stock_client
+        self.crypto_client = crypto_client
+        self.state_db = load_state()
+        self.streams = {}
+        self.queues = {}
+
+    def _stream_for(self, symbol):
+        if symbol not in self.streams:
+            saved = self.state_db.get(symbol, {}).get("stream")
+            self.streams[symbol] = restore_stream(saved, get_indicator_specs(self.strategy))
+        return self.streams[symbol]
+
+    async def warm_up(self):
+        """Warm-starts every cold symbol from history (concurrently). Needs data clients."""
+        if self.stock_client is None and self.crypto_client is None:
+            return
+        now = datetime.now(timezone.utc)
+        start = now - timedelta(days=WARMUP_DAYS)
+
+        async def warm(symbol):
+            stream = self._stream_for(symbol)
+            if stream.last_ts is not None:
+                return
+            df = await asyncio.to_thread(load_bars, self.stock_client, self.crypto_client, symbol, BAR_TIMEFRAME, start, now)
+            if not df.empty:
+                stream.warm_start(df)
+
+        await asyncio.gather(*(warm(s) for s in self.symbols))
+
+    def _trade(self, symbol, row, sym_state):
+        """Runs in a worker thread: account snapshot + decision + orders."""
+        cash, buying_power = get_account_cash(self.trader)
+        qty_held, avg_entry = get_position_details(self.trader, symbol)
+        decide_and_trade(self.trader, self.strategy, symbol, row, sym_state, cash, buying_power, qty_held, avg_entry)
+        return sym_state
+
+    async def on_bar(self, symbol, bar):
+        stream = self._stream_for(symbol)
+        ts = bar['timestamp']
+        if stream.last_ts is not None and ts <= stream.last_ts:
+            return # already seen (reconnect / warm-up overlap)
+
+        row = stream.update(bar, ts)
+        sym_state = dict(self.state_db.get(symbol, DEFAULT_SYMBOL_STATE))
+        if row is not None:
+            try:
+                sym_state = await asyncio.to_thread(self._trade, symbol, row, sym_state)
+            except Exception as e:
+                print(f"Error processing {symbol}: {e}")
+
+        sym_state["stream"] = stream.to_dict()
+        self.state_db[symbol] = sym_state
+        # Only this symbol changed; the write runs off the event loop
+        await asyncio.to_thread(save_symbol_state, symbol, sym_state)
+
+    async def _worker(self, symbol):
+        queue = self.queues[symbol]
+        while True:
+            bar = await queue.get()
+            if bar is None:
+                return
+            await self.on_bar(symbol, bar)
+
+    async def run(self, source):
+        await self.warm_up()
+        self.queues = {s: asyncio.Queue() for s in self.symbols}
+        workers = [asyncio.create_task(self._worker(s)) for s in self.symbols]
+
+        try:
+            async for symbol, bar in source.stream():
+                if symbol in self.queues:
+                    self.queues[symbol].put_nowait(bar)
+        finally:
+            for queue in self.queues.values():
+                queue.put_nowait(None)
+            await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,119 @@
+# execution/orders.py
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+
+from data.ratelimit import API_LIMITER
+from config import LIVE_ORDER_WORKERS, LIVE_ORDER_RETRIES
+
+# --- ORDERS ---
+# plan_order builds plain MarketOrders; the alpaca-py request is only built
+# when one is sent to a real TradingClient. Replays and tests hand them to
+# stand-in clients, so neither needs the SDK installed.
+
+@dataclass
+class MarketOrder:
+    symbol: str
+    qty: float
+    side: str # "buy" / "sell"
+    client_order_id: str
+    time_in_force: str = "gtc"
+
+    def to_request(self):
+        from alpaca.trading.requests import MarketOrderRequest
+        from alpaca.trading.enums import OrderSide, TimeInForce
+        return MarketOrderRequest(
+            symbol=self.symbol,
+            qty=self.qty,
+            side=OrderSide(self.side),
+            time_in_force=TimeInForce(self.time_in_force),
+            client_order_id=self.client_order_id
+        )
+
+@lru_cache(maxsize=None)
+def _sdk_client_type():
+    try:
+        from alpaca.trading.client import TradingClient
+    except ImportError:
+        return None
+    return TradingClient
+
+def submit_order(trader, order):
+    """Sends a MarketOrder: as an SDK request to a TradingClient, as is to anything else."""
+    sdk_type = _sdk_client_type()
+    if sdk_type is not None and isinstance(trader, sdk_type):
+        return trader.submit_order(order.to_request())
+    return trader.submit_order(order)
+
+# --- ORDER PIPELINE ---
+# Orders are handed to a small thread pool, so a scan cycle never waits on
+# the trading API between symbols. Transient failures (network errors,
+# HTTP 429/5xx) are retried with exponential backoff behind the shared rate
+# limiter. Every order carries its own client_order_id, so a retry of an
+# order that did reach Alpaca is rejected as a duplicate instead of being
+# filled twice; that rejection counts as success.
+
+def new_client_order_id():
+    return f"ate-{uuid.uuid4().hex}"
+
+def _status(e):
+    return getattr(e, "status_code", None)
+
+def _is_transient(e):
+    status = _status(e)
+    return isinstance(e, OSError) or status == 429 or (status is not None and status >= 500)
+
+def _is_duplicate(e):
+    msg = str(e).lower()
+    return "client_order_id" in msg and "unique" in msg
+
+class OrderPipeline:
+    def __init__(self, trader, max_workers=None, retries=None, backoff=1.0):
+        self.trader = trader
+        self.retries = LIVE_ORDER_RETRIES if retries is None else retries
+        self.backoff = backoff
+        self.pool = ThreadPoolExecutor(max_workers=max_workers or LIVE_ORDER_WORKERS)
+        self.futures = {}
+
+    def _submit(self, request):
+        for attempt in range(self.retries + 1):
+            API_LIMITER.acquire()
+            try:
+                return submit_order(self.trader, request)
+            except Exception as e:
+                if attempt > 0 and _is_duplicate(e):
+                    return None # an earlier attempt went through
+                if not _is_transient(e) or attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                if _status(e) == 429:
+                    API_LIMITER.penalize(delay)
+                time.sleep(delay)
+
+    def submit(self, key, request):
+        """Queues one order (key: usually the symbol). Returns its Future."""
+        fut = self.pool.submit(self._submit, request)
+        self.futures[key] = fut
+        return fut
+
+    def drain(self):
+        """Waits for every queued order. Returns {key: exception} of the ones that failed."""
+        failed = {}
+        for key, fut in self.futures.items():
+            try:
+                fut.result()
+            except Exception as e:
+                failed[key] = e
+        self.futures = {}
+        return failed
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
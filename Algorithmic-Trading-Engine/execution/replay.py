@@ -0,0 +1,355 @@
+# execution/replay.py
+import argparse
+import contextlib
+import io
+import sys
+import threading
+import time
+import types
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+
+from execution import trader as live
+from execution.state_store import StateStore
+from data.feed import timeframe_delta, timeframe_key
+from data.cache import read_cache
+from data.ratelimit import API_LIMITER
+from backtest.portfolio import run_portfolio_simulation
+from backtest.costs import SLIPPAGE, CostModel
+from strategy.indicators import prepare_for_strategy
+from strategy.loader import STRATEGY_MAP, load_strategy
+from config import BAR_TIMEFRAME, DEFAULT_STRATEGY_ID
+
+# --- PAPER REPLAY HARNESS ---
+# Drives the real polling path (execution/trader.py: execute_cycle) over
+# recorded bars, offline and as fast as the CPU allows:
+#   ReplayClock       - the "now" of every cycle, stepped from bar close to bar close
+#   FakeDataClient    - stock + crypto historical client over in-memory bars;
+#                       never returns a bar that has not closed yet
+#   FakeTradingClient - account, positions and market orders filled at the
+#                       last close, with optional latency, partial fills
+#                       and transient errors (to exercise the order pipeline)
+# reconcile() runs run_portfolio_simulation over the same bars from the same
+# start and lists every trade where the two paths disagree. That backtest
+# holds one position at a time, while live trading buys every signal it has
+# buying power for, so the replay caps live at one open position too
+# (--max-positions; 0 replays the uncapped live model, reported as such).
+#
+#   python -m execution.replay --synthetic 20 --bars 500
+#   python -m execution.replay --symbols AAPL,BTC/USD --latency 0.005 --partial 0.2
+
+BACKTEST_POSITIONS = 1 # run_portfolio_simulation: Strict One Position
+
+class FakeAPIError(Exception):
+    """Carries an HTTP status like alpaca's APIError."""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+class ReplayClock:
+    def __init__(self, now=None):
+        self.now = now
+
+    def set(self, now):
+        self.now = now
+        return now
+
+def _utc(dt):
+    ts = pd.Timestamp(dt)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+class FakeDataClient:
+    """StockHistoricalDataClient + CryptoHistoricalDataClient over {symbol: bars}."""
+
+    def __init__(self, bars, clock, timeframe=BAR_TIMEFRAME, latency=0.0):
+        self.clock = clock
+        self.bar_len = timeframe_delta(timeframe)
+        self.latency = latency
+        self.requests = 0
+        self.frames = {}
+        self.ts_ns = {}
+        for symbol, df in bars.items():
+            df = df.rename(columns=str.lower).sort_values("timestamp").reset_index(drop=True)
+            df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+            self.frames[symbol] = df
+            self.ts_ns[symbol] = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+    def _closed_range(self, symbol, start, end):
+        """Row range of bars in [start, end] that have closed by clock.now."""
+        last_open = min(_utc(end), self.clock.now - self.bar_len)
+        ts = self.ts_ns[symbol]
+        lo = np.searchsorted(ts, _utc(start).value, side="left")
+        hi = np.searchsorted(ts, last_open.value, side="right")
+        return lo, hi
+
+    def get_stock_bars(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        self.requests += 1
+        symbols = request.symbol_or_symbols
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+
+        parts = {}
+        for symbol in symbols:
+            if symbol not in self.frames:
+                continue
+            lo, hi = self._closed_range(symbol, request.start, request.end)
+            if hi > lo:
+                parts[symbol] = self.frames[symbol].iloc[lo:hi].set_index("timestamp")
+        if not parts:
+            return types.SimpleNamespace(df=pd.DataFrame())
+        df = pd.concat(parts, names=["symbol", "timestamp"])
+        return types.SimpleNamespace(df=df)
+
+    get_crypto_bars = get_stock_bars
+
+    def last_bar(self, symbol):
+        """(timestamp, close) of the newest closed bar, or None."""
+        ts = self.ts_ns[symbol]
+        hi = np.searchsorted(ts, (self.clock.now - self.bar_len).value, side="right")
+        if hi == 0:
+            return None
+        row = self.frames[symbol].iloc[hi - 1]
+        return row["timestamp"], float(row["close"])
+
+class FakeTradingClient:
+    """
+    TradingClient stand-in. Market orders fill at the last close +/- slippage.
+    partial_fill: probability that an order fills only 50-100% of its qty.
+    error_rate: probability of a transient HTTP 503 before anything happens.
+    """
+
+    def __init__(self, data, cash=10_000.0, slippage=SLIPPAGE, latency=0.0, partial_fill=0.0, error_rate=0.0, seed=0):
+        self.data = data
+        self.cash = float(cash)
+        self.slippage = slippage
+        self.latency = latency
+        self.partial_fill = partial_fill
+        self.error_rate = error_rate
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.positions = {} # position key -> [qty, avg_entry, symbol]
+        self.seen_ids = set()
+        self.fills = []
+        self.rejected = []
+        self.errors = 0
+
+    def get_account(self):
+        with self.lock:
+            return types.SimpleNamespace(cash=self.cash, buying_power=self.cash)
+
+    def get_all_positions(self):
+        with self.lock:
+            return [types.SimpleNamespace(symbol=key, qty=qty, avg_entry_price=avg)
+                    for key, (qty, avg, _) in self.positions.items() if qty > 0]
+
+    def get_open_position(self, symbol):
+        with self.lock:
+            pos = self.positions.get(live.position_key(symbol))
+            if not pos or pos[0] <= 0:
+                raise FakeAPIError(404, "position does not exist")
+            return types.SimpleNamespace(symbol=live.position_key(symbol), qty=pos[0], avg_entry_price=pos[1])
+
+    def submit_order(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.errors += 1
+                raise FakeAPIError(503, "service unavailable")
+            order_id = getattr(request, "client_order_id", None)
+            if order_id in self.seen_ids:
+                raise FakeAPIError(422, "client_order_id must be unique")
+            self.seen_ids.add(order_id)
+
+            symbol = request.symbol
+            side = str(getattr(request.side, "value", request.side)).lower()
+            bar = self.data.last_bar(symbol)
+            if bar is None:
+                raise FakeAPIError(422, f"no quote for {symbol}")
+            bar_ts, close = bar
+
+            qty = float(request.qty)
+            if self.partial_fill and self.rng.random() < self.partial_fill:
+                qty *= self.rng.uniform(0.5, 1.0)
+
+            key = live.position_key(symbol)
+            held, avg, _ = self.positions.get(key, (0.0, 0.0, symbol))
+            if side == "buy":
+                price = close * (1 + self.slippage)
+                if qty * price > self.cash + 1e-9:
+                    self.rejected.append((bar_ts, symbol, side, qty))
+                    raise FakeAPIError(403, "insufficient buying power")
+                self.cash -= qty * price
+                avg = (held * avg + qty * price) / (held + qty)
+                held += qty
+            else:
+                qty = min(qty, held)
+                price = close * (1 - self.slippage)
+                self.cash += qty * price
+                held -= qty
+            self.positions[key] = [held, avg, symbol]
+            self.fills.append({"bar": bar_ts, "symbol": symbol, "side": side.upper(),
+                               "requested": float(request.qty), "qty": qty, "price": price})
+            return types.SimpleNamespace(id=order_id, client_order_id=order_id, filled_qty=qty)
+
+    def equity(self):
+        """Cash + positions at their last close."""
+        with self.lock:
+            total = self.cash
+            for held, _, symbol in self.positions.values():
+                bar = self.data.last_bar(symbol)
+                if held > 0 and bar is not None:
+                    total += held * bar[1]
+            return total
+
+# --- REPLAY ---
+
+def run_replay(bars, strategy_module, cash=10_000.0, timeframe=BAR_TIMEFRAME, warmup_days=live.WARMUP_DAYS,
+               latency=0.0, partial_fill=0.0, error_rate=0.0, seed=0, quiet=True, max_positions=BACKTEST_POSITIONS):
+    """
+    Runs execute_cycle once per bar close over {symbol: bars}. Cycles start
+    once warmup_days of history exist. The live state goes to an in-memory
+    store and the rate limiter is off for the duration.
+    max_positions: open positions live may hold (None = no limit).
+    """
+    symbols = [s for s, df in bars.items() if not df.empty]
+    clock = ReplayClock()
+    data = FakeDataClient({s: bars[s] for s in symbols}, clock, timeframe, latency)
+    trading = FakeTradingClient(data, cash, latency=latency, partial_fill=partial_fill, error_rate=error_rate, seed=seed)
+
+    timeline = pd.DatetimeIndex(np.unique(np.concatenate([data.ts_ns[s] for s in symbols]))).tz_localize("UTC")
+    timeline = timeline[timeline >= timeline[0] + timedelta(days=warmup_days)]
+    bar_len = data.bar_len
+
+    previous = live.set_state_store(StateStore(":memory:"))
+    output = io.StringIO() if quiet else sys.stdout
+    started = time.perf_counter()
+    try:
+        with API_LIMITER.suspended(), contextlib.redirect_stdout(output):
+            for ts in timeline:
+                live.execute_cycle(trading, data, data, symbols, strategy_module, now=clock.set(ts + bar_len),
+                                   max_positions=max_positions)
+    finally:
+        live.get_state_store().close()
+        live.set_state_store(previous)
+
+    return {
+        "symbols": symbols,
+        "start": timeline[0] if len(timeline) else None,
+        "cycles": len(timeline),
+        "elapsed": time.perf_counter() - started,
+        "cash": cash,
+        "max_positions": max_positions,
+        "trading": trading,
+        "data": data,
+    }
+
+def reconcile(bars, strategy_module, replay):
+    """
+    Backtest (run_portfolio_simulation, flat slippage, no DCA) over the same
+    bars from the replay's first cycle, then an outer join of both trade
+    lists on (bar, symbol, side).
+    """
+    trading = replay["trading"]
+    start = replay["start"]
+    prepared = {}
+    for symbol in replay["symbols"]:
+        df = prepare_for_strategy(bars[symbol], strategy_module, symbol)
+        df = df[df.index >= start]
+        if not df.empty:
+            prepared[symbol] = df
+
+    ledger, final = run_portfolio_simulation(prepared, replay["cash"], strategy_module, dca_amount=0.0,
+                                             costs=CostModel.flat(trading.slippage))
+    frame = ledger.to_frame()
+    frame = frame[frame["Action"] != "DEPOSIT"] if not frame.empty else frame
+    backtest = pd.DataFrame({
+        "bar": frame.get("Date", pd.Series(dtype=object)),
+        "symbol": frame.get("Symbol", pd.Series(dtype=object)),
+        "side": frame.get("Action", pd.Series(dtype=object)),
+        "backtest_price": frame.get("Price", pd.Series(dtype=float)),
+    })
+    fills = pd.DataFrame(trading.fills, columns=["bar", "symbol", "side", "requested", "qty", "price"])
+    fills = fills.rename(columns={"price": "live_price"})
+
+    trades = fills.merge(backtest, on=["bar", "symbol", "side"], how="outer", indicator=True)
+    trades["_merge"] = trades["_merge"].map({"both": "matched", "left_only": "live_only", "right_only": "backtest_only"})
+    trades = trades.rename(columns={"_merge": "status"}).sort_values(["bar", "symbol"]).reset_index(drop=True)
+
+    return {
+        "trades": trades,
+        "live_final": trading.equity(),
+        "backtest_final": final,
+        "partial_fills": int(np.sum(fills["qty"] < fills["requested"] - 1e-12)) if not fills.empty else 0,
+    }
+
+def position_model(max_positions):
+    if max_positions is None:
+        return "every signal with buying power"
+    return f"at most {max_positions} open"
+
+def format_report(replay, recon):
+    trading = replay["trading"]
+    trades = recon["trades"]
+    counts = trades["status"].value_counts()
+    cycles, elapsed = replay["cycles"], replay["elapsed"]
+    lines = [
+        f"SYMBOLS:   {len(replay['symbols'])}",
+        f"START:     {replay['start']}",
+        f"CYCLES:    {cycles} in {elapsed:.2f}s ({cycles / elapsed if elapsed else 0:,.1f} cycles/s)",
+        f"REQUESTS:  {replay['data'].requests} bar requests",
+        f"ORDERS:    {len(trading.fills)} filled, {recon['partial_fills']} partial, "
+        f"{len(trading.rejected)} rejected, {trading.errors} transient errors",
+        f"POSITIONS: live {position_model(replay['max_positions'])} | backtest {position_model(BACKTEST_POSITIONS)}"
+        + ("" if replay["max_positions"] == BACKTEST_POSITIONS else " (different models, trades will not match)"),
+        f"FINAL:     live ${recon['live_final']:,.2f} | backtest ${recon['backtest_final']:,.2f}",
+        f"TRADES:    {counts.get('matched', 0)} matched, {counts.get('live_only', 0)} live only, "
+        f"{counts.get('backtest_only', 0)} backtest only",
+    ]
+    diverged = trades[trades["status"] != "matched"]
+    if not diverged.empty:
+        lines.append("-" * 65)
+        lines.append(diverged.head(20).to_string(index=False))
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded bars through the live trading path.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--symbols", help="comma separated, bars from data/cache")
+    source.add_argument("--synthetic", type=int, help="number of synthetic symbols")
+    parser.add_argument("--bars", type=int, default=500, help="bars per synthetic symbol")
+    parser.add_argument("--strategy", default=DEFAULT_STRATEGY_ID, choices=list(STRATEGY_MAP))
+    parser.add_argument("--cash", type=float, default=10_000.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per fake API call")
+    parser.add_argument("--partial", type=float, default=0.0, help="probability of a partial fill")
+    parser.add_argument("--errors", type=float, default=0.0, help="probability of a transient order error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-positions", type=int, default=BACKTEST_POSITIONS,
+                        help="open positions live may hold (default: the backtest's 1, 0 = no limit like live trading)")
+    parser.add_argument("--verbose", action="store_true", help="show the live cycle output")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        from benchmarks.synthetic import make_universe
+        bars = make_universe(args.synthetic, args.bars, timeframe_key(BAR_TIMEFRAME), args.seed)
+    else:
+        bars = {s.strip(): read_cache(s.strip(), BAR_TIMEFRAME)[0] for s in args.symbols.split(",")}
+
+    strategy_module = load_strategy(args.strategy)
+    if strategy_module is None:
+        return 1
+
+    replay = run_replay(bars, strategy_module, args.cash, latency=args.latency, partial_fill=args.partial,
+                        error_rate=args.errors, seed=args.seed, quiet=not args.verbose,
+                        max_positions=args.max_positions or None)
+    if not replay["cycles"]:
+        print("Not enough history to replay.")
+        return 1
+    print("\n".join(format_report(replay, reconcile(bars, strategy_module, replay))))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
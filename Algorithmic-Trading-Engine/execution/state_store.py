@@ -0,0 +1,95 @@
+# execution/state_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- LIVE STATE STORE ---
+# One row per symbol in SQLite (WAL mode). Every save is a single
+# transaction that only rewrites symbols whose state actually changed, so a
+# crash mid-write leaves the previous committed state intact and startup is
+# just one SELECT.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbol_state (
+    symbol  TEXT PRIMARY KEY,
+    state   TEXT NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+class StateStore:
+    def __init__(self, path, legacy_json=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        self._written = {} # symbol -> last JSON text on disk
+
+        if legacy_json and os.path.exists(legacy_json) and self._is_empty():
+            self.migrate_json(legacy_json)
+
+    def _is_empty(self):
+        return self.conn.execute("SELECT 1 FROM symbol_state LIMIT 1").fetchone() is None
+
+    def migrate_json(self, json_path):
+        """One-time import of the old trade_state.json (kept as .migrated)."""
+        try:
+            with open(json_path, "r") as f:
+                legacy = json.load(f)
+        except Exception as e:
+            # Never silently start from an empty state: leave the file for inspection
+            print(f"State migration failed ({json_path}): {e}")
+            return
+        self.save(legacy)
+        os.replace(json_path, json_path + ".migrated")
+        print(f"Migrated {len(legacy)} symbols from {json_path}")
+
+    def load(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT symbol, state FROM symbol_state").fetchall()
+        state = {}
+        for symbol, text in rows:
+            state[symbol] = json.loads(text)
+            self._written[symbol] = text
+        return state
+
+    def save(self, state_db):
+        """Writes only the symbols that changed since the last load/save."""
+        changed = []
+        now = time.time()
+        for symbol, sym_state in state_db.items():
+            text = json.dumps(sym_state, sort_keys=True)
+            if self._written.get(symbol) != text:
+                changed.append((symbol, text, now))
+        return self._write(changed)
+
+    def save_symbol(self, symbol, sym_state):
+        """Writes one symbol's state (if it changed) without looking at the others."""
+        text = json.dumps(sym_state, sort_keys=True)
+        if self._written.get(symbol) == text:
+            return 0
+        return self._write([(symbol, text, time.time())])
+
+    def _write(self, changed):
+        if not changed:
+            return 0
+
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany(
+                    "INSERT INTO symbol_state (symbol, state, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(symbol) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+                    changed
+                )
+        for symbol, text, _ in changed:
+            self._written[symbol] = text
+        return len(changed)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -3,33 +3,81 @@ import time
 import json
 import os
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
-from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import MarketOrderRequest
-from alpaca.trading.enums import OrderSide, TimeInForce
-from alpaca.data.timeframe import TimeFrame
 
 # INTEGRATION
-from strategy.indicators import prepare_data
-from strategy.titan import get_decision
-from data.feed import load_bars 
+from strategy.streaming import restore_stream
+from strategy.loader import get_indicator_specs
+from execution.state_store import StateStore
+from execution.orders import OrderPipeline, MarketOrder, new_client_order_id, submit_order
+from data.feed import load_bars, timeframe_delta
+from data.ratelimit import API_LIMITER
+from config import BAR_TIMEFRAME, LIVE_SCAN_WORKERS
 
 # --- STATE MANAGEMENT ---
-STATE_FILE = "trade_state.json"
+STATE_FILE = "trade_state.json" # legacy format, migrated on first start
+STATE_DB_FILE = "trade_state.db"
+_STORE = None
+
+def get_state_store():
+    global _STORE
+    if _STORE is None:
+        _STORE = StateStore(STATE_DB_FILE, legacy_json=STATE_FILE)
+    return _STORE
+
+def set_state_store(store):
+    """Swaps the store (e.g. an in-memory one for replays). Returns the previous one."""
+    global _STORE
+    previous, _STORE = _STORE, store
+    return previous
 
 def load_state():
-    if os.path.exists(STATE_FILE):
-        try:
-            with open(STATE_FILE, 'r') as f:
-                return json.load(f)
-        except: pass
-    return {}
+    return get_state_store().load()
 
 def save_state(state):
-    with open(STATE_FILE, 'w') as f:
-        json.dump(state, f, indent=4)
+    # Only symbols whose state changed are written
+    get_state_store().save(state)
+
+def save_symbol_state(symbol, sym_state):
+    get_state_store().save_symbol(symbol, sym_state)
+
+# --- INCREMENTAL INDICATORS ---
+WARMUP_DAYS = 100
+
+def refresh_indicators(stock_client, crypto_client, symbol, sym_state, now, specs=None):
+    """
+    Brings the symbol's streaming indicators up to date and returns the
+    prepared row for the newest bar (None while warming up).
+    The first call warm-starts from WARMUP_DAYS of history; after that only
+    bars newer than the last committed one are downloaded. A bar that is
+    still forming is evaluated with peek() and committed on a later cycle.
+    specs: the strategy's indicators (get_indicator_specs), None = default set.
+    """
+    stream = restore_stream(sym_state.get("stream"), specs)
+
+    start_dt = stream.last_ts if stream.last_ts is not None else now - timedelta(days=WARMUP_DAYS)
+    df = load_bars(stock_client, crypto_client, symbol, BAR_TIMEFRAME, start_dt, now)
+
+    bar_len = timeframe_delta(BAR_TIMEFRAME)
+    latest = stream.last_row
+    if not df.empty:
+        df = df.rename(columns=str.lower).sort_values("timestamp")
+        for bar in df.to_dict("records"):
+            ts = bar['timestamp']
+            if stream.last_ts is not None and ts <= stream.last_ts:
+                continue
+            if ts + bar_len > now:
+                latest = stream.peek(bar)
+            else:
+                latest = stream.update(bar, ts)
+
+    sym_state["stream"] = stream.to_dict()
+    return latest
 
 def init_trader(api_key, api_secret, paper=True):
+    # The SDK is only loaded once a real account is connected
+    from alpaca.trading.client import TradingClient
     return TradingClient(api_key, api_secret, paper=paper)
 
 def get_account_cash(trader):
@@ -47,133 +95,236 @@ def get_position_details(trader, symbol):
     except:
         return 0.0, 0.0
 
-def execute_cycle(trader, stock_client, crypto_client, symbols):
+def position_key(symbol):
+    """Alpaca reports crypto positions without the slash (BTC/USD -> BTCUSD)."""
+    return symbol.replace("/", "")
+
+def get_account_snapshot(trader):
     """
-    Main Live Trading Loop
+    Cash, buying power and every open position ({position_key: (qty,
+    avg_entry)}) from one account call and one positions call.
+    None when either fails: trading blind could buy what is already held.
     """
-    print(f"\n--- Scan Cycle: {datetime.now(timezone.utc).strftime('%H:%M:%S')} ---")
-    
-    # 1. Load Persistent State (Crucial for Trailing Stops)
-    state_db = load_state()
+    try:
+        acct = trader.get_account()
+        positions = {
+            position_key(pos.symbol): (float(pos.qty), float(pos.avg_entry_price))
+            for pos in trader.get_all_positions()
+        }
+        return float(acct.cash), float(acct.buying_power), positions
+    except Exception as e:
+        print(f"Error fetching account snapshot: {e}")
+        return None
+
+# --- DECISION + ORDERS (shared by the polling cycle and execution/live.py) ---
+DEFAULT_SYMBOL_STATE = {
+    "highest_price": 0.0, 
+    "entry_price": 0.0,
+    "cooldown": 0
+}
+
+def plan_order(strategy_module, symbol, latest, sym_state, cash, buying_power, qty_held, avg_entry):
+    """
+    Runs the strategy on the latest prepared row and builds the order to send.
+    Mutates sym_state as if the order fills. Returns (decision, MarketOrder
+    or None, buying power the order uses).
+    """
+    request = None
+    reserved = 0.0
+    current_price = latest['close']
+
+    # Sync DB with Reality
+    if qty_held == 0:
+        sym_state["highest_price"] = 0.0
+        sym_state["entry_price"] = 0.0
+    else:
+        if current_price > sym_state["highest_price"]:
+            sym_state["highest_price"] = current_price
+        if sym_state["entry_price"] == 0:
+            sym_state["entry_price"] = avg_entry
     
-    cash, buying_power = get_account_cash(trader)
-    print(f"Cash: ${cash:.2f} | Buying Power: ${buying_power:.2f}")
+    # Decrement Cooldown
+    if sym_state["cooldown"] > 0:
+        sym_state["cooldown"] -= 1
 
-    for symbol in symbols:
-        try:
-            # --- A. Smart Fetch (Last 100 Days) ---
-            end_dt = datetime.now(timezone.utc)
-            start_dt = end_dt - timedelta(days=100)
-            
-            # Use the robust load_bars from data/feed.py
-            df = load_bars(stock_client, crypto_client, symbol, "1Day", start_dt, end_dt)
-            
-            if df.empty or len(df) < 50:
-                print(f"Skipping {symbol}: Insufficient data (Rows: {len(df)})")
-                continue
-                
-            # --- B. Calculate Indicators ---
-            df = prepare_data(df)
-            latest = df.iloc[-1]
-            current_price = latest['close']
-            
-            # --- C. Build Context ---
-            qty_held, avg_entry = get_position_details(trader, symbol)
-            
-            # Retrieve Symbol State from DB
-            sym_state = state_db.get(symbol, {
-                "highest_price": 0.0, 
-                "entry_price": 0.0,
-                "cooldown": 0
-            })
-            
-            # Sync DB with Reality
-            if qty_held == 0:
-                sym_state["highest_price"] = 0.0
-                sym_state["entry_price"] = 0.0
-            else:
-                if current_price > sym_state["highest_price"]:
-                    sym_state["highest_price"] = current_price
-                if sym_state["entry_price"] == 0:
-                    sym_state["entry_price"] = avg_entry
-            
-            # Decrement Cooldown
-            if sym_state["cooldown"] > 0:
-                sym_state["cooldown"] -= 1
-
-            # Prepare Context
-            context = {
-                "holdings": qty_held,
-                "entry_price": sym_state["entry_price"],
-                "highest_price": sym_state["highest_price"],
-                "cooldown": sym_state["cooldown"]
-            }
-            
-            # --- D. Get Strategy Decision ---
-            equity = cash + (qty_held * current_price)
-            action = get_decision(latest, context, symbol, equity)
-            
-            if action != "HOLD":
-                print(f"{symbol}: {action} signal at ${current_price:.2f}")
+    # Prepare Context (same keys the backtester hands the strategy)
+    context = {
+        "position": 1 if qty_held > 0 else 0,
+        "holdings": qty_held,
+        "entry_price": sym_state["entry_price"],
+        "highest_price": sym_state["highest_price"],
+        "cooldown": sym_state["cooldown"]
+    }
+    
+    # --- D. Get Strategy Decision ---
+    equity = cash + (qty_held * current_price)
+    action, _, _, _ = strategy_module.get_decision(latest, context, symbol, equity)
+    
+    if action != "HOLD":
+        print(f"{symbol}: {action} at ${current_price:.2f}")
 
-            # --- E. Execute Orders ---
-            
-            # BUY LOGIC
-            if action == "BUY" and qty_held == 0:
-                
-                # SMART BUFFER LOGIC
-                if "/" in symbol:
-                    # CRYPTO: 2% Buffer (Fees + Volatility)
-                    buffer = 0.98
-                else:
-                    # STOCKS: 1% Buffer (Market Order Safety)
-                    buffer = 0.99
-                
-                alloc_amount = buying_power * buffer
-                
-                # Check if we have enough cash to buy at least 1 unit (or fractional)
-                if alloc_amount > (current_price * 0.01):
-                    qty_to_buy = alloc_amount / current_price
-                    qty_to_buy = float(round(qty_to_buy, 4))
-                    
-                    if qty_to_buy > 0:
-                        print(f"EXECUTING BUY: {symbol} x {qty_to_buy} (${alloc_amount:.2f})")
-                        
-                        req = MarketOrderRequest(
-                            symbol=symbol,
-                            qty=qty_to_buy,
-                            side=OrderSide.BUY,
-                            time_in_force=TimeInForce.GTC
-                        )
-                        trader.submit_order(req)
-                        
-                        # Update State Immediately
-                        sym_state["entry_price"] = current_price
-                        sym_state["highest_price"] = current_price
+    # --- E. Execute Orders ---
+    
+    # BUY LOGIC
+    if action == "BUY_SIGNAL" and qty_held == 0:
+        
+        # SMART BUFFER LOGIC
+        if "/" in symbol:
+            # CRYPTO: 2% Buffer (Fees + Volatility)
+            buffer = 0.98
+        else:
+            # STOCKS: 1% Buffer (Market Order Safety)
+            buffer = 0.99
+        
+        alloc_amount = buying_power * buffer
+        
+        # Check if we have enough cash to buy at least 1 unit (or fractional)
+        if alloc_amount > (current_price * 0.01):
+            qty_to_buy = alloc_amount / current_price
+            qty_to_buy = float(round(qty_to_buy, 4))
             
-            # SELL LOGIC
-            elif action == "SELL" and qty_held > 0:
-                print(f"EXECUTING SELL: {symbol} x {qty_held}")
+            if qty_to_buy > 0:
+                print(f"EXECUTING BUY: {symbol} x {qty_to_buy} (${alloc_amount:.2f})")
                 
-                req = MarketOrderRequest(
+                request = MarketOrder(
                     symbol=symbol,
-                    qty=qty_held,
-                    side=OrderSide.SELL,
-                    time_in_force=TimeInForce.GTC
+                    qty=qty_to_buy,
+                    side="buy",
+                    client_order_id=new_client_order_id()
                 )
-                trader.submit_order(req)
+                reserved = alloc_amount
                 
-                # Reset State
-                sym_state["entry_price"] = 0.0
-                sym_state["highest_price"] = 0.0
-                sym_state["cooldown"] = 5 
+                # Update State Immediately
+                sym_state["entry_price"] = current_price
+                sym_state["highest_price"] = current_price
+    
+    # SELL LOGIC
+    elif action == "SELL_SIGNAL" and qty_held > 0:
+        print(f"EXECUTING SELL: {symbol} x {qty_held}")
+        
+        request = MarketOrder(
+            symbol=symbol,
+            qty=qty_held,
+            side="sell",
+            client_order_id=new_client_order_id()
+        )
+        
+        # Reset State
+        sym_state["entry_price"] = 0.0
+        sym_state["highest_price"] = 0.0
+        sym_state["cooldown"] = 5 
+
+    return action, request, reserved
+
+def decide_and_trade(trader, strategy_module, symbol, latest, sym_state, cash, buying_power, qty_held, avg_entry):
+    """
+    Runs the strategy on the latest prepared row and submits orders (blocking).
+    Mutates sym_state; returns the strategy decision.
+    """
+    before = dict(sym_state)
+    action, request, _ = plan_order(strategy_module, symbol, latest, sym_state, cash, buying_power, qty_held, avg_entry)
+    if request is not None:
+        try:
+            submit_order(trader, request)
+        except Exception:
+            # Order never went out: keep the pre-order state
+            sym_state.clear()
+            sym_state.update(before)
+            raise
+    return action
+
+def execute_cycle(trader, stock_client, crypto_client, symbols, strategy_module, now=None, max_positions=None):
+    """
+    Main Live Trading Loop (polling)
+    Bars are refreshed concurrently behind the shared rate limiter, the
+    account and all positions come from one snapshot, and orders go through
+    the OrderPipeline while the remaining symbols are evaluated.
+    now: cycle time (defaults to the wall clock; replays pass their own).
+    max_positions: no new buys once this many positions are open (replays
+    use it to follow the backtest's position model). None = no limit.
+    """
+    now = now or datetime.now(timezone.utc)
+    print(f"\n--- Scan Cycle: {now.strftime('%H:%M:%S')} ---")
+    
+    # 1. Load Persistent State (Crucial for Trailing Stops)
+    state_db = load_state()
+    
+    snapshot = get_account_snapshot(trader)
+    if snapshot is None:
+        print("--- Cycle Skipped ---")
+        return
+    cash, buying_power, positions = snapshot
+    print(f"Cash: ${cash:.2f} | Buying Power: ${buying_power:.2f} | Positions: {len(positions)}")
+
+    # Retrieve Symbol State from DB
+    states = {symbol: state_db.setdefault(symbol, dict(DEFAULT_SYMBOL_STATE)) for symbol in symbols}
+
+    # --- A+B. Incremental Indicators (newest bars only, concurrently) ---
+    specs = get_indicator_specs(strategy_module)
+
+    def refresh(symbol):
+        API_LIMITER.acquire()
+        return refresh_indicators(stock_client, crypto_client, symbol, states[symbol], now, specs)
+
+    latest_rows = {}
+    with ThreadPoolExecutor(max_workers=LIVE_SCAN_WORKERS) as pool:
+        futures = {pool.submit(refresh, symbol): symbol for symbol in symbols}
+        for fut in as_completed(futures):
+            symbol = futures[fut]
+            try:
+                latest_rows[symbol] = fut.result()
+            except Exception as e:
+                print(f"Error processing {symbol}: {e}")
+
+    # --- C-E. Decisions in universe order, orders through the pipeline ---
+    # With max_positions, exits go first and the account is read again
+    # before entries, so a position sold on this bar frees its slot and its
+    # cash for the next one (the backtest's exit-then-entry bar).
+    if max_positions is None:
+        passes = [symbols]
+    else:
+        held = {s for s in symbols if positions.get(position_key(s), (0.0, 0.0))[0] > 0}
+        passes = [[s for s in symbols if s in held], [s for s in symbols if s not in held]]
+
+    before = {}
+    with OrderPipeline(trader) as pipeline:
+        for n, pass_symbols in enumerate(passes):
+            if n > 0:
+                snapshot = get_account_snapshot(trader)
+                if snapshot is None:
+                    break
+                cash, buying_power, positions = snapshot
+            free_slots = None if max_positions is None else max_positions - sum(1 for qty, _ in positions.values() if qty > 0)
+
+            for symbol in pass_symbols:
+                if symbol not in latest_rows:
+                    continue
+                latest = latest_rows[symbol]
+                if latest is None:
+                    print(f"Skipping {symbol}: Insufficient data")
+                    continue
+                try:
+                    sym_state = states[symbol]
+                    qty_held, avg_entry = positions.get(position_key(symbol), (0.0, 0.0))
+                    before[symbol] = dict(sym_state)
+
+                    # No free slot: the strategy still runs, but nothing is left to buy with
+                    usable = buying_power if free_slots is None or free_slots > 0 else 0.0
+                    action, request, reserved = plan_order(strategy_module, symbol, latest, sym_state, cash, usable, qty_held, avg_entry)
+                    if request is not None:
+                        pipeline.submit(symbol, request)
+                        # Later buys of this cycle size from what is left
+                        buying_power -= reserved
+                        if free_slots is not None and request.side == "buy":
+                            free_slots -= 1
+                except Exception as e:
+                    print(f"Error processing {symbol}: {e}")
+
+            for symbol, e in pipeline.drain().items():
+                print(f"Order failed for {symbol}: {e}")
+                states[symbol].clear()
+                states[symbol].update(before[symbol])
 
-            # Save updated state back to DB object
-            state_db[symbol] = sym_state
-            
-        except Exception as e:
-            print(f"Error processing {symbol}: {e}")
-            
     # Save DB to file at end of cycle
     save_state(state_db)
-    print("--- Cycle Complete ---")
\ No newline at end of file
+    print("--- Cycle Complete ---")
@@ -1,53 +1,78 @@
 # main.py
-import time
+import argparse
 import logging
 import os
-import pandas as pd
+import sys
 from datetime import datetime, timedelta, timezone
 
-from alpaca.data.historical import StockHistoricalDataClient, CryptoHistoricalDataClient
-
-from data.feed import load_bars
-from execution.trader import init_trader
-from strategy.indicators import prepare_data
 from strategy.loader import STRATEGY_MAP, load_strategy, get_strategy_name
-from backtest.portfolio import run_portfolio_simulation, write_portfolio_backtest
 from config import (
     BACKTEST_DAYS, CREDENTIALS_FILE, RECURRING_INVESTMENT, STOCK_LIST, CRYPTO_LIST, FULL_UNIVERSE,
-    BAR_TIMEFRAME, INITIAL_CAPITAL, DEFAULT_STRATEGY_ID
+    BAR_TIMEFRAME, INITIAL_CAPITAL, DEFAULT_STRATEGY_ID, CACHE_ENABLED, BACKTEST_WORKERS, SWEEP_GRID, MONTE_CARLO,
+    CACHE_DIR, LIVE_SOURCE, LIVE_REPLAY_DIR, LIVE_REPLAY_SPEED,
+    MEMORY_COMPACT, MEMORY_FLOAT32, MEMORY_BUDGET_MB, MEMORY_ON_EXCEED, SPILL_DIR,
+    COLUMNAR_ENABLED, BACKFILL_BATCH_SIZE, BACKTEST_ENGINE, RESULTS_DB, RESULTS_TEXT, PANEL_INDICATORS,
+    MAX_POSITIONS, POSITION_SIZING
 )
 
+# --- STARTUP ---
+# pandas, numpy and the alpaca SDK are imported by the modes that use them,
+# and the Alpaca clients are built on first use (connect). The menu and the
+# headless CLI start without loading any of them, and a backtest without
+# credentials (or with --offline) runs on the bar cache alone.
+#
+#   python main.py backtest --universe stocks --periods 365,730-365 --capital 1000 --dca 250
+#   python main.py backtest --universe AAPL,BTC/USD --offline
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 API_KEY, API_SECRET = None, None
 stock_client = None
 crypto_client = None
 trader = None
+OFFLINE = False
 STATE = {}
 CURRENT_STRATEGY = None 
 STRAT_NAME = "Unknown"
 
-def setup():
-    global API_KEY, API_SECRET, stock_client, crypto_client, trader, CURRENT_STRATEGY, STRAT_NAME
+def load_credentials():
+    with open(CREDENTIALS_FILE, "r") as f:
+        lines = f.readlines()
+    key_line = next((line for line in lines if line.startswith("Key:")), None)
+    secret_line = next((line for line in lines if line.startswith("Sec:")), None)
+    return key_line.split(":")[1].strip(), secret_line.split(":")[1].strip()
+
+def connect():
+    """Builds the Alpaca data clients on first use. False = offline (cached bars only)."""
+    global API_KEY, API_SECRET, stock_client, crypto_client, OFFLINE
+    if stock_client is not None:
+        return True
+    if OFFLINE:
+        return False
     try:
-        with open(CREDENTIALS_FILE, "r") as f:
-            lines = f.readlines()
-        key_line = next((line for line in lines if line.startswith("Key:")), None)
-        secret_line = next((line for line in lines if line.startswith("Sec:")), None)
-        
-        API_KEY = key_line.split(":")[1].strip()
-        API_SECRET = secret_line.split(":")[1].strip()
-        
+        API_KEY, API_SECRET = load_credentials()
+        from alpaca.data.historical import StockHistoricalDataClient, CryptoHistoricalDataClient
         stock_client = StockHistoricalDataClient(API_KEY, API_SECRET)
         crypto_client = CryptoHistoricalDataClient(API_KEY, API_SECRET)
-        trader = init_trader(API_KEY, API_SECRET)
-        
-        CURRENT_STRATEGY = load_strategy(DEFAULT_STRATEGY_ID)
-        STRAT_NAME = get_strategy_name(DEFAULT_STRATEGY_ID)
-        
+        return True
     except Exception as e:
         print(f"Setup Error: {e}")
-        exit()
+        print("Offline: using cached bars only.")
+        OFFLINE = True
+        return False
+
+def get_trader():
+    """TradingClient on first use, None without credentials."""
+    global trader
+    if trader is None and connect():
+        from execution.trader import init_trader
+        trader = init_trader(API_KEY, API_SECRET)
+    return trader
+
+def setup(strategy_id=DEFAULT_STRATEGY_ID):
+    global CURRENT_STRATEGY, STRAT_NAME
+    CURRENT_STRATEGY = load_strategy(strategy_id)
+    STRAT_NAME = get_strategy_name(strategy_id)
 
 def play_sound():
     sound_file = "notification.wav"
@@ -79,6 +104,72 @@ def parse_period_string(input_str):
             
     return periods, max_lookback
 
+def strategy_specs():
+    """The current strategy's indicators (INDICATORS), else the prepare_data set."""
+    from strategy.indicators import default_indicators
+    from strategy.loader import get_indicator_specs
+    return get_indicator_specs(CURRENT_STRATEGY) or default_indicators()
+
+def warmup_history():
+    """Extra history for indicator warm-up: a year of daily bars, a few days of intraday ones."""
+    from data.feed import timeframe_delta
+    from strategy.registry import warmup_bars
+    bar = timeframe_delta(BAR_TIMEFRAME)
+    if bar >= timedelta(days=1):
+        return timedelta(days=365)
+    # ~6 calendar hours per stock-market bar hour (nights, weekends)
+    return max(timedelta(days=7), 6 * warmup_bars(strategy_specs()) * bar)
+
+def fetch_universe(target_universe, max_days_needed):
+    """Raw bars for the universe, with extra history for indicator warm-up."""
+    from data.backfill import backfill_bars
+    from backtest.profiling import PROFILER
+    connect()
+    fetch_end = datetime.now(timezone.utc) - timedelta(minutes=15)
+    fetch_start = fetch_end - timedelta(days=max_days_needed) - warmup_history()
+    with PROFILER.stage("fetch"):
+        return backfill_bars(stock_client, crypto_client, target_universe, BAR_TIMEFRAME, fetch_start, fetch_end, use_cache=CACHE_ENABLED)
+
+def compact_columns():
+    """Only the columns the engine and the current strategy read (None = all)."""
+    from backtest.portfolio import indicator_columns
+    from strategy.loader import get_required_columns
+    required = get_required_columns(CURRENT_STRATEGY)
+    return {"close", *indicator_columns(CURRENT_STRATEGY), *required} if required else None
+
+def make_compact_store():
+    from data.compact import CompactStore
+    return CompactStore(keep=compact_columns(), float32=MEMORY_FLOAT32, budget_mb=MEMORY_BUDGET_MB,
+                        on_exceed=MEMORY_ON_EXCEED, spill_dir=SPILL_DIR)
+
+def build_columnar_cache(target_universe, max_days_needed):
+    """
+    Backfills one batch of symbols at a time into column files, so only a
+    batch is ever held in RAM, then maps the prepared columns from disk.
+    """
+    from data.columnar import write_columns, prepare_columns
+    from backtest.profiling import PROFILER
+    for b in range(0, len(target_universe), BACKFILL_BATCH_SIZE):
+        batch = target_universe[b:b + BACKFILL_BATCH_SIZE]
+        for symbol, raw_df in fetch_universe(batch, max_days_needed).items():
+            if not raw_df.empty:
+                write_columns(symbol, BAR_TIMEFRAME, raw_df)
+
+    master_cache = {}
+    keep = compact_columns()
+    specs = strategy_specs()
+    for symbol in target_universe:
+        print(f"Mapping {symbol}...", end=" ")
+        try:
+            with PROFILER.stage("prepare_data"):
+                frame = prepare_columns(symbol, BAR_TIMEFRAME, specs, keep=keep)
+            if frame is not None and not frame.empty:
+                master_cache[symbol] = frame
+                print("OK")
+            else: print("No Indicators")
+        except Exception as e: print(f"Err: {e}")
+    return master_cache
+
 def run_backtest_mode(target_universe, selection_name):
     if not CURRENT_STRATEGY:
         print("Error: No strategy loaded.")
@@ -106,69 +197,240 @@ def run_backtest_mode(target_universe, selection_name):
         dca_int_str = input(f"Interval in Days (Default {RECURRING_INVESTMENT['interval_days']}): ").strip()
         dca_interval = int(dca_int_str) if dca_int_str else RECURRING_INVESTMENT["interval_days"]
 
+    if run_backtest(target_universe, selection_name, sim_capital, period_input, dca_amount, dca_interval):
+        play_sound()
+
+def run_backtest(target_universe, selection_name, sim_capital, period_input, dca_amount, dca_interval):
+    """Fetch/prepare + every period of the batch, no prompts. Returns the number of runs stored."""
+    import pandas as pd
+    from data.compact import MemoryBudgetError
+    from data.feed import timeframe_key
+    from strategy.indicators import prepare_for_strategy, prepare_panel_for_strategy
+    from backtest.portfolio import write_portfolio_backtest
+    from backtest.batch import run_batch
+    from backtest.profiling import PROFILER
+    from backtest.results_db import ResultsDB, run_record, new_batch_id
+
     periods, max_days_needed = parse_period_string(period_input)
+    if not periods:
+        print(f"No valid periods in: {period_input}")
+        return 0
     
     # --- SMART FETCH ---
     print(f"\n>>> SMART FETCH: Downloading {max_days_needed} days...")
     master_cache = {}
+    PROFILER.reset()
     
-    fetch_end = datetime.now(timezone.utc) - timedelta(minutes=15)
-    fetch_start = fetch_end - timedelta(days=max_days_needed + 365) 
-    
-    for symbol in target_universe:
-        print(f"Caching {symbol}...", end=" ")
-        try:
-            raw_df = load_bars(stock_client, crypto_client, symbol, BAR_TIMEFRAME, fetch_start, fetch_end)
-            if not raw_df.empty:
-                full_df = prepare_data(raw_df)
+    if COLUMNAR_ENABLED:
+        master_cache = build_columnar_cache(target_universe, max_days_needed)
+    else:
+        raw_map = fetch_universe(target_universe, max_days_needed)
+        store = make_compact_store() if MEMORY_COMPACT else None
+        
+        if PANEL_INDICATORS:
+            # Whole universe in one pass (strategy/indicators.py, panel mode)
+            with PROFILER.stage("prepare_data"):
+                panel_map = prepare_panel_for_strategy(raw_map, CURRENT_STRATEGY)
+            raw_map = {}
+        
+        for symbol in target_universe:
+            print(f"Caching {symbol}...", end=" ")
+            try:
+                if PANEL_INDICATORS:
+                    full_df = panel_map.pop(symbol, pd.DataFrame())
+                else:
+                    raw_df = raw_map.pop(symbol, pd.DataFrame())
+                    if raw_df.empty: continue
+                    with PROFILER.stage("prepare_data"):
+                        full_df = prepare_for_strategy(raw_df, CURRENT_STRATEGY, symbol)
                 if not full_df.empty:
-                    master_cache[symbol] = full_df
+                    master_cache[symbol] = store.add(symbol, full_df) if store else full_df
                     print("OK")
                 else: print("No Indicators")
-            else: pass 
-        except Exception as e: print(f"Err: {e}")
+            except MemoryBudgetError as e:
+                print(f"\nMemory budget exceeded: {e}. Aborting.")
+                return 0
+            except Exception as e: print(f"Err: {e}")
+
+        if store: print(store.report())
 
     if not master_cache:
         print("No data cached. Aborting.")
-        return
+        return 0
 
     # --- BATCH EXECUTION ---
-    print(f"\n>>> EXECUTING {len(periods)} SIMULATIONS FROM MEMORY...")
+    mode = "IN PARALLEL" if BACKTEST_WORKERS != 1 and len(periods) > 1 else "FROM MEMORY"
+    print(f"\n>>> EXECUTING {len(periods)} SIMULATIONS {mode}...")
     
-    for start_days, end_days in periods:
-        
-        sim_end_dt = datetime.now(timezone.utc) - timedelta(days=end_days)
-        sim_start_dt = datetime.now(timezone.utc) - timedelta(days=start_days)
+    batch_id = new_batch_id()
+    params = {"initial_capital": sim_capital, "dca_amount": dca_amount, "dca_interval": dca_interval,
+              "engine": BACKTEST_ENGINE, "timeframe": timeframe_key(BAR_TIMEFRAME),
+              "max_positions": MAX_POSITIONS, "sizing": POSITION_SIZING}
+    records = []
+    
+    batch = run_batch(master_cache, periods, sim_capital, CURRENT_STRATEGY, dca_amount, dca_interval, workers=BACKTEST_WORKERS)
+    for (start_days, end_days), result in batch:
         period_label = f"{start_days}-{end_days}"
         
         print(f"\nRunning: {selection_name} | {period_label}")
         
-        current_ticker_map = {}
-        for symbol, df in master_cache.items():
-            mask = (df.index >= sim_start_dt) & (df.index <= sim_end_dt)
-            sliced_df = df.loc[mask]
-            if not sliced_df.empty:
-                current_ticker_map[symbol] = sliced_df
-        
-        if not current_ticker_map:
+        if result is None:
             print("No data in this time slice.")
             continue
 
-        # Pass Dynamic DCA Settings
-        ledger, final_equity = run_portfolio_simulation(
-            current_ticker_map, 
-            sim_capital, 
-            CURRENT_STRATEGY,
-            dca_amount=dca_amount,
-            dca_interval=dca_interval
-        )
+        ledger, final_equity = result
         
         print(f"Result: ${final_equity:,.2f}")
-        write_portfolio_backtest(ledger, final_equity, STRAT_NAME, period_label, selection_name)
+        with PROFILER.stage("write_report"):
+            records.append(run_record(batch_id, STRAT_NAME, selection_name, (start_days, end_days), ledger, final_equity, params))
+            if RESULTS_TEXT:
+                write_portfolio_backtest(ledger, final_equity, STRAT_NAME, period_label, selection_name)
+
+    if records:
+        with PROFILER.stage("write_report"):
+            db = ResultsDB(RESULTS_DB)
+            db.add_runs(records)
+            db.close()
+        print(f"Results DB: {RESULTS_DB} (batch {batch_id}, {len(records)} runs)")
 
     print("\n>>> ALL BATCHES COMPLETE.")
+    if PROFILER.enabled:
+        print(PROFILER.summary())
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join("backtest", "results", STRAT_NAME, f"profile_{selection_name}_{ts}.json")
+        PROFILER.write(path)
+        print(f"Profile: {path}")
+    return len(records)
+
+def run_sweep_mode(target_universe, selection_name):
+    if not CURRENT_STRATEGY:
+        print("Error: No strategy loaded.")
+        return
+
+    from backtest.sweep import run_sweep, expand_grid
+
+    print(f"\nParameter Sweep [{selection_name}]")
+    cap_str = input(f"Initial Capital (Default ${INITIAL_CAPITAL}): ").strip()
+    sim_capital = float(cap_str) if cap_str else float(INITIAL_CAPITAL)
+
+    period_input = input("Enter Periods (e.g., 365, 730-365): ").strip()
+    if not period_input: period_input = str(BACKTEST_DAYS)
+    periods, max_days_needed = parse_period_string(period_input)
+
+    grid = SWEEP_GRID
+    combos = expand_grid(grid, strategy_specs())
+    swept = {key: grid[key] for key in (combos[0] if combos else {})}
+    print(f"Grid: {swept} -> {len(combos)} combinations x {len(periods)} periods")
+    skipped = [key for key in grid if key not in swept]
+    if skipped:
+        print(f"Not swept (the strategy does not use them): {', '.join(skipped)}")
+
+    print(f"\n>>> SMART FETCH: Downloading {max_days_needed} days...")
+    raw_map = fetch_universe(target_universe, max_days_needed)
+
+    results = run_sweep(raw_map, grid, periods, sim_capital, CURRENT_STRATEGY,
+                        dca_amount=RECURRING_INVESTMENT["amount"], dca_interval=RECURRING_INVESTMENT["interval_days"],
+                        workers=BACKTEST_WORKERS)
+    if results.empty:
+        print("No data cached. Aborting.")
+        return
+
+    print(results.head(10).to_string())
+
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    folder = os.path.join("backtest", "results", STRAT_NAME)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"sweep_{selection_name}_{ts}.csv")
+    results.to_csv(path)
+    print(f"Log: {path}")
+    play_sound()
+
+def run_monte_carlo_mode(target_universe, selection_name):
+    if not CURRENT_STRATEGY:
+        print("Error: No strategy loaded.")
+        return
+
+    from backtest.montecarlo import run_monte_carlo, format_summary
+
+    print(f"\nMonte Carlo [{selection_name}]")
+    cap_str = input(f"Initial Capital (Default ${INITIAL_CAPITAL}): ").strip()
+    sim_capital = float(cap_str) if cap_str else float(INITIAL_CAPITAL)
+
+    days_str = input(f"History in Days (Default {BACKTEST_DAYS}): ").strip()
+    days = int(days_str) if days_str else int(BACKTEST_DAYS)
+
+    paths_str = input(f"Paths (Default {MONTE_CARLO['paths']}): ").strip()
+    n_paths = int(paths_str) if paths_str else int(MONTE_CARLO["paths"])
+
+    print(f"\n>>> SMART FETCH: Downloading {days} days...")
+    raw_map = fetch_universe(target_universe, days)
+
+    print(f">>> SIMULATING {n_paths} PATHS (block {MONTE_CARLO['block_size']}, "
+          f"slippage jitter {MONTE_CARLO['slippage_jitter']}, random start {MONTE_CARLO['random_start']})...")
+    try:
+        results = run_monte_carlo(raw_map, CURRENT_STRATEGY, sim_capital, n_paths,
+                                  dca_amount=RECURRING_INVESTMENT["amount"], dca_interval=RECURRING_INVESTMENT["interval_days"],
+                                  block_size=MONTE_CARLO["block_size"], slippage_jitter=MONTE_CARLO["slippage_jitter"],
+                                  random_start=MONTE_CARLO["random_start"], min_bars=MONTE_CARLO["min_bars"],
+                                  seed=MONTE_CARLO["seed"], workers=MONTE_CARLO["workers"])
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    if results.empty:
+        print("No data cached. Aborting.")
+        return
+
+    print("\n".join(format_summary(results)))
+
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    folder = os.path.join("backtest", "results", STRAT_NAME)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"montecarlo_{selection_name}_{ts}.csv")
+    results.to_csv(path)
+    print(f"Log: {path}")
     play_sound()
 
+def run_live_mode(target_universe):
+    if get_trader() is None:
+        print("Live trading needs API credentials.")
+        return
+
+    import asyncio
+    from execution.live import LiveEngine, AlpacaBarSource, ReplayBarSource, AlpacaTradeSource, TradeReplaySource
+    from data.feed import timeframe_key
+
+    engine = LiveEngine(trader, CURRENT_STRATEGY, target_universe, stock_client, crypto_client)
+    
+    if LIVE_SOURCE == "replay":
+        folder = LIVE_REPLAY_DIR or os.path.join(CACHE_DIR, timeframe_key(BAR_TIMEFRAME))
+        print(f"Source: replay of {folder} (speed {LIVE_REPLAY_SPEED or 'max'})")
+        source = ReplayBarSource(folder, target_universe, speed=LIVE_REPLAY_SPEED)
+    elif LIVE_SOURCE == "trade_replay":
+        folder = LIVE_REPLAY_DIR or os.path.join("data", "trades")
+        print(f"Source: trades recorded in {folder} -> {timeframe_key(BAR_TIMEFRAME)} bars (speed {LIVE_REPLAY_SPEED or 'max'})")
+        source = TradeReplaySource(folder, target_universe, speed=LIVE_REPLAY_SPEED)
+    elif LIVE_SOURCE == "trades":
+        print(f"Source: Alpaca trades -> {timeframe_key(BAR_TIMEFRAME)} bars")
+        source = AlpacaTradeSource(API_KEY, API_SECRET, target_universe)
+    else:
+        try:
+            source = AlpacaBarSource(API_KEY, API_SECRET, target_universe)
+        except ValueError as e:
+            print(e)
+            return
+    
+    try:
+        asyncio.run(engine.run(source))
+    except KeyboardInterrupt: pass
+
+def resolve_universe(selection):
+    """"stocks", "crypto", "full" (settings.json) or comma separated symbols."""
+    key = selection.strip().lower()
+    if key == "stocks": return STOCK_LIST, "Stocks"
+    if key == "crypto": return CRYPTO_LIST, "Crypto"
+    if key == "full": return FULL_UNIVERSE, "Full"
+    return [s.strip() for s in selection.upper().split(',') if s.strip()], "Custom"
+
 def get_asset_selection():
     print("\n1. Stocks (Settings)")
     print("2. Crypto (Settings)")
@@ -193,7 +455,9 @@ def main_menu():
         print("1. Backtest")
         print("2. Live Trade")
         print("3. Strategy Select")
-        print("4. Exit")
+        print("4. Parameter Sweep")
+        print("5. Monte Carlo")
+        print("6. Exit")
         
         choice = input("Option: ")
 
@@ -205,9 +469,7 @@ def main_menu():
             target, name = get_asset_selection()
             if target:
                 print(f"Live Trading {name}... (Ctrl+C to stop)")
-                try:
-                    while True: time.sleep(60)
-                except KeyboardInterrupt: pass
+                run_live_mode(target)
         
         elif choice == "3":
             print(f"1: {get_strategy_name(1)} | 2: {get_strategy_name(2)} | 3: {get_strategy_name(3)}")
@@ -219,7 +481,49 @@ def main_menu():
                 print(f"Switched to {STRAT_NAME}")
         
         elif choice == "4":
+            target, name = get_asset_selection()
+            if target: run_sweep_mode(target, name)
+        
+        elif choice == "5":
+            target, name = get_asset_selection()
+            if target: run_monte_carlo_mode(target, name)
+        
+        elif choice == "6":
             exit()
 
+# --- HEADLESS CLI ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Algorithmic Trading Engine. Without a command the interactive menu starts.")
+    commands = parser.add_subparsers(dest="command")
+
+    backtest = commands.add_parser("backtest", help="batch backtest without prompts")
+    backtest.add_argument("--universe", default="full", help='"stocks", "crypto", "full" or symbols (AAPL,BTC/USD)')
+    backtest.add_argument("--periods", default=str(BACKTEST_DAYS), help='days back, e.g. "365,730-365"')
+    backtest.add_argument("--capital", type=float, default=float(INITIAL_CAPITAL))
+    backtest.add_argument("--dca", type=float, default=RECURRING_INVESTMENT["amount"], help="amount per deposit")
+    backtest.add_argument("--dca-interval", type=int, default=RECURRING_INVESTMENT["interval_days"], help="days between deposits")
+    backtest.add_argument("--strategy", default=DEFAULT_STRATEGY_ID, choices=list(STRATEGY_MAP))
+    backtest.add_argument("--offline", action="store_true", help="cached bars only, no API credentials")
+    return parser.parse_args(argv)
+
+def run_headless(args):
+    """Exit code: 0 once at least one run was stored."""
+    global OFFLINE
+    OFFLINE = args.offline
+    setup(args.strategy)
+    if not CURRENT_STRATEGY:
+        print("Error: No strategy loaded.")
+        return 1
+
+    target, name = resolve_universe(args.universe)
+    if not target:
+        print("Error: Empty universe.")
+        return 1
+    return 0 if run_backtest(target, name, args.capital, args.periods, args.dca, args.dca_interval) else 1
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.command:
+        sys.exit(run_headless(args))
     main_menu()
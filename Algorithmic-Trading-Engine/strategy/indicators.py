@@ -2,6 +2,9 @@
 import pandas as pd
 import numpy as np
 
+from strategy.registry import prepare_indicators, compute_indicators
+from strategy.loader import get_indicator_specs
+
 # --- Core Indicators (Only what is needed for Demo) ---
 
 def DONCHIAN(df, period=20):
@@ -13,24 +16,80 @@ def DONCHIAN(df, period=20):
     d_low = df['low'].rolling(window=period).min().shift(1)
     return d_high, d_low
 
-def prepare_data(df):
-    """Unified Data Pipeline - Demo Version"""
-    # Ensure column names are lower case for consistency
-    df = df.rename(columns=str.lower)
-    df = df.copy().sort_values("timestamp")
-    
-    # 1. Essential Trend Indicators
-    df['donchian_high'], _ = DONCHIAN(df, period=20)
-    _, df['donchian_low'] = DONCHIAN(df, period=10)
-    
-    # 2. Basic Moving Averages
-    df["sma_50"] = df['close'].rolling(window=50).mean()
+# Default indicator windows (swept by backtest/sweep.py)
+ENTRY_PERIOD = 20
+EXIT_PERIOD = 10
+SMA_PERIOD = 50
 
+def default_indicators(entry_period=ENTRY_PERIOD, exit_period=EXIT_PERIOD, sma_period=SMA_PERIOD):
+    """The fixed set prepare_data has always produced, as registry specs."""
+    return {
+        "donchian_high": ("donchian_high", {"period": entry_period}),
+        "donchian_low": ("donchian_low", {"period": exit_period}),
+        f"sma_{sma_period}": ("sma", {"period": sma_period}),
+    }
+
+def prepare_data(df, entry_period=ENTRY_PERIOD, exit_period=EXIT_PERIOD, sma_period=SMA_PERIOD, symbol=None):
+    """Unified Data Pipeline - Demo Version"""
     # Note: Advanced oscillators have been removed for this public release.
-    
-    df = df.dropna()
-    
-    if 'timestamp' in df.columns:
-        df.set_index('timestamp', inplace=True)
-        
-    return df
\ No newline at end of file
+    return prepare_indicators(df, default_indicators(entry_period, exit_period, sma_period), symbol)
+
+def prepare_for_strategy(df, strategy_module, symbol=None):
+    """Only the indicators the strategy declares (INDICATORS), else the default set."""
+    specs = get_indicator_specs(strategy_module) or default_indicators()
+    return prepare_indicators(df, specs, symbol)
+
+# --- PANEL MODE ---
+# All symbols in one pass: each field becomes one (bar number x symbol)
+# matrix, every symbol's bars stacked from row 0 and NaN-padded at the end.
+# Rolling windows then run over each symbol's own bars, exactly like the
+# per-symbol pipeline (own warm-up, missing dates simply absent), but with
+# one vectorized pandas call per indicator instead of one per symbol.
+
+def _sorted_bars(df):
+    if any(col != col.lower() for col in df.columns):
+        df = df.rename(columns=str.lower)
+    if not df['timestamp'].is_monotonic_increasing:
+        df = df.sort_values("timestamp")
+    return df
+
+def _stack(frames, field, n_rows):
+    out = np.full((len(frames), n_rows), np.nan)
+    for j, df in enumerate(frames):
+        out[j, :len(df)] = df[field].to_numpy(dtype=float)
+    return pd.DataFrame(out.T) # columns = symbols, shares out's memory
+
+def prepare_panel(raw_map, specs=None):
+    """
+    {symbol: raw bars} -> {symbol: prepared frame}, equal to calling
+    prepare_indicators(df, specs) per symbol. specs default to prepare_data's.
+    """
+    specs = specs or default_indicators()
+    symbols = [s for s, df in raw_map.items() if not df.empty]
+    frames = [_sorted_bars(raw_map[s]) for s in symbols]
+    if not frames:
+        return {}
+    n_rows = max(len(df) for df in frames)
+
+    sources = {"open", "high", "low", "close", "volume"} & set(frames[0].columns)
+    fields = {field: _stack(frames, field, n_rows) for field in sources}
+    panels = compute_indicators(fields, specs)
+    values = {column: panel.to_numpy() for column, panel in panels.items()}
+    missing = np.zeros((n_rows, len(frames)), dtype=bool)
+    for arr in values.values():
+        missing |= np.isnan(arr)
+
+    prepared = {}
+    for j, (symbol, df) in enumerate(zip(symbols, frames)):
+        n = len(df)
+        # dropna over the bar columns too, like prepare_data
+        keep = ~(missing[:n, j] | df.isna().to_numpy().any(axis=1))
+        result = df[keep].set_index('timestamp')
+        for column, arr in values.items():
+            result[column] = arr[:n, j][keep]
+        if not result.empty:
+            prepared[symbol] = result
+    return prepared
+
+def prepare_panel_for_strategy(raw_map, strategy_module):
+    return prepare_panel(raw_map, get_indicator_specs(strategy_module) or default_indicators())
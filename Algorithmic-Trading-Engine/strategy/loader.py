@@ -11,17 +11,38 @@ STRATEGY_MAP = {
     "strategy3": "strategy.strategy3"
 }
 
+# Optional vectorized entry point. A strategy that defines it must give the
+# same answers as get_decision for a flat (entry) and an open (exit) position.
+BATCH_ENTRY_POINT = "get_batch_signals"
+
 def load_strategy(selection):
     sel = str(selection).strip().lower()
     module_name = STRATEGY_MAP.get(sel)
-    
+    if module_name is None:
+        print(f"Unknown strategy {selection!r} (one of {', '.join(STRATEGY_MAP)})")
+        return None
+
     try:
-        mod = importlib.import_module(module_name)
-        return mod
+        return importlib.import_module(module_name)
     except ImportError as e:
         print(f"Failed to load strategy {module_name}: {e}")
         return None
 
+def get_batch_signals(mod):
+    """Returns the strategy's batch signal function, or None (row-wise only)."""
+    fn = getattr(mod, BATCH_ENTRY_POINT, None)
+    return fn if callable(fn) else None
+
+def get_required_columns(mod):
+    """Columns the strategy reads (REQUIRED_COLUMNS), or None if it does not say."""
+    cols = getattr(mod, "REQUIRED_COLUMNS", None)
+    return tuple(cols) if cols else None
+
+def get_indicator_specs(mod):
+    """Declared indicators ({column: (kind, params)}, see strategy/registry.py), or None."""
+    specs = getattr(mod, "INDICATORS", None)
+    return dict(specs) if specs else None
+
 def get_strategy_name(selection):
     sel = str(selection).strip().lower()
     if "strategy1" in sel or sel == "1": return "STRATEGY1"
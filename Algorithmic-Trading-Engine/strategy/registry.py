@@ -0,0 +1,150 @@
+# strategy/registry.py
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# --- INDICATOR REGISTRY ---
+# Strategies declare what they read as {column: (kind, params)}, e.g.
+#   INDICATORS = {"donchian_high": ("donchian_high", {"period": 20})}
+# Only those columns are computed. A kind can depend on other kinds (the
+# Donchian channel is a shifted rolling max), dependencies are resolved
+# depth-first and computed once per frame. Results are memoized per
+# (symbol, data fingerprint, kind, params), so repeated batches and strategy
+# switches over the same bars reuse earlier work.
+
+KINDS = {} # kind -> (fn, depends, lookback)
+MAX_CACHED = 1024 # memoized columns kept (LRU)
+
+_cache = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+
+def register(kind, depends=None, lookback=None):
+    """
+    fn(df, deps, **params) -> Series aligned with df.
+    depends(**params) -> {name: (kind, params)} handed to fn as deps[name].
+    lookback(**params) -> earlier rows fn itself reads on top of its deps
+    (rolling(n): n - 1, shift(1): 1); default 0.
+    """
+    def wrap(fn):
+        KINDS[kind] = (fn, depends or (lambda **params: {}), lookback or (lambda **params: 0))
+        return fn
+    return wrap
+
+# --- BUILT-IN KINDS ---
+
+@register("rolling_max", lookback=lambda source, period: period - 1)
+def _rolling_max(df, deps, source, period):
+    return df[source].rolling(window=period).max()
+
+@register("rolling_min", lookback=lambda source, period: period - 1)
+def _rolling_min(df, deps, source, period):
+    return df[source].rolling(window=period).min()
+
+@register("sma", lookback=lambda period, source="close": period - 1)
+def _sma(df, deps, period, source="close"):
+    return df[source].rolling(window=period).mean()
+
+# Shifted to prevent lookahead bias: today's row sees the channel up to yesterday
+@register("donchian_high", depends=lambda period: {"high": ("rolling_max", {"source": "high", "period": period})},
+          lookback=lambda period: 1)
+def _donchian_high(df, deps, period):
+    return deps["high"].shift(1)
+
+@register("donchian_low", depends=lambda period: {"low": ("rolling_min", {"source": "low", "period": period})},
+          lookback=lambda period: 1)
+def _donchian_low(df, deps, period):
+    return deps["low"].shift(1)
+
+@register("donchian_mid", depends=lambda entry, exit: {
+    "high": ("donchian_high", {"period": entry}),
+    "low": ("donchian_low", {"period": exit}),
+})
+def _donchian_mid(df, deps, entry, exit):
+    return (deps["high"] + deps["low"]) / 2
+
+# --- COMPUTATION ---
+
+def spec_key(spec):
+    kind, params = spec
+    return kind, tuple(sorted(params.items()))
+
+def fingerprint(df):
+    """Content hash of a sorted bar frame (timestamps + price/volume columns)."""
+    h = hashlib.blake2b(digest_size=16)
+    if 'timestamp' in df.columns:
+        h.update(pd.DatetimeIndex(df['timestamp']).as_unit("ns").asi8.tobytes())
+    for col in ("open", "high", "low", "close", "volume"):
+        if col in df.columns:
+            h.update(np.ascontiguousarray(df[col].to_numpy(dtype=float)).tobytes())
+    return h.hexdigest()
+
+def _resolve(df, spec, memo, symbol, fp):
+    key = spec_key(spec)
+    if key in memo:
+        return memo[key]
+
+    cache_key = (symbol, fp, key) if symbol is not None else None
+    if cache_key in _cache:
+        _cache.move_to_end(cache_key)
+        _stats["hits"] += 1
+        memo[key] = pd.Series(_cache[cache_key], index=df.index)
+        return memo[key]
+
+    kind, params = spec
+    if kind not in KINDS:
+        raise KeyError(f"Unknown indicator kind: {kind}")
+    fn, depends, _ = KINDS[kind]
+    deps = {name: _resolve(df, dep, memo, symbol, fp) for name, dep in depends(**params).items()}
+    memo[key] = fn(df, deps, **params)
+
+    if cache_key is not None:
+        _stats["misses"] += 1
+        _cache[cache_key] = memo[key].to_numpy()
+        if len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+    return memo[key]
+
+def lookback(spec):
+    """Earlier rows one value of spec depends on (its warm-up is this many NaN rows)."""
+    kind, params = spec
+    if kind not in KINDS:
+        raise KeyError(f"Unknown indicator kind: {kind}")
+    _, depends, own = KINDS[kind]
+    return own(**params) + max((lookback(dep) for dep in depends(**params).values()), default=0)
+
+def warmup_bars(specs):
+    """Bars before the first row where every column in specs is defined."""
+    return max((lookback(spec) for spec in specs.values()), default=0)
+
+def compute_indicators(df, specs, symbol=None):
+    """
+    specs: {column: (kind, params)} -> {column: Series}. df must be sorted
+    by time. Passing a symbol enables the cross-call memo.
+    """
+    fp = fingerprint(df) if symbol is not None else None
+    memo = {}
+    return {column: _resolve(df, spec, memo, symbol, fp) for column, spec in specs.items()}
+
+def prepare_indicators(df, specs, symbol=None):
+    """prepare_data for an arbitrary indicator set: lower-case, sort, compute, dropna, index."""
+    df = df.rename(columns=str.lower)
+    df = df.copy().sort_values("timestamp")
+
+    for column, values in compute_indicators(df, specs, symbol).items():
+        df[column] = values
+
+    df = df.dropna()
+
+    if 'timestamp' in df.columns:
+        df.set_index('timestamp', inplace=True)
+
+    return df
+
+def cache_info():
+    return {"entries": len(_cache), **_stats}
+
+def clear_cache():
+    _cache.clear()
+    _stats.update(hits=0, misses=0)
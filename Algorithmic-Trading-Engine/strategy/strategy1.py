@@ -1,5 +1,14 @@
 # strategy/strategy1.py
 
+# Columns read below (lets the compact store drop the rest)
+REQUIRED_COLUMNS = ("close", "donchian_high", "donchian_low")
+
+# Indicators to compute for this strategy (strategy/registry.py)
+INDICATORS = {
+    "donchian_high": ("donchian_high", {"period": 20}),
+    "donchian_low": ("donchian_low", {"period": 10}),
+}
+
 def get_decision(row, state, symbol_name, equity):
     """
     SAMPLE STRATEGY
@@ -29,4 +38,20 @@ def get_decision(row, state, symbol_name, equity):
         if close < donchian_low:
             return "SELL_SIGNAL", 0.0, st, 0.0
 
-    return "HOLD", 0.0, st, 0.0
\ No newline at end of file
+    return "HOLD", 0.0, st, 0.0
+
+def get_batch_signals(cols):
+    """
+    BATCH VERSION (same rules as get_decision)
+    cols maps column name -> array (one symbol's column or a date x symbol panel).
+    Returns buy, sell, score arrays of the same shape.
+    """
+    close = cols['close']
+    donchian_high = cols['donchian_high']
+    donchian_low = cols['donchian_low']
+
+    buy = close > donchian_high
+    sell = close < donchian_low
+    score = buy * 1.0
+
+    return buy, sell, score
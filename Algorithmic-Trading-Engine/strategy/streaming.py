@@ -0,0 +1,242 @@
+# strategy/streaming.py
+import copy
+import math
+from collections import deque
+from datetime import datetime
+
+from strategy.indicators import default_indicators
+
+# --- STREAMING INDICATORS ---
+# Bar-by-bar versions of prepare_for_strategy for the live loop. Each update
+# costs O(1) amortized, and the values are bit-identical to the pandas
+# pipeline run over the same history.
+
+NAN = float("nan")
+
+class RollingExtreme:
+    """Rolling max (or min) over the last `window` values via a monotonic deque."""
+
+    def __init__(self, window, is_max=True):
+        self.window = window
+        self.is_max = is_max
+        self.count = 0
+        self.dq = deque() # (bar number, value), best value at the left
+
+    def update(self, value):
+        if self.is_max:
+            while self.dq and self.dq[-1][1] <= value:
+                self.dq.pop()
+        else:
+            while self.dq and self.dq[-1][1] >= value:
+                self.dq.pop()
+        self.dq.append((self.count, value))
+        self.count += 1
+        if self.dq[0][0] <= self.count - 1 - self.window:
+            self.dq.popleft()
+
+    def value(self):
+        if self.count < self.window:
+            return NAN
+        return self.dq[0][1]
+
+    def to_dict(self):
+        return {"window": self.window, "is_max": self.is_max, "count": self.count, "dq": [list(p) for p in self.dq]}
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls(d["window"], d["is_max"])
+        obj.count = d["count"]
+        obj.dq = deque(tuple(p) for p in d["dq"])
+        return obj
+
+class RollingMean:
+    """
+    Running-sum rolling mean. Mirrors pandas' roll_mean step for step
+    (Kahan-compensated add/remove, same-value and sign guards) so the result
+    equals Series.rolling(window).mean() exactly.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.neg_ct = 0
+        self.num_same = 0
+        self.prev_value = NAN
+
+    def _add(self, val):
+        if val != val:
+            return
+        self.nobs += 1
+        y = val - self.comp_add
+        t = self.sum_x + y
+        self.comp_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct += 1
+        if val == self.prev_value:
+            self.num_same += 1
+        else:
+            self.num_same = 1
+        self.prev_value = val
+
+    def _remove(self, val):
+        if val != val:
+            return
+        self.nobs -= 1
+        y = -val - self.comp_remove
+        t = self.sum_x + y
+        self.comp_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct -= 1
+
+    def update(self, val):
+        # pandas removes the value leaving the window before adding the new one
+        if len(self.values) == self.window:
+            self._remove(self.values.popleft())
+        self.values.append(val)
+        self._add(val)
+
+    def value(self):
+        if self.nobs < self.window or self.nobs == 0:
+            return NAN
+        result = self.sum_x / self.nobs
+        if self.num_same >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+    def to_dict(self):
+        d = dict(self.__dict__)
+        d["values"] = list(self.values)
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls(d["window"])
+        obj.__dict__.update(d)
+        obj.values = deque(d["values"])
+        return obj
+
+# --- STREAMING KINDS ---
+# The registry kinds (strategy/registry.py) the live loop can follow bar by
+# bar. Every column is built from rolling windows keyed like
+# (kind, source, period), so a window shared by several columns is kept once.
+
+def _windows(kind, params):
+    """Rolling windows a column of this kind reads: [(kind, source, period)]."""
+    if kind in ("rolling_max", "rolling_min"):
+        return [(kind, params["source"], params["period"])]
+    if kind == "sma":
+        return [("sma", params.get("source", "close"), params["period"])]
+    if kind == "donchian_high":
+        return [("rolling_max", "high", params["period"])]
+    if kind == "donchian_low":
+        return [("rolling_min", "low", params["period"])]
+    if kind == "donchian_mid":
+        return _windows("donchian_high", {"period": params["entry"]}) + _windows("donchian_low", {"period": params["exit"]})
+    raise KeyError(f"No streaming version of indicator kind: {kind}")
+
+def _new_window(key):
+    kind, _, period = key
+    if kind == "sma":
+        return RollingMean(period)
+    return RollingExtreme(period, is_max=(kind == "rolling_max"))
+
+def _column_value(kind, params, before, after):
+    """before/after: window values up to the previous bar and this one."""
+    if kind in ("rolling_max", "rolling_min", "sma"):
+        return after[_windows(kind, params)[0]]
+    if kind in ("donchian_high", "donchian_low"):
+        # Donchian is shifted: today's row sees the channel up to YESTERDAY
+        return before[_windows(kind, params)[0]]
+    high, low = _windows(kind, params)
+    return (before[high] + before[low]) / 2
+
+class StreamingIndicators:
+    """
+    Incremental prepare_for_strategy for one symbol.
+    specs are the strategy's indicators ({column: (kind, params)}, see
+    get_indicator_specs); without them the default prepare_data set is used.
+    update(bar) consumes a closed bar and returns the prepared row (a dict
+    with the bar fields plus indicators), or None while still warming up,
+    exactly where the backtest's dropna would drop the row.
+    """
+
+    def __init__(self, specs=None):
+        specs = specs or default_indicators()
+        self.specs = {column: (kind, dict(params)) for column, (kind, params) in specs.items()}
+        self.windows = {}
+        for kind, params in self.specs.values():
+            for key in _windows(kind, params):
+                if key not in self.windows:
+                    self.windows[key] = _new_window(key)
+        self.last_ts = None
+        self.last_row = None
+
+    def matches(self, specs):
+        """False when the strategy now declares other indicators (state must be rebuilt)."""
+        return StreamingIndicators(specs).specs == self.specs
+
+    def update(self, bar, timestamp=None):
+        before = {key: w.value() for key, w in self.windows.items()}
+        for (_, source, _), w in self.windows.items():
+            w.update(bar[source])
+        after = {key: w.value() for key, w in self.windows.items()}
+        if timestamp is not None:
+            self.last_ts = timestamp
+
+        row = {k.lower(): v for k, v in bar.items() if k.lower() != 'timestamp'}
+        for column, (kind, params) in self.specs.items():
+            row[column] = _column_value(kind, params, before, after)
+
+        if any(v != v for v in row.values() if isinstance(v, float)):
+            row = None
+        self.last_row = row
+        return row
+
+    def peek(self, bar):
+        """Row for a bar that is still forming, without committing it."""
+        return copy.deepcopy(self).update(bar)
+
+    def warm_start(self, df):
+        """Feeds a raw bar frame (load_bars format). Returns the last prepared row."""
+        df = df.rename(columns=str.lower).sort_values("timestamp")
+        row = None
+        for bar in df.to_dict("records"):
+            row = self.update(bar, bar['timestamp'])
+        return row
+
+    def to_dict(self):
+        return {
+            "specs": {column: [kind, params] for column, (kind, params) in self.specs.items()},
+            "windows": [[list(key), w.to_dict()] for key, w in self.windows.items()],
+            "last_ts": self.last_ts.isoformat() if self.last_ts is not None else None,
+            "last_row": self.last_row,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls.__new__(cls)
+        obj.specs = {column: (kind, params) for column, (kind, params) in d["specs"].items()}
+        obj.windows = {}
+        for key, state in d["windows"]:
+            obj.windows[tuple(key)] = (RollingMean if key[0] == "sma" else RollingExtreme).from_dict(state)
+        obj.last_ts = datetime.fromisoformat(d["last_ts"]) if d["last_ts"] else None
+        obj.last_row = d.get("last_row")
+        return obj
+
+def restore_stream(saved, specs=None):
+    """Saved stream state if it still follows the same indicators, else a cold stream."""
+    if saved and "specs" in saved:
+        stream = StreamingIndicators.from_dict(saved)
+        if stream.matches(specs):
+            return stream
+    return StreamingIndicators(specs)
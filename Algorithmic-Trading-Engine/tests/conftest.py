@@ -0,0 +1,25 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# config.py reads settings.json from the working directory, like main.py
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(APP_DIR)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Points the bar cache at an empty temp folder."""
+    import data.cache
+    monkeypatch.setattr(data.cache, "CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+@pytest.fixture(autouse=True)
+def no_rate_limit():
+    # Fake clients answer instantly; the shared limiter would only slow the suite
+    from data.ratelimit import API_LIMITER
+    with API_LIMITER.suspended():
+        yield
@@ -0,0 +1,69 @@
+# tests/fakes.py
+import threading
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+
+# --- FAKE ALPACA DATA CLIENT ---
+
+def daily_bars(start, n, seed=0, base=100.0):
+    """n daily OHLCV bars from start (UTC), in the load_bars format."""
+    rng = np.random.default_rng(seed)
+    close = base * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        "timestamp": pd.date_range(pd.Timestamp(start, tz="UTC"), periods=n, freq="1D"),
+        "open": close * (1 + rng.normal(0, 0.002, n)),
+        "high": close * 1.01,
+        "low": close * 0.99,
+        "close": close,
+        "volume": rng.integers(1_000, 10_000, n).astype(float),
+    })
+
+def market_hours_bars(start, days, seed=0, base=100.0):
+    """1Hour bars from 14:00 to 20:00 UTC on weekdays only (no nights or weekends)."""
+    hours = pd.date_range(pd.Timestamp(start, tz="UTC"), periods=days * 24, freq="1h")
+    hours = hours[(hours.dayofweek < 5) & (hours.hour >= 14) & (hours.hour <= 20)]
+    df = daily_bars(start, len(hours), seed, base)
+    df["timestamp"] = hours
+    return df
+
+class FakeBarsClient:
+    """
+    Serves get_stock_bars / get_crypto_bars from {symbol: bars} the way the
+    SDK does: .df indexed by (symbol, timestamp), start and end inclusive,
+    symbols without bars left out. Every request is recorded; fail(symbols,
+    start, end) returning True makes that request raise.
+    """
+
+    def __init__(self, bars, fail=None):
+        self.bars = bars
+        self.fail = fail
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def get_stock_bars(self, request):
+        return self._serve(request)
+
+    def get_crypto_bars(self, request):
+        return self._serve(request)
+
+    def _serve(self, request):
+        symbols = list(request.symbol_or_symbols)
+        start = pd.Timestamp(request.start, tz="UTC")
+        end = pd.Timestamp(request.end, tz="UTC")
+        with self.lock:
+            self.requests.append((symbols, start, end))
+        if self.fail is not None and self.fail(symbols, start, end):
+            raise RuntimeError("simulated API error")
+
+        frames = []
+        for symbol in symbols:
+            df = self.bars.get(symbol)
+            if df is None:
+                continue
+            df = df[(df["timestamp"] >= start) & (df["timestamp"] <= end)]
+            if not df.empty:
+                frames.append(df.assign(symbol=symbol))
+        if not frames:
+            return SimpleNamespace(df=pd.DataFrame())
+        return SimpleNamespace(df=pd.concat(frames).set_index(["symbol", "timestamp"]))
@@ -0,0 +1,109 @@
+# tests/test_aggregator.py
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.aggregator import BarAggregator, aggregate_trades, load_recorded_trades, read_trades, trade_file
+from data.feed import timeframe_delta
+
+# Recorded trades (arrival order, with "received"): late and out-of-order
+# trades, the 21:00 UTC stock close -> next open and the crypto UTC midnight
+TRADES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "trades")
+SYMBOLS = ["AAPL", "BTC/USD"]
+TIMEFRAMES = {"1Min": "1min", "5Min": "5min", "1Hour": "1h", "1Day": "1D"}
+LATENESS = 2.0
+
+def kept(trades, timeframe):
+    """Trades that arrive before their bar's end + lateness has passed on the trade clock."""
+    length = pd.Timedelta(timeframe_delta(timeframe))
+    clock = trades["timestamp"].cummax().shift(1)
+    bar_end = trades["timestamp"].dt.floor(length) + length
+    return trades[clock.isna() | (bar_end + pd.Timedelta(seconds=LATENESS) > clock)]
+
+def resampled(trades, rule):
+    df = trades.sort_values("timestamp", kind="stable").set_index("timestamp")
+    bars = df.resample(rule)
+    out = pd.DataFrame({
+        "open": bars["price"].first(),
+        "high": bars["price"].max(),
+        "low": bars["price"].min(),
+        "close": bars["price"].last(),
+        "volume": bars["size"].sum(),
+        "trade_count": bars["price"].count(),
+    })
+    out["vwap"] = (df["price"] * df["size"]).resample(rule).sum() / out["volume"]
+    return out[out["trade_count"] > 0]
+
+@pytest.fixture(scope="module")
+def aggregated():
+    trades = load_recorded_trades(TRADES_DIR, SYMBOLS)
+    return aggregate_trades(trades, list(TIMEFRAMES), LATENESS)
+
+def test_fixture_has_late_trades_and_session_boundaries():
+    for symbol in SYMBOLS:
+        trades = read_trades(trade_file(TRADES_DIR, symbol))
+        assert (trades["timestamp"].diff() < pd.Timedelta(0)).any()
+        assert trades["timestamp"].dt.date.nunique() == 2
+
+@pytest.mark.parametrize("timeframe", list(TIMEFRAMES))
+@pytest.mark.parametrize("symbol", SYMBOLS)
+def test_bars_match_pandas_resample(aggregated, symbol, timeframe):
+    bars, _ = aggregated
+    trades = read_trades(trade_file(TRADES_DIR, symbol))
+    expected = resampled(kept(trades, timeframe), TIMEFRAMES[timeframe])
+
+    got = bars[timeframe][symbol].set_index("timestamp")[expected.columns]
+    assert got.index.equals(expected.index)
+    np.testing.assert_allclose(got.to_numpy(float), expected.to_numpy(float), rtol=1e-12)
+
+def test_trades_past_lateness_are_dropped_and_counted(aggregated):
+    bars, agg = aggregated
+    # AAPL 20:58:45 and 14:31:10 miss their 1Min bar; BTC 23:59:40 misses every bar
+    assert agg.late == 3
+    assert agg.trades == sum(len(read_trades(trade_file(TRADES_DIR, s))) for s in SYMBOLS)
+    assert agg.open_bars() == 0
+    assert 190.0 not in bars["1Min"]["AAPL"]["high"].tolist()
+    assert 190.0 in bars["5Min"]["AAPL"]["high"].tolist()
+
+@pytest.mark.parametrize("timeframe", ["5Min", "1Hour"])
+@pytest.mark.parametrize("symbol", SYMBOLS)
+def test_minute_bars_roll_up_like_pandas_resample(aggregated, symbol, timeframe):
+    bars, _ = aggregated
+    minute = bars["1Min"][symbol].sort_values("timestamp")
+    agg = BarAggregator([timeframe], lateness=0)
+    rolled = []
+    for bar in minute.to_dict("records"):
+        rolled += agg.add_bar(symbol, bar, pd.Timedelta("1min").value)
+    rolled += agg.flush()
+
+    df = minute.set_index("timestamp")
+    groups = df.resample(TIMEFRAMES[timeframe])
+    expected = pd.DataFrame({
+        "open": groups["open"].first(),
+        "high": groups["high"].max(),
+        "low": groups["low"].min(),
+        "close": groups["close"].last(),
+        "volume": groups["volume"].sum(),
+        "trade_count": groups["trade_count"].sum(),
+    })
+    expected["vwap"] = (df["vwap"] * df["volume"]).resample(TIMEFRAMES[timeframe]).sum() / expected["volume"]
+    expected = expected[expected["trade_count"] > 0]
+
+    got = pd.DataFrame([bar for _, _, bar in rolled]).set_index("timestamp")[expected.columns]
+    assert got.index.equals(expected.index)
+    np.testing.assert_allclose(got.to_numpy(float), expected.to_numpy(float), rtol=1e-12)
+
+def test_rolled_bar_closes_with_its_last_minute():
+    agg = BarAggregator(["5Min"], lateness=0)
+    start = pd.Timestamp("2024-01-02 15:00", tz="UTC")
+    closed = []
+    for i in range(5):
+        bar = {"timestamp": start + pd.Timedelta(minutes=i), "open": 1.0 + i, "high": 2.0 + i, "low": 0.5,
+               "close": 1.5 + i, "volume": 10.0, "trade_count": 2, "vwap": 1.2 + i}
+        closed = agg.add_bar("AAA", bar, pd.Timedelta("1min").value)
+        assert len(closed) == (1 if i == 4 else 0)
+    bar = closed[0][2]
+    assert bar["timestamp"] == start
+    assert (bar["open"], bar["high"], bar["low"], bar["close"]) == (1.0, 6.0, 0.5, 5.5)
+    assert (bar["volume"], bar["trade_count"]) == (50.0, 10)
@@ -0,0 +1,37 @@
+# tests/test_allocation.py
+import numpy as np
+import pytest
+
+from backtest.allocation import position_sizes
+
+SLOT = 1000.0 / 4
+
+def sizes(scores, vol=None, sizing="equal", cash=1000.0):
+    return position_sizes(1000.0, cash, 4, np.array(scores, dtype=float),
+                          None if vol is None else np.array(vol, dtype=float), sizing,
+                          target_vol=0.02, score_scale=1.0)
+
+def test_lone_entry_is_sized_by_its_own_score_and_volatility():
+    equal = sizes([0.5], [0.04])
+    score = sizes([0.5], [0.04], "score")
+    volatility = sizes([0.5], [0.04], "volatility")
+    assert equal.tolist() == [SLOT]
+    assert score.tolist() == [SLOT * 0.5]
+    assert volatility.tolist() == [SLOT * 0.5]
+
+def test_picks_are_sized_independently_of_each_other():
+    alone = sizes([0.25], [0.08], "volatility")
+    together = sizes([0.25, 1.0], [0.08, 0.01], "volatility")
+    assert together[0] == alone[0] == SLOT * 0.25
+    # Calm symbols are capped at one slot
+    assert together[1] == SLOT
+    assert sizes([0.25, 3.0], sizing="score").tolist() == [SLOT * 0.25, SLOT]
+
+@pytest.mark.parametrize("sizing", ["score", "volatility"])
+def test_unknown_values_get_a_full_slot(sizing):
+    assert sizes([np.nan], [np.nan], sizing).tolist() == [SLOT]
+
+def test_never_more_than_cash():
+    got = sizes([1.0, 1.0], cash=300.0)
+    assert got.sum() == pytest.approx(300.0)
+    assert got[0] == got[1]
@@ -0,0 +1,205 @@
+# tests/test_cache.py
+import pandas as pd
+
+from data.cache import load_bars_cached, read_cache
+from data.backfill import backfill_bars
+from fakes import FakeBarsClient, daily_bars, market_hours_bars
+
+TF = "1Day"
+JAN_1 = pd.Timestamp("2024-01-01", tz="UTC")
+FEB_1 = pd.Timestamp("2024-02-01", tz="UTC")
+MAR_1 = pd.Timestamp("2024-03-01", tz="UTC")
+
+def universe():
+    return {sym: daily_bars("2023-12-01", 120, seed=i) for i, sym in enumerate(("AAA", "BBB", "CCC"))}
+
+# --- load_bars_cached ---
+
+def test_second_load_fetches_only_the_tail_gap(cache_dir):
+    client = FakeBarsClient(universe())
+    first = load_bars_cached(client, client, "AAA", TF, JAN_1, FEB_1)
+    assert len(client.requests) == 1
+    assert first["timestamp"].iloc[0] == JAN_1 and first["timestamp"].iloc[-1] == FEB_1
+
+    client.requests.clear()
+    second = load_bars_cached(client, client, "AAA", TF, JAN_1, MAR_1)
+    assert len(client.requests) == 1
+    _, start, end = client.requests[0]
+    # Only the new range, stepping back one bar to refresh the last one
+    assert start == FEB_1 - pd.Timedelta(days=1) and end == MAR_1
+    assert second["timestamp"].is_unique
+    assert len(second) == (MAR_1 - JAN_1).days + 1
+
+    client.requests.clear()
+    load_bars_cached(client, client, "AAA", TF, JAN_1, MAR_1)
+    assert client.requests == []
+
+def test_overlapping_bars_are_deduplicated_and_newest_wins(cache_dir):
+    bars = universe()
+    client = FakeBarsClient(bars)
+    load_bars_cached(client, client, "AAA", TF, JAN_1, FEB_1)
+
+    # The last cached bar was partial: the server now has a different close
+    refreshed = bars["AAA"].copy()
+    refreshed.loc[refreshed["timestamp"] == FEB_1, "close"] = -1.0
+    client.bars = {"AAA": refreshed}
+    df = load_bars_cached(client, client, "AAA", TF, JAN_1, MAR_1)
+
+    assert df["timestamp"].is_unique
+    assert df["timestamp"].is_monotonic_increasing
+    assert df.loc[df["timestamp"] == FEB_1, "close"].tolist() == [-1.0]
+    cached, _ = read_cache("AAA", TF)
+    assert len(cached) == len(df)
+
+def test_offline_returns_cached_bars(cache_dir, capsys):
+    client = FakeBarsClient(universe())
+    online = load_bars_cached(client, client, "AAA", TF, JAN_1, FEB_1)
+
+    offline = load_bars_cached(None, None, "AAA", TF, JAN_1, MAR_1)
+    pd.testing.assert_frame_equal(offline, online)
+    assert "[Offline: using cached AAA]" in capsys.readouterr().out
+
+    empty = load_bars_cached(None, None, "BBB", TF, JAN_1, MAR_1)
+    assert empty.empty
+    assert "[Offline: no cached bars for BBB]" in capsys.readouterr().out
+
+def test_failed_range_is_not_marked_covered(cache_dir):
+    client = FakeBarsClient(universe())
+    load_bars_cached(client, client, "AAA", TF, FEB_1, MAR_1)
+
+    # Head gap (before Feb) fails, tail gap succeeds
+    client.fail = lambda symbols, start, end: start < FEB_1
+    mid_mar = pd.Timestamp("2024-03-15", tz="UTC")
+    df = load_bars_cached(client, client, "AAA", TF, JAN_1, mid_mar)
+    assert df["timestamp"].iloc[0] == FEB_1 and df["timestamp"].iloc[-1] == mid_mar
+    _, coverage = read_cache("AAA", TF)
+    assert coverage == (FEB_1, mid_mar)
+
+    # The next online run asks for the failed range again
+    client.fail = None
+    client.requests.clear()
+    df = load_bars_cached(client, client, "AAA", TF, JAN_1, mid_mar)
+    assert [(start, end) for _, start, end in client.requests] == [(JAN_1, FEB_1)]
+    assert df["timestamp"].iloc[0] == JAN_1
+    assert read_cache("AAA", TF)[1] == (JAN_1, mid_mar)
+
+# --- backfill_bars ---
+
+def test_backfill_batches_and_fetches_only_gaps(cache_dir):
+    client = FakeBarsClient(universe())
+    first = backfill_bars(client, client, ["AAA", "BBB", "CCC"], TF, JAN_1, FEB_1)
+    assert len(client.requests) == 1
+    assert sorted(client.requests[0][0]) == ["AAA", "BBB", "CCC"]
+    assert all(len(df) == 32 for df in first.values())
+
+    client.requests.clear()
+    second = backfill_bars(client, client, ["AAA", "BBB", "CCC"], TF, JAN_1, MAR_1)
+    assert len(client.requests) == 1
+    _, start, end = client.requests[0]
+    assert start == FEB_1 - pd.Timedelta(days=1) and end == MAR_1
+    for symbol, df in second.items():
+        assert df["timestamp"].is_unique
+        pd.testing.assert_frame_equal(df, load_bars_cached(None, None, symbol, TF, JAN_1, MAR_1))
+
+def test_backfill_matches_single_symbol_loads(cache_dir):
+    client = FakeBarsClient(universe())
+    batched = backfill_bars(client, client, ["AAA", "BBB"], TF, JAN_1, MAR_1, use_cache=False)
+    for symbol, df in batched.items():
+        pd.testing.assert_frame_equal(df, load_bars_cached(client, client, symbol, TF, JAN_1, MAR_1))
+
+def test_backfill_offline_uses_cache(cache_dir, capsys):
+    client = FakeBarsClient(universe())
+    online = backfill_bars(client, client, ["AAA", "BBB"], TF, JAN_1, FEB_1)
+    capsys.readouterr()
+
+    offline = backfill_bars(None, None, ["AAA", "BBB", "CCC"], TF, JAN_1, MAR_1)
+    pd.testing.assert_frame_equal(offline["AAA"], online["AAA"])
+    assert offline["CCC"].empty
+    out = capsys.readouterr().out
+    assert "[Offline: using cached AAA]" in out
+    assert "[Offline: no cached bars for CCC]" in out
+
+def test_backfill_failed_batch_is_not_marked_covered(cache_dir):
+    client = FakeBarsClient(universe(), fail=lambda symbols, start, end: "BBB" in symbols)
+    results = backfill_bars(client, client, ["AAA", "BBB"], TF, JAN_1, FEB_1, batch_size=1)
+    assert len(results["AAA"]) == 32
+    assert results["BBB"].empty
+    assert read_cache("AAA", TF)[1] == (JAN_1, FEB_1)
+    assert read_cache("BBB", TF)[1] is None
+
+    client.fail = None
+    client.requests.clear()
+    results = backfill_bars(client, client, ["AAA", "BBB"], TF, JAN_1, FEB_1, batch_size=1)
+    assert [symbols for symbols, _, _ in client.requests] == [["BBB"]]
+    assert len(results["BBB"]) == 32
+
+class DroppingClient(FakeBarsClient):
+    """Leaves `dropped` out of every multi-symbol response."""
+
+    def __init__(self, bars, dropped):
+        super().__init__(bars)
+        self.dropped = dropped
+
+    def _serve(self, request):
+        response = super()._serve(request)
+        if len(request.symbol_or_symbols) > 1 and not response.df.empty:
+            response.df = response.df.drop(index=self.dropped, level="symbol", errors="ignore")
+        return response
+
+def test_backfill_confirms_symbols_missing_from_a_batch(cache_dir):
+    client = DroppingClient(universe(), dropped="BBB")
+    results = backfill_bars(client, client, ["AAA", "BBB", "CCC"], TF, JAN_1, FEB_1)
+    # The batch came back without BBB: it is asked for once on its own
+    assert [sorted(symbols) for symbols, _, _ in client.requests] == [["AAA", "BBB", "CCC"], ["BBB"]]
+    assert len(results["BBB"]) == 32
+    assert read_cache("BBB", TF)[1] == (JAN_1, FEB_1)
+
+def test_backfill_does_not_cover_an_unconfirmed_symbol(cache_dir):
+    client = DroppingClient(universe(), dropped="BBB")
+    client.fail = lambda symbols, start, end: symbols == ["BBB"]
+    results = backfill_bars(client, client, ["AAA", "BBB"], TF, JAN_1, FEB_1)
+    assert results["BBB"].empty
+    assert read_cache("BBB", TF)[1] is None
+    assert read_cache("AAA", TF)[1] == (JAN_1, FEB_1)
+
+def test_backfill_covers_a_symbol_confirmed_empty(cache_dir):
+    bars = universe()
+    bars["BBB"] = bars["BBB"].iloc[:0]
+    client = FakeBarsClient(bars)
+    results = backfill_bars(client, client, ["AAA", "BBB"], TF, JAN_1, FEB_1)
+    assert results["BBB"].empty
+    assert read_cache("BBB", TF)[1] == (JAN_1, FEB_1)
+
+    client.requests.clear()
+    backfill_bars(client, client, ["AAA", "BBB"], TF, JAN_1, FEB_1)
+    assert client.requests == []
+
+def test_backfill_does_not_retry_chunks_empty_for_the_whole_batch(cache_dir, monkeypatch):
+    import data.backfill
+    # 8 bars per chunk for a batch of 3: most chunks fall on nights or weekends
+    monkeypatch.setattr(data.backfill, "PAGE_LIMIT", 24)
+    bars = {sym: market_hours_bars("2024-01-01", 28, seed=i) for i, sym in enumerate(("AAA", "BBB", "CCC"))}
+    client = FakeBarsClient(bars)
+    end = pd.Timestamp("2024-01-29", tz="UTC")
+    results = backfill_bars(client, client, ["AAA", "BBB", "CCC"], "1Hour", JAN_1, end)
+
+    chunks = data.backfill.plan_chunks(JAN_1, end, "1Hour", 3)
+    assert len(client.requests) == len(chunks)
+    for symbol, df in results.items():
+        assert len(df) == len(bars[symbol])
+        assert read_cache(symbol, "1Hour")[1] == (JAN_1, end)
+
+def test_backfill_merges_retries_per_symbol(cache_dir, monkeypatch):
+    import data.backfill
+    monkeypatch.setattr(data.backfill, "PAGE_LIMIT", 24)
+    bars = {sym: market_hours_bars("2024-01-01", 28, seed=i) for i, sym in enumerate(("AAA", "BBB", "CCC"))}
+    client = DroppingClient(bars, dropped="BBB")
+    end = pd.Timestamp("2024-01-29", tz="UTC")
+    results = backfill_bars(client, client, ["AAA", "BBB", "CCC"], "1Hour", JAN_1, end)
+
+    # BBB is missing from every chunk with bars, and is asked for once
+    retries = [r for r in client.requests if r[0] == ["BBB"]]
+    assert len(retries) == 1
+    assert len(client.requests) == len(data.backfill.plan_chunks(JAN_1, end, "1Hour", 3)) + 1
+    assert len(results["BBB"]) == len(bars["BBB"])
+    assert read_cache("BBB", "1Hour")[1] == (JAN_1, end)
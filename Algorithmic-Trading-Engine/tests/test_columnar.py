@@ -0,0 +1,55 @@
+# tests/test_columnar.py
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+import data.columnar
+import strategy.strategy1 as strategy1
+from data.columnar import write_columns, prepare_columns
+from strategy.indicators import prepare_data, prepare_for_strategy
+from strategy.loader import get_indicator_specs
+from fakes import daily_bars
+
+@pytest.fixture
+def columns_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(data.columnar, "COLUMNAR_DIR", str(tmp_path / "columns"))
+    return tmp_path / "columns"
+
+def assert_same_rows(frame, expected):
+    assert list(frame.index) == list(expected.index)
+    for column in expected.columns:
+        np.testing.assert_allclose(np.asarray(frame[column], dtype=float), expected[column].to_numpy(float), rtol=1e-12)
+
+@pytest.mark.parametrize("chunk_rows", [64, 1_000_000])
+def test_strategy_specs_match_prepare_for_strategy(columns_dir, chunk_rows):
+    bars = daily_bars("2020-01-01", 500, seed=3)
+    write_columns("AAA", "1Day", bars)
+    frame = prepare_columns("AAA", "1Day", get_indicator_specs(strategy1), chunk_rows=chunk_rows)
+    expected = prepare_for_strategy(bars, strategy1)
+    # Donchian 20 warm-up only: no sma_50 column and no 50-bar dropna
+    assert "sma_50" not in frame.columns
+    assert len(frame) == len(bars) - 20
+    assert_same_rows(frame, expected)
+
+def test_default_specs_match_prepare_data(columns_dir):
+    bars = daily_bars("2020-01-01", 300, seed=4)
+    write_columns("AAA", "1Day", bars)
+    assert_same_rows(prepare_columns("AAA", "1Day", chunk_rows=50), prepare_data(bars))
+
+def test_revised_bars_with_the_same_range_are_rewritten(columns_dir):
+    bars = daily_bars("2020-01-01", 300, seed=5)
+    folder = write_columns("AAA", "1Day", bars)
+    prepare_columns("AAA", "1Day", get_indicator_specs(strategy1))
+
+    # Same length and first/last timestamps, one corrected bar in the middle
+    revised = bars.copy()
+    revised.loc[150, "high"] = revised["high"].max() * 2
+    ts_path = os.path.join(folder, "_ts.npy")
+    written = os.path.getmtime(ts_path)
+    write_columns("AAA", "1Day", bars)
+    assert os.path.getmtime(ts_path) == written # unchanged bars are not rewritten
+    write_columns("AAA", "1Day", revised)
+
+    frame = prepare_columns("AAA", "1Day", get_indicator_specs(strategy1))
+    assert_same_rows(frame, prepare_for_strategy(revised, strategy1))
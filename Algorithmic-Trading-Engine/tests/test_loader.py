@@ -0,0 +1,20 @@
+# tests/test_loader.py
+import pytest
+
+import main
+from strategy.loader import STRATEGY_MAP, load_strategy
+
+def test_unknown_strategy_returns_none(capsys):
+    assert load_strategy("9") is None
+    assert load_strategy(None) is None
+    assert "Unknown strategy" in capsys.readouterr().out
+
+def test_known_ids_load():
+    for sel in ("1", " Strategy1 "):
+        assert load_strategy(sel).__name__ == STRATEGY_MAP["strategy1"]
+
+def test_cli_rejects_unknown_strategy(capsys):
+    with pytest.raises(SystemExit):
+        main.parse_args(["backtest", "--strategy", "9"])
+    assert "invalid choice" in capsys.readouterr().err
+    assert main.parse_args(["backtest", "--strategy", "strategy1"]).strategy == "strategy1"
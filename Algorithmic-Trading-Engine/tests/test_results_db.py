@@ -0,0 +1,39 @@
+# tests/test_results_db.py
+import sqlite3
+
+from backtest.ledger import Ledger, DEPOSIT, BUY, SELL, CASH
+from backtest.results_db import ResultsDB, SCHEMA, run_record
+
+def ledger_with_fees():
+    ledger = Ledger(["AAA"], 1000.0)
+    ledger.append(1_700_000_000 * 10**9, DEPOSIT, CASH, 0.0, 0.0, 1000.0)
+    ledger.append(1_700_086_400 * 10**9, BUY, 0, 10.0, 0.0, 899.5, qty=10.0, fee=0.5)
+    ledger.append(1_700_172_800 * 10**9, SELL, 0, 12.0, 19.4, 1018.9, qty=10.0, fee=0.6)
+    return ledger
+
+def test_trade_fees_are_stored_and_reloaded(tmp_path):
+    db = ResultsDB(str(tmp_path / "results.db"))
+    [run_id] = db.add_runs([run_record("b", "S", "U", (30, 0), ledger_with_fees(), 1018.9)])
+
+    assert db.trades(run_id)["fee"].tolist() == [0.0, 0.5, 0.6]
+    _, ledger = db.load_ledger(run_id)
+    assert ledger.column("fee").tolist() == [0.0, 0.5, 0.6]
+    db.close()
+
+def test_older_database_gets_the_fee_column(tmp_path):
+    path = str(tmp_path / "results.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA.replace(",\n    fee      REAL", ""))
+    conn.execute("INSERT INTO runs (id, batch_id, created, strategy, universe, period, params, invested, final_equity) "
+                 "VALUES (1, 'old', 0, 'S', 'U', '30-0', '{}', 1000, 1000)")
+    conn.execute("INSERT INTO trades (run_id, date_ns, action, symbol, price, qty, pnl, balance) "
+                 "VALUES (1, 0, 'DEPOSIT', 'CASH', 0, 0, 0, 1000)")
+    conn.commit()
+    conn.close()
+
+    db = ResultsDB(path)
+    _, ledger = db.load_ledger(1)
+    assert ledger.column("fee").tolist() == [0.0]
+    [run_id] = db.add_runs([run_record("b", "S", "U", (30, 0), ledger_with_fees(), 1018.9)])
+    assert db.trades(run_id)["fee"].tolist() == [0.0, 0.5, 0.6]
+    db.close()
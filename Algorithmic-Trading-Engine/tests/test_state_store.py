@@ -0,0 +1,22 @@
+# tests/test_state_store.py
+from execution.state_store import StateStore
+
+def rows(store):
+    return dict(store.conn.execute("SELECT symbol, updated FROM symbol_state").fetchall())
+
+def test_save_symbol_writes_only_that_symbol(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    assert store.save({"AAPL": {"cooldown": 0}, "MSFT": {"cooldown": 0}}) == 2
+    before = rows(store)
+
+    assert store.save_symbol("AAPL", {"cooldown": 3}) == 1
+    after = rows(store)
+    assert after["MSFT"] == before["MSFT"]
+    assert after["AAPL"] >= before["AAPL"]
+
+    # Unchanged state is not written again, by either path
+    assert store.save_symbol("AAPL", {"cooldown": 3}) == 0
+    assert store.save({"AAPL": {"cooldown": 3}, "MSFT": {"cooldown": 0}}) == 0
+
+    store.close()
+    assert StateStore(str(tmp_path / "state.db")).load() == {"AAPL": {"cooldown": 3}, "MSFT": {"cooldown": 0}}
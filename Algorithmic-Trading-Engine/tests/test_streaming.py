@@ -0,0 +1,65 @@
+# tests/test_streaming.py
+import json
+import pandas as pd
+import pytest
+
+import strategy.strategy1 as strategy1
+from strategy.indicators import prepare_data, prepare_for_strategy
+from strategy.loader import get_indicator_specs
+from strategy.registry import prepare_indicators
+from strategy.streaming import StreamingIndicators, restore_stream
+from fakes import daily_bars
+
+def stream_frame(stream, df, split=None):
+    """Feeds df bar by bar; at row `split` the state goes through a JSON round trip."""
+    rows = {}
+    for i, bar in enumerate(df.to_dict("records")):
+        if i == split:
+            stream = StreamingIndicators.from_dict(json.loads(json.dumps(stream.to_dict(), default=str)))
+        row = stream.update(bar, bar["timestamp"])
+        if row is not None:
+            rows[bar["timestamp"]] = row
+    out = pd.DataFrame.from_dict(rows, orient="index")
+    out.index.name = "timestamp"
+    return out
+
+@pytest.fixture
+def bars():
+    return daily_bars("2022-01-01", 300, seed=7)
+
+def test_default_set_matches_prepare_data(bars):
+    pd.testing.assert_frame_equal(stream_frame(StreamingIndicators(), bars), prepare_data(bars), check_exact=True, check_freq=False)
+
+def test_strategy_specs_match_prepare_for_strategy(bars):
+    specs = get_indicator_specs(strategy1)
+    streamed = stream_frame(StreamingIndicators(specs), bars)
+    pd.testing.assert_frame_equal(streamed, prepare_for_strategy(bars, strategy1), check_exact=True, check_freq=False)
+    # Warm-up follows the strategy's longest window (Donchian 20), not SMA 50
+    assert streamed.index[0] == bars["timestamp"].iloc[20]
+
+def test_shared_and_derived_windows(bars):
+    specs = {
+        "donchian_high": ("donchian_high", {"period": 55}),
+        "donchian_mid": ("donchian_mid", {"entry": 55, "exit": 20}),
+        "sma_close": ("sma", {"period": 30}),
+        "max_close": ("rolling_max", {"source": "close", "period": 5}),
+    }
+    stream = StreamingIndicators(specs)
+    # donchian_high and donchian_mid read the same 55-bar high window
+    assert len(stream.windows) == 4
+    pd.testing.assert_frame_equal(stream_frame(stream, bars), prepare_indicators(bars, specs), check_exact=True, check_freq=False)
+
+@pytest.mark.parametrize("split", [5, 60, 299])
+def test_round_trip_mid_stream(bars, split):
+    specs = get_indicator_specs(strategy1)
+    expected = stream_frame(StreamingIndicators(specs), bars)
+    pd.testing.assert_frame_equal(stream_frame(StreamingIndicators(specs), bars, split=split), expected, check_exact=True)
+
+def test_restore_rebuilds_state_for_other_indicators(bars):
+    stream = StreamingIndicators()
+    stream.warm_start(bars)
+    saved = json.loads(json.dumps(stream.to_dict(), default=str))
+
+    assert restore_stream(saved).last_ts is not None
+    cold = restore_stream(saved, get_indicator_specs(strategy1))
+    assert cold.last_ts is None and cold.specs == StreamingIndicators(get_indicator_specs(strategy1)).specs
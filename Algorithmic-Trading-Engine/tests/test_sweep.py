@@ -0,0 +1,34 @@
+# tests/test_sweep.py
+import pandas as pd
+
+import strategy.strategy1 as strategy1
+from backtest.sweep import expand_grid, specs_for, strategy_specs, build_window_frame, assemble_frame
+from strategy.indicators import prepare_data, prepare_for_strategy
+from fakes import daily_bars
+
+GRID = {"entry_period": [10, 20], "exit_period": [5, 10], "sma_period": [50, 100]}
+
+def test_grid_only_sweeps_declared_windows():
+    combos = expand_grid(GRID, strategy_specs(strategy1))
+    # strategy1 has no SMA, so sma_period is not a sweep axis
+    assert len(combos) == 4
+    assert all(set(params) == {"entry_period", "exit_period"} for params in combos)
+    assert len(expand_grid(GRID)) == 8
+
+def test_default_combination_matches_prepare_for_strategy():
+    bars = daily_bars("2020-01-01", 300, seed=5)
+    specs = strategy_specs(strategy1)
+    combos = expand_grid(GRID, specs)
+    wide, base_cols = build_window_frame(bars, specs, combos)
+
+    frame = assemble_frame(wide, base_cols, specs_for(specs, {"entry_period": 20, "exit_period": 10}))
+    pd.testing.assert_frame_equal(frame, prepare_for_strategy(bars, strategy1), check_like=True)
+
+def test_default_set_combination_matches_prepare_data():
+    bars = daily_bars("2020-01-01", 300, seed=6)
+    specs = strategy_specs(None)
+    combos = expand_grid(GRID, specs)
+    wide, base_cols = build_window_frame(bars, specs, combos)
+
+    frame = assemble_frame(wide, base_cols, specs_for(specs, {"entry_period": 20, "exit_period": 10, "sma_period": 50}))
+    pd.testing.assert_frame_equal(frame, prepare_data(bars), check_like=True)